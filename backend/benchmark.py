@@ -0,0 +1,645 @@
+# backend/benchmark.py
+"""Performance reports for the retrieval backend.
+
+Run from the backend directory, e.g.:
+
+    python benchmark.py recall --vectors 100000 --queries 500
+    python benchmark.py quantization --vectors 100000 --queries 500
+    python benchmark.py lexical --chunks 100000 --queries 1000
+    python benchmark.py encoding --threads 1 8 32 --queries 2000
+    python benchmark.py concurrency --pages 2000 --queries 500
+    python benchmark.py chunking --pages 2000 --workers 8
+    python benchmark.py dedup --pages 1000
+    python benchmark.py parsing --fixtures saved_pages/
+    python benchmark.py startup --storage-dir .. --runs 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from html_parser import PARSERS, lxml_html, parse_html
+from lexical_index import LexicalIndex
+from query_encoder import QueryEncoder
+from text_processor import ChunkingPool, TokenChunker, chunk_text, clean_text
+from vector_store import QUANTIZATIONS, VectorStore, build_index, get_model, reconstruct_all
+
+
+def load_vectors(index_path: str = None, count: int = 100000, dimension: int = 384) -> np.ndarray:
+    """Vectors from a saved index, or clustered synthetic ones resembling sentence embeddings"""
+    if index_path:
+        return reconstruct_all(faiss.read_index(index_path))
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(1, count // 100), dimension)).astype('float32')
+    vectors = centers[rng.integers(0, len(centers), count)]
+    vectors += 0.5 * rng.standard_normal((count, dimension)).astype('float32')
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def sample_queries(vectors: np.ndarray, count: int) -> np.ndarray:
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), count)].copy()
+    queries += 0.1 * rng.standard_normal(queries.shape).astype('float32')
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def timed_search(index, queries: np.ndarray, k: int, params=None):
+    """Search one query at a time, like /query does, and return ids and per-query ms"""
+    ids = np.empty((len(queries), k), dtype='int64')
+    latencies = []
+    for i in range(len(queries)):
+        started = time.perf_counter()
+        _, found = index.search(queries[i:i + 1], k, params=params)
+        latencies.append((time.perf_counter() - started) * 1000)
+        ids[i] = found[0]
+    return ids, np.array(latencies)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def recall_report(args):
+    vectors = load_vectors(args.index, args.vectors)
+    queries = sample_queries(vectors, args.queries)
+    dimension = vectors.shape[1]
+    print(f"{len(vectors)} vectors, {len(queries)} queries, k={args.k}")
+
+    flat = build_index('flat', dimension, vectors)
+    truth, latencies = timed_search(flat, queries, args.k)
+    rows = [('flat', '-', 0.0, 1.0, latencies)]
+
+    started = time.perf_counter()
+    ivf = build_index('ivf', dimension, vectors, nlist=args.nlist)
+    build_time = time.perf_counter() - started
+    for nprobe in args.nprobe:
+        found, latencies = timed_search(ivf, queries, args.k, faiss.SearchParametersIVF(nprobe=nprobe))
+        rows.append(('ivf', f"nprobe={nprobe}", build_time, recall_at_k(found, truth), latencies))
+
+    started = time.perf_counter()
+    hnsw = build_index('hnsw', dimension, vectors, hnsw_m=args.hnsw_m)
+    build_time = time.perf_counter() - started
+    for ef_search in args.ef_search:
+        found, latencies = timed_search(hnsw, queries, args.k, faiss.SearchParametersHNSW(efSearch=ef_search))
+        rows.append(('hnsw', f"efSearch={ef_search}", build_time, recall_at_k(found, truth), latencies))
+
+    print(f"{'index':<6} {'setting':<14} {'build s':>8} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, setting, build_time, recall, latencies in rows:
+        print(f"{name:<6} {setting:<14} {build_time:>8.2f} {recall:>7.3f} "
+              f"{np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 99):>8.3f}")
+
+
+def rerank_exact(vectors: np.ndarray, queries: np.ndarray, candidates: np.ndarray, k: int) -> np.ndarray:
+    """Top k of the candidates by exact inner product, as VectorStore does"""
+    found = np.full((len(queries), k), -1, dtype='int64')
+    for row, (query, ids) in enumerate(zip(queries, candidates)):
+        ids = ids[ids != -1]
+        best = np.argsort(-(vectors[ids] @ query))[:k]
+        found[row, :len(best)] = ids[best]
+    return found
+
+
+def quantization_report(args):
+    vectors = load_vectors(args.index, args.vectors)
+    queries = sample_queries(vectors, args.queries)
+    dimension = vectors.shape[1]
+    print(f"{len(vectors)} vectors, {len(queries)} queries, k={args.k}, {args.index_type} index, "
+          f"re-rank from top {args.k * args.rerank_factor}")
+
+    truth, _ = timed_search(build_index('flat', dimension, vectors), queries, args.k)
+
+    print(f"{'storage':<8} {'bytes/vec':>10} {'ratio':>6} {'recall':>7} {'+rerank':>8} {'p50 ms':>8} {'+rerank ms':>11}")
+    baseline = None
+    for quantization in QUANTIZATIONS:
+        if args.index_type == 'hnsw' and quantization == 'pq':
+            continue
+        index = build_index(args.index_type, dimension, vectors, hnsw_m=args.hnsw_m,
+                            quantization=quantization, pq_m=args.pq_m)
+        params = None
+        if args.index_type == 'ivf':
+            params = faiss.SearchParametersIVF(nprobe=args.nprobe)
+        elif args.index_type == 'hnsw':
+            params = faiss.SearchParametersHNSW(efSearch=args.ef_search)
+
+        bytes_per_vector = len(faiss.serialize_index(index)) / len(vectors)
+        baseline = baseline or bytes_per_vector
+        found, latencies = timed_search(index, queries, args.k, params)
+
+        started = time.perf_counter()
+        candidates, _ = timed_search(index, queries, args.k * args.rerank_factor, params)
+        reranked = rerank_exact(vectors, queries, candidates, args.k)
+        rerank_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+        print(f"{quantization:<8} {bytes_per_vector:>10.0f} {baseline / bytes_per_vector:>5.1f}x "
+              f"{recall_at_k(found, truth):>7.3f} {recall_at_k(reranked, truth):>8.3f} "
+              f"{np.percentile(latencies, 50):>8.3f} {rerank_ms:>11.3f}")
+
+
+def synthetic_chunks(count: int, words_per_chunk: int = 80):
+    """Chunk texts with a Zipf-distributed vocabulary plus a course code and a fee in each"""
+    rng = np.random.default_rng(0)
+    vocabulary = np.array([f"word{i}" for i in range(50000)])
+    ranks = np.minimum(rng.zipf(1.2, (count, words_per_chunk)), len(vocabulary)) - 1
+    return [' '.join(vocabulary[row]) + f" CS-{i % 5000} fee {rng.integers(1, 200)},000"
+            for i, row in enumerate(ranks)]
+
+
+def lexical_report(args):
+    texts = synthetic_chunks(args.chunks)
+    index = LexicalIndex()
+    started = time.perf_counter()
+    for start in range(0, len(texts), args.batch_size):
+        index.add(range(start, min(start + args.batch_size, len(texts))), texts[start:start + args.batch_size])
+    build_time = time.perf_counter() - started
+    print(f"{len(texts)} chunks indexed in {build_time:.1f}s "
+          f"({len(texts) / build_time:.0f} chunks/s, {index.memory_bytes() / 2 ** 20:.0f} MB)")
+
+    rng = np.random.default_rng(1)
+    queries = {
+        'course code': [f"what is CS{i}" for i in rng.integers(0, 5000, args.queries)],
+        'rare terms': [f"word{a} word{b}" for a, b in rng.integers(1000, 50000, (args.queries, 2))],
+        'common terms': [f"word{a} word{b} word{c}" for a, b, c in rng.integers(0, 20, (args.queries, 3))],
+    }
+    # Impact heads of common terms are built on their first query, once per 10% growth
+    for query in queries['common terms']:
+        index.search(query, args.k)
+    exhaustive = [set(index._search(query, args.k, None, bounded=False)[0]) for query in queries['common terms']]
+    recall = np.mean([len(set(index.search(query, args.k)[0]) & best) / max(1, len(best))
+                      for query, best in zip(queries['common terms'], exhaustive)])
+
+    print(f"{'queries':<14} {'p50 ms':>8} {'p99 ms':>8}")
+    failed = []
+    for name, batch in queries.items():
+        latencies = []
+        for query in batch:
+            started = time.perf_counter()
+            index.search(query, args.k)
+            latencies.append((time.perf_counter() - started) * 1000)
+        p99 = np.percentile(latencies, 99)
+        if p99 > args.max_ms:
+            failed.append(name)
+        print(f"{name:<14} {np.percentile(latencies, 50):>8.3f} {p99:>8.3f}{'  FAIL' if p99 > args.max_ms else ''}")
+    print(f"common terms recall@{args.k} against scoring whole posting lists: {recall:.3f}")
+
+    started = time.perf_counter()
+    index.add(range(len(texts), len(texts) + args.batch_size), texts[:args.batch_size])
+    print(f"incremental add of {args.batch_size} chunks: {(time.perf_counter() - started) * 1000:.1f} ms")
+    if failed:
+        sys.exit(f"p99 above {args.max_ms} ms for: {', '.join(failed)}")
+
+
+def encoding_report(args):
+    model = get_model(args.model)
+    dimension = model.get_sentence_embedding_dimension()
+    rng = np.random.default_rng(0)
+    # A few popular questions and a long tail, like real traffic
+    questions = [f"what is the admission deadline for program {i}" for i in range(args.distinct)]
+    popularity = rng.zipf(1.5, args.queries) % args.distinct
+    queries = [questions[i] for i in popularity]
+
+    setups = {
+        'per-query': dict(cache_size=0, max_batch=1, max_wait_ms=0),
+        'batched': dict(cache_size=0, max_batch=64, max_wait_ms=args.wait_ms),
+        'batched+lru': dict(cache_size=4096, max_batch=64, max_wait_ms=args.wait_ms),
+    }
+    print(f"{len(queries)} queries over {args.distinct} distinct questions")
+    print(f"{'setup':<12} {'threads':>7} {'queries/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'encodes':>8}")
+    for threads in args.threads:
+        for name, settings in setups.items():
+            encoder = QueryEncoder(lambda: model, dimension, **settings)
+
+            def one(query):
+                started = time.perf_counter()
+                encoder.encode([query])
+                return (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(threads) as pool:
+                latencies = list(pool.map(one, queries))
+            elapsed = time.perf_counter() - started
+            print(f"{name:<12} {threads:>7} {len(queries) / elapsed:>10.0f} {np.percentile(latencies, 50):>8.2f} "
+                  f"{np.percentile(latencies, 99):>8.2f} {encoder.batches:>8}")
+
+
+def synthetic_pages(count: int, offset: int = 0):
+    """Scraped pages in the shape the scraper yields"""
+    rng = np.random.default_rng(offset)
+    words = [f"word{i}" for i in range(5000)]
+    return [{
+        'url': f"https://college.example/page/{offset + i}",
+        'title': f"Page {offset + i}",
+        'headings': [f"Section {j}" for j in range(3)],
+        'paragraphs': [' '.join(rng.choice(words, 120)) for _ in range(8)],
+    } for i in range(count)]
+
+
+async def query_latencies(client, count: int, concurrency: int, stop: asyncio.Event = None):
+    """Per-request /query latency in ms, until `count` requests or `stop` is set"""
+    rng = np.random.default_rng(2)
+    latencies = []
+
+    async def worker():
+        while len(latencies) < count and not (stop and stop.is_set()):
+            query = f"word{rng.integers(5000)} word{rng.integers(5000)}"
+            started = time.perf_counter()
+            response = await client.post('/query', json={'query': query})
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return np.array(latencies)
+
+
+def concurrency_report(args):
+    # main (and this module's imports) put vector_storage/ in the working
+    # directory, so the measurement runs in a child started in a scratch one
+    if os.environ.get('BENCHMARK_CHILD') != '1':
+        storage_dir = args.storage_dir or tempfile.mkdtemp(prefix='concurrency-')
+        backend_dir = Path(__file__).resolve().parent
+        env = dict(os.environ, BENCHMARK_CHILD='1')
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(backend_dir), env.get('PYTHONPATH')]))
+        subprocess.run([sys.executable, str(backend_dir / 'benchmark.py'), *sys.argv[1:]],
+                       cwd=storage_dir, env=env, check=True)
+        return
+
+    import httpx
+    import main
+
+    # Only retrieval is measured: the LLM call is a fixed-latency stand-in and
+    # /scrape gets synthetic pages instead of crawling
+    def generate_response(query, context):
+        time.sleep(args.llm_ms / 1000)
+        return "answer"
+
+    new_pages = synthetic_pages(args.pages, offset=args.seed_pages)
+
+    async def pages(scraper, url):
+        for page in new_pages:
+            yield page
+
+    main.llm_handler.generate_response = generate_response
+    main.WebScraper.pages = pages
+    main.vector_store.warm_up()
+    main.process_scraped_data(synthetic_pages(args.seed_pages))
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            idle = await query_latencies(client, args.queries, args.concurrency)
+
+            stop = asyncio.Event()
+
+            async def ingest():
+                started = time.perf_counter()
+                response = await client.post('/scrape', json={'url': 'https://college.example/'})
+                response.raise_for_status()
+                job = response.json()
+                while job['status'] in ('queued', 'running'):
+                    await asyncio.sleep(0.05)
+                    job = (await client.get(f"/scrape/{job['job_id']}")).json()
+                if job['status'] != 'completed':
+                    raise RuntimeError(f"Scrape job {job['status']}: {job['error']}")
+                stop.set()
+                return time.perf_counter() - started
+
+            ingest_time, busy = await asyncio.gather(
+                ingest(), query_latencies(client, float('inf'), args.concurrency, stop))
+            return idle, busy, ingest_time
+
+    idle, busy, ingest_time = asyncio.run(run())
+    print(f"{args.seed_pages} pages indexed, ingesting {args.pages} more took {ingest_time:.1f}s; "
+          f"{args.concurrency} concurrent clients, LLM stand-in {args.llm_ms:.0f} ms")
+    print(f"{'phase':<14} {'queries':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, latencies in (('idle', idle), ('during ingest', busy)):
+        if len(latencies):
+            print(f"{name:<14} {len(latencies):>8} {np.percentile(latencies, 50):>8.1f} "
+                  f"{np.percentile(latencies, 99):>8.1f} {latencies.max():>8.1f}")
+
+
+# Runs in a fresh interpreter so import costs are measured too
+STARTUP_PROBE = """
+import json, time
+started = time.perf_counter()
+import main
+from vector_store import vector_store
+app_ready = time.perf_counter()
+vector_store.load()
+index_loaded = time.perf_counter()
+vector_store.model
+model_loaded = time.perf_counter()
+print(json.dumps({
+    'app_import': app_ready - started,
+    'index_load': index_loaded - app_ready,
+    'model_load': model_loaded - index_loaded,
+    'total': model_loaded - started,
+}))
+"""
+
+
+def mixed_pages(count: int):
+    """Dense English, Devanagari and sparse pages in equal parts"""
+    rng = np.random.default_rng(2)
+    english = synthetic_pages(count // 3)
+    hindi_words = "प्रवेश प्रक्रिया छात्रावास शुल्क छात्रवृत्ति विश्वविद्यालय पाठ्यक्रम परीक्षा".split()
+    hindi = [{
+        'url': f"https://college.example/hi/{i}",
+        'title': f"पृष्ठ {i}",
+        'headings': ["प्रवेश"],
+        'paragraphs': [' '.join(rng.choice(hindi_words, 15)) + '।' for _ in range(12)],
+    } for i in range(count // 3)]
+    sparse = [{
+        'url': f"https://college.example/notice/{i}",
+        'title': f"Notice {i}",
+        'headings': [f"Update {j}" for j in range(3)],
+        'paragraphs': [f"Office hours change on day {j} of this month." for j in range(6)],
+    } for i in range(count - 2 * (count // 3))]
+    return english + hindi + sparse
+
+
+def legacy_chunks(pages):
+    """Chunks as process_scraped_data cut them before the token-aware chunker"""
+    for page in pages:
+        content = clean_text("\n".join([f"Title: {page['title']}", "Headings: " + " | ".join(page['headings']),
+                                        "Content: " + " ".join(page['paragraphs'])]))
+        yield from chunk_text(content)
+
+
+def chunking_report(args):
+    pages = mixed_pages(args.pages)
+    chunker = TokenChunker.for_model(get_model(args.model)) if args.model else TokenChunker()
+    limit = chunker.max_tokens
+    print(f"{len(pages)} pages, {limit}-token budget, "
+          f"{'the ' + args.model + ' tokenizer' if args.model else 'estimated token counts'}")
+    print(f"{'chunker':<8} {'chunks':>7} {'p50':>5} {'p95':>5} {'max':>5} {'< min':>6} {'over':>6} {'pages/s':>8}")
+
+    started = time.perf_counter()
+    texts = list(legacy_chunks(pages))
+    elapsed = time.perf_counter() - started
+    lengths = np.array([count for start in range(0, len(texts), 1000)
+                        for count in chunker.count_tokens(texts[start:start + 1000])])
+    print(f"{'legacy':<8} {len(texts):>7} {np.percentile(lengths, 50):>5.0f} {np.percentile(lengths, 95):>5.0f} "
+          f"{lengths.max():>5} {int((lengths < chunker.min_tokens).sum()):>6} {int((lengths > limit).sum()):>6} "
+          f"{len(pages) / elapsed:>8.0f}")
+
+    started = time.perf_counter()
+    for _ in chunker.chunk_pages(pages):
+        pass
+    elapsed = time.perf_counter() - started
+    stats = chunker.stats()
+    print(f"{'token':<8} {stats['chunks']:>7} {stats['p50']:>5} {stats['p95']:>5} {stats['max']:>5} "
+          f"{stats['under_min']:>6} {stats['over_budget']:>6} {len(pages) / elapsed:>8.0f}")
+
+    if args.workers > 1:
+        pool = ChunkingPool(chunker, args.workers)
+        # Start the workers before timing
+        for _ in pool.chunk_pages(pages[:args.workers * pool.batch_pages]):
+            pass
+        stats = TokenChunker(max_tokens=chunker.max_tokens, min_tokens=chunker.min_tokens)
+        started = time.perf_counter()
+        for _ in pool.chunk_pages(pages, stats=stats):
+            pass
+        elapsed = time.perf_counter() - started
+        pool.close()
+        stats = stats.stats()
+        print(f"{f'pool x{args.workers}':<8} {stats['chunks']:>7} {stats['p50']:>5} {stats['p95']:>5} {stats['max']:>5} "
+              f"{stats['under_min']:>6} {stats['over_budget']:>6} {len(pages) / elapsed:>8.0f}")
+
+
+def boilerplate_pages(count: int):
+    """Synthetic pages carrying a site-wide header, cookie banner and footer"""
+    header = "Home About Admissions Academics Research Campus Life Alumni Contact Apply Now Visit Campus Give"
+    cookies = "We use cookies to improve your experience on our website. By continuing to browse you agree to our use of cookies."
+    pages = synthetic_pages(count)
+    for i, page in enumerate(pages):
+        footer = (f"Copyright 2025 Example College. All rights reserved. Privacy policy, terms of use and "
+                  f"accessibility statement. Last updated on day {i % 28 + 1} of the month.")
+        page['paragraphs'] = [header, cookies] + page['paragraphs'] + [footer]
+    return pages
+
+
+def dedup_report(args):
+    from main import PageIngestion
+
+    pages = boilerplate_pages(args.pages)
+    # Scraped later: printer-friendly copies of every tenth page, one word changed
+    copies = [{**page, 'url': page['url'] + '?print=1',
+               'paragraphs': [paragraph.replace('word1', 'word2', 1) for paragraph in page['paragraphs']]}
+              for page in pages[::10]]
+    print(f"{len(pages)} pages, then {len(copies)} printer-friendly copies in a second scrape")
+    print(f"{'scrape':<7} {'distance':>8} {'paragraphs cut':>14} {'chunks':>7} {'dropped':>8} {'embedded':>9} "
+          f"{'embed s':>8} {'total s':>8}")
+    for distance in (-1, args.distance):
+        with tempfile.TemporaryDirectory() as scratch:
+            store = VectorStore(storage_path=Path(scratch), near_duplicate_distance=distance, compact_every=10 ** 6)
+            store.model_name = args.model
+            encode = store.embedding_cache.encode
+            encode_time = [0.0]
+
+            def timed_encode(model, texts):
+                started = time.perf_counter()
+                try:
+                    return encode(model, texts)
+                finally:
+                    encode_time[0] += time.perf_counter() - started
+
+            store.embedding_cache.encode = timed_encode
+            # Through the same batched ingest as /scrape
+            for name, batch in (('site', pages), ('copies', copies)):
+                encode_time[0] = 0.0
+                started = time.perf_counter()
+                ingestion = PageIngestion(store)
+                ingestion.ingest(batch)
+                report = ingestion.finish()
+                total = time.perf_counter() - started
+                result = ingestion.upserted
+                print(f"{name:<7} {distance:>8} {ingestion.boilerplate['paragraphs']:>14} {report['chunks']:>7} "
+                      f"{result['near_duplicates']:>8} {result['added']:>9} {encode_time[0]:>8.2f} {total:>8.2f}")
+            store.unload()
+
+
+def synthetic_html(count: int):
+    """College-site-like pages: navigation, scripts and styles, inline markup, a table and a footer"""
+    rng = np.random.default_rng(3)
+    words = [f"word{i}" for i in range(5000)]
+
+    def sentence(length: int = 18) -> str:
+        return ' '.join(rng.choice(words, length)) + '.'
+
+    nav = ''.join(f'<li><a href="/dept/{i}">Department {i}</a></li>' for i in range(120))
+    script = '<script>window.dataLayer = [];' + 'function f(a){return a*2;}' * 200 + '</script>'
+    style = '<style>' + '.c{margin:0;padding:0}' * 300 + '</style>'
+    pages = []
+    for i in range(count):
+        sections = ''.join(
+            f'<section><h2>Section {j}</h2>'
+            + ''.join(f'<p>{sentence()} <a href="/admission/{i}-{j}-{k}">apply <b>now</b></a> '
+                      f'<em>{sentence(8)}</em> {sentence()}</p>' for k in range(6))
+            + '<table>' + ''.join(f'<tr><td>{sentence(3)}</td><td>{k * 1000}</td></tr>' for k in range(10))
+            + '</table></section>' for j in range(6))
+        pages.append(f'<!DOCTYPE html><html><head><title>Page {i} | Example College</title>{style}{script}'
+                     f'</head><body><header><nav><ul>{nav}</ul></nav></header><main><h1>Page {i}</h1>'
+                     f'{sections}</main><footer><p>{sentence(30)}</p><!-- analytics -->{script}</footer>'
+                     f'</body></html>')
+    return pages
+
+
+def legacy_parse(html: str):
+    """What WebScraper.scrape_page did before parse_html: html.parser and one find_all per element kind"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.decompose()
+    title = soup.title.string.strip() if soup.title and soup.title.string else 'No Title'
+    paragraphs = [p.get_text(strip=True) for p in soup.find_all('p')]
+    headings = [h.get_text(strip=True) for h in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])]
+    links = [(a['href'], a.get_text(strip=True)) for a in soup.find_all('a', href=True)]
+    return title, paragraphs, headings, links
+
+
+def parsing_report(args):
+    if args.fixtures:
+        pages = [path.read_text(encoding='utf-8', errors='replace')
+                 for path in sorted(Path(args.fixtures).glob('*.htm*'))]
+        source = args.fixtures
+    else:
+        pages = synthetic_html(args.pages)
+        source = 'synthetic pages'
+    megabytes = sum(len(page.encode('utf-8')) for page in pages) / 1e6
+    print(f"{len(pages)} pages ({megabytes:.1f} MB) from {source}")
+    print(f"{'parser':<12} {'p50 ms':>7} {'p95 ms':>7} {'pages/s':>8} {'MB/s':>6} {'paragraphs':>11} {'links':>7}")
+
+    parsers = [('legacy', legacy_parse)] + [(name, lambda html, name=name: parse_html(html, name))
+                                           for name in PARSERS if name != 'lxml' or lxml_html is not None]
+    for name, parse in parsers:
+        times, paragraphs, links = [], 0, 0
+        for html in pages:
+            started = time.perf_counter()
+            parsed = parse(html)
+            times.append((time.perf_counter() - started) * 1000)
+            if isinstance(parsed, dict):
+                paragraphs += len(parsed['paragraphs'])
+                links += len(parsed['links'])
+            else:
+                paragraphs += len(parsed[1])
+                links += len(parsed[3])
+        total = sum(times) / 1000
+        print(f"{name:<12} {np.percentile(times, 50):>7.2f} {np.percentile(times, 95):>7.2f} "
+              f"{len(pages) / total:>8.1f} {megabytes / total:>6.1f} {paragraphs:>11} {links:>7}")
+
+
+def startup_report(args):
+    backend_dir = Path(__file__).resolve().parent
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(backend_dir), env.get('PYTHONPATH')]))
+
+    print(f"Startup from {Path(args.storage_dir).resolve() / 'vector_storage'}, {args.runs} runs each")
+    print(f"{'mode':<10} {'app import':>11} {'index load':>11} {'model load':>11} {'total':>8}")
+    for mode, mmap in (('read', '0'), ('mmap', '1')):
+        env['VECTOR_INDEX_MMAP'] = mmap
+        runs = []
+        for _ in range(args.runs):
+            output = subprocess.run([sys.executable, '-c', STARTUP_PROBE], cwd=args.storage_dir, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+        # Median of each phase
+        median = {key: float(np.median([run[key] for run in runs])) for key in runs[0]}
+        print(f"{mode:<10} {median['app_import']:>10.2f}s {median['index_load']:>10.2f}s "
+              f"{median['model_load']:>10.2f}s {median['total']:>7.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    recall = commands.add_parser('recall', help='recall@k and latency of IVF / HNSW against the flat index')
+    recall.add_argument('--index', help='saved FAISS index to take vectors from (default: synthetic)')
+    recall.add_argument('--vectors', type=int, default=100000)
+    recall.add_argument('--queries', type=int, default=500)
+    recall.add_argument('--k', type=int, default=5)
+    recall.add_argument('--nlist', type=int, default=None)
+    recall.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 16, 64])
+    recall.add_argument('--hnsw-m', type=int, default=32)
+    recall.add_argument('--ef-search', type=int, nargs='+', default=[16, 32, 64, 128])
+    recall.set_defaults(func=recall_report)
+
+    quantization = commands.add_parser('quantization', help='memory and recall loss of fp16 / SQ8 / PQ storage')
+    quantization.add_argument('--index', help='saved FAISS index to take vectors from (default: synthetic)')
+    quantization.add_argument('--vectors', type=int, default=100000)
+    quantization.add_argument('--queries', type=int, default=500)
+    quantization.add_argument('--k', type=int, default=5)
+    quantization.add_argument('--index-type', choices=['flat', 'ivf', 'hnsw'], default='flat')
+    quantization.add_argument('--pq-m', type=int, default=96)
+    quantization.add_argument('--hnsw-m', type=int, default=32)
+    quantization.add_argument('--nprobe', type=int, default=16)
+    quantization.add_argument('--ef-search', type=int, default=64)
+    quantization.add_argument('--rerank-factor', type=int, default=4)
+    quantization.set_defaults(func=quantization_report)
+
+    lexical = commands.add_parser('lexical', help='BM25 build rate and query latency on synthetic chunks')
+    lexical.add_argument('--chunks', type=int, default=100000)
+    lexical.add_argument('--queries', type=int, default=1000)
+    lexical.add_argument('--k', type=int, default=12)
+    lexical.add_argument('--batch-size', type=int, default=500)
+    lexical.add_argument('--max-ms', type=float, default=1.0, help='fail if any query kind has a higher p99')
+    lexical.set_defaults(func=lexical_report)
+
+    encoding = commands.add_parser('encoding', help='query encode throughput with micro-batching and the LRU cache')
+    encoding.add_argument('--model', default='all-MiniLM-L6-v2')
+    encoding.add_argument('--threads', type=int, nargs='+', default=[1, 8, 32])
+    encoding.add_argument('--queries', type=int, default=2000)
+    encoding.add_argument('--distinct', type=int, default=500)
+    encoding.add_argument('--wait-ms', type=float, default=5.0)
+    encoding.set_defaults(func=encoding_report)
+
+    concurrency = commands.add_parser('concurrency', help='/query latency while /scrape ingests, in-process')
+    concurrency.add_argument('--storage-dir', help='scratch directory for vector_storage/ (default: a new temp dir)')
+    concurrency.add_argument('--seed-pages', type=int, default=500)
+    concurrency.add_argument('--pages', type=int, default=2000)
+    concurrency.add_argument('--queries', type=int, default=500)
+    concurrency.add_argument('--concurrency', type=int, default=16)
+    concurrency.add_argument('--llm-ms', type=float, default=0)
+    concurrency.set_defaults(func=concurrency_report)
+
+    chunking = commands.add_parser('chunking', help='chunk token lengths of the legacy and token-aware chunkers')
+    chunking.add_argument('--pages', type=int, default=2000)
+    chunking.add_argument('--model', default=None, help='count with this model\'s tokenizer (default: estimate)')
+    chunking.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                          help='also time the process pool with this many workers')
+    chunking.set_defaults(func=chunking_report)
+
+    dedup = commands.add_parser('dedup', help='chunks and embedding time saved by near-duplicate suppression')
+    dedup.add_argument('--pages', type=int, default=1000)
+    dedup.add_argument('--distance', type=int, default=4)
+    dedup.add_argument('--model', default='all-MiniLM-L6-v2')
+    dedup.set_defaults(func=dedup_report)
+
+    parsing = commands.add_parser('parsing', help='HTML parse time of the legacy extraction and each parse_html backend')
+    parsing.add_argument('--fixtures', help='directory of saved .html pages (default: synthetic pages)')
+    parsing.add_argument('--pages', type=int, default=200)
+    parsing.set_defaults(func=parsing_report)
+
+    startup = commands.add_parser('startup', help='time to importable app, loaded index and loaded model')
+    startup.add_argument('--storage-dir', default='.', help='directory containing vector_storage/')
+    startup.add_argument('--runs', type=int, default=3)
+    startup.set_defaults(func=startup_report)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class CrawlCache:
+    """Persistent url -> (HTTP validators, page body) cache backed by SQLite
+
+    Bodies are stored zlib-compressed. Pages not fetched or revalidated for
+    `max_age_days` are dropped when the cache is opened.
+    """
+
+    def __init__(self, db_path: Path, max_age_days: float = 30):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                checked REAL NOT NULL,
+                body BLOB NOT NULL
+            )
+        ''')
+        self._conn.execute('DELETE FROM pages WHERE checked < ?', (time.time() - max_age_days * 86400,))
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Validators, last check time and body of a cached page, or None"""
+        with self._lock:
+            row = self._conn.execute('SELECT etag, last_modified, checked, body FROM pages WHERE url = ?',
+                                     (url,)).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, checked, body = row
+        return {'etag': etag, 'last_modified': last_modified, 'checked': checked,
+                'body': zlib.decompress(body).decode('utf-8')}
+
+    def put(self, url: str, body: str, etag: str = None, last_modified: str = None):
+        compressed = zlib.compress(body.encode('utf-8'), 6)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO pages (url, etag, last_modified, checked, body) VALUES (?, ?, ?, ?, ?)',
+                (url, etag, last_modified, time.time(), compressed))
+            self._conn.commit()
+
+    def touch(self, url: str):
+        """Record that the server confirmed the cached page is current"""
+        with self._lock:
+            self._conn.execute('UPDATE pages SET checked = ? WHERE url = ?', (time.time(), url))
+            self._conn.commit()
+
+    def delete(self, url: str):
+        with self._lock:
+            self._conn.execute('DELETE FROM pages WHERE url = ?', (url,))
+            self._conn.commit()
@@ -0,0 +1,248 @@
+import json
+import mmap
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+# One append-only file per column, one fixed-width value per document.
+# `offset`/`length` locate the UTF-8 text in text.bin; `url`/`title` are ids
+# into the interned string table; `key` is the 64-bit dedup key of the chunk;
+# `id` is the stable chunk id (increasing with the row); `deleted` is the
+# tombstone flag, the only value ever rewritten in place; `ingested` is the
+# unix time the chunk was added (0 for chunks stored before it was tracked);
+# `simhash` is the near-duplicate fingerprint of the text (0 if not computed).
+COLUMNS = {
+    'offset': np.dtype('<i8'),
+    'length': np.dtype('<i4'),
+    'url': np.dtype('<i4'),
+    'title': np.dtype('<i4'),
+    'key': np.dtype('<u8'),
+    'id': np.dtype('<i8'),
+    'deleted': np.dtype('u1'),
+    'ingested': np.dtype('<i8'),
+    'simhash': np.dtype('<u8'),
+}
+
+# Columns added after the first release, with their values for existing rows
+BACKFILL = {
+    'id': lambda count: np.arange(count, dtype=COLUMNS['id']),
+    'deleted': lambda count: np.zeros(count, dtype=COLUMNS['deleted']),
+    'ingested': lambda count: np.zeros(count, dtype=COLUMNS['ingested']),
+    'simhash': lambda count: np.zeros(count, dtype=COLUMNS['simhash']),
+}
+
+
+class DocumentStore:
+    """Append-only columnar document storage read through mmap
+
+    Opening a store only reads the (small) url/title string table, so startup
+    cost does not grow with the number of chunks. Chunk texts stay on disk
+    until a search result asks for them.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.mkdir(exist_ok=True)
+        self.blob_path = self.path / "text.bin"
+        self.strings_path = self.path / "strings.jsonl"
+
+        self._lock = threading.Lock()
+        self._strings = []
+        self._string_ids = {}
+        self._columns = {}
+        self._blob = None
+
+        self._load_strings()
+        sizes = {name: self._column_path(name).stat().st_size // dtype.itemsize
+                 for name, dtype in COLUMNS.items() if self._column_path(name).exists()}
+        self._count = min((sizes.get(name, 0) for name in COLUMNS if name in sizes or name not in BACKFILL),
+                          default=0)
+        for name, values in BACKFILL.items():
+            if name not in sizes and self._count:
+                self._append_column(name, values(self._count))
+
+        # A crash mid-append can leave some columns longer than others
+        self._truncate_columns(self._count)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, idx: int) -> Dict:
+        """Materialize one document"""
+        if idx < 0 or idx >= self._count:
+            raise IndexError(idx)
+
+        offset = int(self.column('offset')[idx])
+        length = int(self.column('length')[idx])
+        blob = self._blob_map(offset + length)
+        return {
+            'id': int(self.column('id')[idx]),
+            'text': blob[offset:offset + length].decode('utf-8'),
+            'url': self._strings[self.column('url')[idx]],
+            'title': self._strings[self.column('title')[idx]],
+            'ingested': int(self.column('ingested')[idx]),
+        }
+
+    def rows_of(self, ids: np.ndarray) -> np.ndarray:
+        """Row of each chunk id, or -1 if it is not stored here"""
+        ids = np.asarray(ids, dtype=COLUMNS['id'])
+        stored = self.column('id')
+        rows = np.searchsorted(stored, ids)
+        found = rows < len(stored)
+        found[found] = stored[rows[found]] == ids[found]
+        return np.where(found, rows, -1)
+
+    def string_id(self, value: str):
+        """Id of an interned url / title, or None if no document uses it"""
+        return self._string_ids.get(value)
+
+    def string(self, string_id: int) -> str:
+        return self._strings[string_id]
+
+    def live_rows(self) -> np.ndarray:
+        return np.flatnonzero(self.column('deleted') == 0)
+
+    def mark_deleted(self, rows: Iterable[int]):
+        """Set the tombstone flag of the given rows in place"""
+        with self._lock:
+            with open(self._column_path('deleted'), 'r+b') as f:
+                for row in sorted(rows):
+                    f.seek(int(row) * COLUMNS['deleted'].itemsize)
+                    f.write(b'\x01')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def copy_rows(self, target: 'DocumentStore', rows: np.ndarray, batch_size: int = 10000):
+        """Append the given rows, ids and keys included, to another store"""
+        keys = self.column('key')
+        ids = self.column('id')
+        fingerprints = self.column('simhash')
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            documents = [self[int(row)] for row in batch]
+            target.append(documents, keys[batch], ids[batch], fingerprints[batch])
+
+    def map_all(self):
+        """Map every column and the text blob, so reads keep working if the files are replaced"""
+        for name in COLUMNS:
+            self.column(name)
+        if self._count:
+            self._blob_map(self.blob_path.stat().st_size)
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only memory map of one column, covering every stored document"""
+        values = self._columns.get(name)
+        if values is None or len(values) < self._count:
+            if self._count == 0:
+                return np.zeros(0, dtype=COLUMNS[name])
+            values = np.memmap(self._column_path(name), dtype=COLUMNS[name], mode='r', shape=(self._count,))
+            self._columns[name] = values
+        return values[:self._count]
+
+    def append(self, documents: List[Dict], keys: Iterable[int], ids: Iterable[int],
+               fingerprints: Iterable[int] = None):
+        """Append documents durably; readers see them once every column is written"""
+        if not documents:
+            return
+        with self._lock:
+            url_ids = self._intern([doc.get('url', '') for doc in documents])
+            title_ids = self._intern([doc.get('title', '') for doc in documents])
+            texts = [doc['text'].encode('utf-8') for doc in documents]
+
+            blob_start = self.blob_path.stat().st_size if self.blob_path.exists() else 0
+            lengths = np.array([len(text) for text in texts], dtype=COLUMNS['length'])
+            offsets = blob_start + np.concatenate(([0], np.cumsum(lengths[:-1], dtype='int64')))
+
+            self._append_bytes(self.blob_path, b''.join(texts))
+            self._append_column('length', lengths)
+            self._append_column('url', np.array(url_ids, dtype=COLUMNS['url']))
+            self._append_column('title', np.array(title_ids, dtype=COLUMNS['title']))
+            self._append_column('key', np.fromiter(keys, dtype=COLUMNS['key'], count=len(documents)))
+            self._append_column('id', np.fromiter(ids, dtype=COLUMNS['id'], count=len(documents)))
+            self._append_column('deleted', np.zeros(len(documents), dtype=COLUMNS['deleted']))
+            now = int(time.time())
+            self._append_column('ingested', np.array([doc.get('ingested', now) for doc in documents],
+                                                     dtype=COLUMNS['ingested']))
+            self._append_column('simhash', np.zeros(len(documents), dtype=COLUMNS['simhash']) if fingerprints is None
+                                else np.fromiter(fingerprints, dtype=COLUMNS['simhash'], count=len(documents)))
+            self._append_column('offset', offsets.astype(COLUMNS['offset']))
+
+            self._count += len(documents)
+
+    def truncate(self, count: int):
+        """Drop documents past `count`, e.g. rows whose vectors never made it to disk"""
+        with self._lock:
+            if count >= self._count:
+                return
+            self._truncate_columns(count)
+            self._count = count
+
+    def _truncate_columns(self, count: int):
+        for name, dtype in COLUMNS.items():
+            path = self._column_path(name)
+            if path.exists() and path.stat().st_size > count * dtype.itemsize:
+                with open(path, 'r+b') as f:
+                    f.truncate(count * dtype.itemsize)
+        self._columns = {}
+
+    def _load_strings(self):
+        if not self.strings_path.exists():
+            return
+        good_offset = 0
+        with open(self.strings_path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("unterminated line")
+                    value = json.loads(line)
+                except ValueError:
+                    # Torn final line; no row can reference it yet
+                    break
+                good_offset += len(line)
+                self._string_ids[value] = len(self._strings)
+                self._strings.append(value)
+
+        if good_offset < self.strings_path.stat().st_size:
+            with open(self.strings_path, 'r+b') as f:
+                f.truncate(good_offset)
+
+    def _intern(self, values: List[str]) -> List[int]:
+        """Map strings to table ids, appending unseen ones in a single write"""
+        ids = []
+        new_lines = []
+        for value in values:
+            string_id = self._string_ids.get(value)
+            if string_id is None:
+                string_id = len(self._strings)
+                self._string_ids[value] = string_id
+                self._strings.append(value)
+                new_lines.append(json.dumps(value) + '\n')
+            ids.append(string_id)
+
+        if new_lines:
+            self._append_bytes(self.strings_path, ''.join(new_lines).encode('utf-8'))
+        return ids
+
+    def _blob_map(self, needed: int):
+        blob = self._blob
+        if blob is None or len(blob) < needed:
+            with open(self.blob_path, 'rb') as f:
+                blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._blob = blob
+        return blob
+
+    def _column_path(self, name: str) -> Path:
+        return self.path / f"{name}.bin"
+
+    def _append_column(self, name: str, values: np.ndarray):
+        self._append_bytes(self._column_path(name), values.tobytes())
+
+    def _append_bytes(self, path: Path, data: bytes):
+        with open(path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,82 @@
+import hashlib
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so formatting-only changes still hit the cache"""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def content_hash(text: str, salt: str = '') -> str:
+    """Stable hash of the normalized text, optionally salted (e.g. with a model name)"""
+    return hashlib.sha256(f"{salt}\0{normalize_text(text)}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent text -> embedding cache backed by SQLite"""
+
+    def __init__(self, db_path: Path, model_name: str, dimension: int):
+        self.model_name = model_name
+        self.dimension = dimension
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    def key(self, text: str) -> str:
+        return content_hash(text, salt=self.model_name)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return cached embeddings for whichever keys are present"""
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f'SELECT key, vector FROM embeddings WHERE key IN ({placeholders})', batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype='float32')
+        return found
+
+    def put_many(self, keys: List[str], embeddings: np.ndarray):
+        rows = [(key, np.ascontiguousarray(vector, dtype='float32').tobytes())
+                for key, vector in zip(keys, embeddings)]
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)', rows)
+            self._conn.commit()
+
+    def encode(self, model, texts: List[str]) -> np.ndarray:
+        """Embed texts, running the model only on cache misses"""
+        keys = [self.key(text) for text in texts]
+        cached = self.get_many(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            new_embeddings = np.asarray(model.encode(list(missing.values())), dtype='float32')
+            self.put_many(list(missing.keys()), new_embeddings)
+            cached.update(zip(missing.keys(), new_embeddings))
+
+        print(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+
+        embeddings = np.empty((len(texts), self.dimension), dtype='float32')
+        for i, key in enumerate(keys):
+            embeddings[i] = cached[key]
+        return embeddings
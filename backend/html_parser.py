@@ -0,0 +1,114 @@
+import re
+from typing import Dict
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # BeautifulSoup's bundled html.parser is used instead
+    lxml_html = None
+
+PARSERS = ('lxml', 'html.parser')
+DEFAULT_PARSER = 'lxml' if lxml_html is not None else 'html.parser'
+
+HEADINGS = frozenset(('h1', 'h2', 'h3', 'h4', 'h5', 'h6'))
+COLLECTED = HEADINGS | {'p', 'a', 'title'}
+SKIPPED = frozenset(('script', 'style'))
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+class _PageText:
+    """Accumulates the text of the open title, paragraph, heading and link elements during a walk"""
+
+    def __init__(self):
+        self.page = {'title': None, 'paragraphs': [], 'headings': [], 'links': []}
+        # (tag, text parts or None if the element is not collected, href)
+        self._open = []
+
+    def start(self, tag: str, href: str = None):
+        if tag not in COLLECTED:
+            return
+        collect = (tag in HEADINGS or tag == 'p' or (tag == 'a' and href is not None)
+                   or (tag == 'title' and self.page['title'] is None))
+        self._open.append((tag, [] if collect else None, href))
+
+    def text(self, text: str):
+        for _, parts, _ in self._open:
+            if parts is not None:
+                parts.append(text)
+
+    def end(self, tag: str):
+        if tag not in COLLECTED:
+            return
+        tag, parts, href = self._open.pop()
+        if parts is None:
+            return
+        text = WHITESPACE_PATTERN.sub(' ', ''.join(parts)).strip()
+        if tag == 'title':
+            self.page['title'] = text
+        elif tag == 'a':
+            self.page['links'].append((href, text))
+        elif text:
+            self.page['paragraphs' if tag == 'p' else 'headings'].append(text)
+
+
+def parse_html(html: str, parser: str = DEFAULT_PARSER) -> Dict:
+    """Title, paragraph and heading texts and (href, text) links of a page, in document order
+
+    Everything comes from a single walk over the parsed tree. An element's
+    text is the text inside it, scripts and styles excluded, with whitespace
+    collapsed; empty paragraphs and headings are left out.
+    """
+    page = _PageText()
+    if parser == 'lxml':
+        _walk_lxml(html, page)
+    elif parser == 'html.parser':
+        _walk_soup(html, page)
+    else:
+        raise ValueError(f"Unknown HTML parser: {parser}")
+    return {**page.page, 'title': page.page['title'] or ''}
+
+
+def _walk_lxml(html: str, page: _PageText):
+    parser = lxml_html.HTMLParser(encoding='utf-8', remove_comments=True, remove_pis=True, huge_tree=True)
+    try:
+        root = lxml_html.document_fromstring(html.encode('utf-8', 'replace'), parser=parser)
+    except etree.ParserError:
+        # Nothing but whitespace
+        return
+    walker = etree.iterwalk(root, events=('start', 'end'))
+    for event, element in walker:
+        tag = element.tag
+        if event == 'start':
+            if tag in SKIPPED:
+                walker.skip_subtree()
+                continue
+            page.start(tag, element.get('href'))
+            if element.text:
+                page.text(element.text)
+        else:
+            if tag not in SKIPPED:
+                page.end(tag)
+            if element.tail:
+                page.text(element.tail)
+
+
+def _walk_soup(html: str, page: _PageText):
+    soup = BeautifulSoup(html, 'html.parser')
+    # Iterative, so deeply nested markup cannot hit the recursion limit
+    stack = [(None, iter(soup.contents))]
+    while stack:
+        tag, children = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if tag is not None:
+                page.end(tag)
+        elif isinstance(child, Tag):
+            if child.name not in SKIPPED:
+                page.start(child.name, child.get('href'))
+                stack.append((child.name, iter(child.contents)))
+        elif type(child) is NavigableString:
+            # Comments, doctypes and CDATA are NavigableString subclasses
+            page.text(child)
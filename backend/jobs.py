@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# At most MAX_RUNNING_JOBS jobs run at once and MAX_QUEUED_JOBS wait for a
+# slot; the last KEPT_FINISHED_JOBS finished jobs stay queryable
+MAX_RUNNING_JOBS = int(os.getenv("SCRAPE_JOB_WORKERS", "2"))
+MAX_QUEUED_JOBS = int(os.getenv("SCRAPE_MAX_QUEUED_JOBS", "20"))
+KEPT_FINISHED_JOBS = int(os.getenv("SCRAPE_KEPT_JOBS", "100"))
+
+ACTIVE_STATES = ('queued', 'running')
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    """A background task with a status, progress and result"""
+
+    def __init__(self, info: Dict):
+        self.id = uuid.uuid4().hex
+        self.info = info
+        self.status = 'queued'
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        # Set by the running job; returns its current progress
+        self.progress: Optional[Callable[[], Dict]] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATES
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            **self.info,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'progress': self.progress() if self.progress else {},
+            'result': self.result,
+            'error': self.error,
+        }
+
+
+class JobManager:
+    """Runs jobs on the event loop, at most `max_running` at a time
+
+    Jobs beyond that wait in submission order. A job is a coroutine
+    function taking its Job, so it can publish progress; its return value
+    becomes the job's result.
+    """
+
+    def __init__(self, max_running: int = 2, max_queued: int = 20, keep_finished: int = 100):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self._jobs: Dict[str, Job] = OrderedDict()
+        self._slots = asyncio.Semaphore(max_running)
+
+    def submit(self, run: Callable[[Job], Awaitable[Dict]], **info) -> Job:
+        """Start a job once a slot is free; raises JobQueueFull if too many are waiting"""
+        if sum(1 for job in self._jobs.values() if job.status == 'queued') >= self.max_queued:
+            raise JobQueueFull(f"{self.max_queued} jobs are already waiting")
+        job = Job(info)
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, run))
+        self._forget_finished()
+        return job
+
+    async def _run(self, job: Job, run: Callable[[Job], Awaitable[Dict]]):
+        try:
+            async with self._slots:
+                job.status = 'running'
+                job.started = time.time()
+                job.result = await run(job)
+                job.status = 'completed'
+        except asyncio.CancelledError:
+            job.status = 'cancelled'
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished = time.time()
+            logger.info(f"Job {job.id} {job.status}")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def find_active(self, **info) -> Optional[Job]:
+        """A queued or running job submitted with the same info, if any"""
+        return next((job for job in self._jobs.values() if job.active and job.info == info), None)
+
+    def list(self) -> List[Job]:
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; False if it already finished"""
+        job = self._jobs[job_id]
+        if not job.active:
+            return False
+        job.task.cancel()
+        if job.status == 'queued':
+            # A task cancelled before its first step never runs _run
+            job.status = 'cancelled'
+            job.finished = time.time()
+        return True
+
+    def cancel_all(self):
+        for job in self._jobs.values():
+            if job.active:
+                job.task.cancel()
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+
+# Global instance
+scrape_jobs = JobManager(MAX_RUNNING_JOBS, MAX_QUEUED_JOBS, KEPT_FINISHED_JOBS)
@@ -0,0 +1,355 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r'\w+(?:[-.,/]\w+)*')
+SEPARATOR_PATTERN = re.compile(r'[-.,/]')
+
+# Too common to help ranking; skipping them keeps the longest postings out of queries
+STOPWORDS = frozenset("""
+a about an and are as at be by can do does for from has have how i if in is it me my of on or our
+so that the their there this to was we what when where which who why will with you your
+""".split())
+
+# Share of chunks above which a term only rescores chunks found by rarer terms
+COMMON_TERM_RATIO = 0.1
+
+# A query of common terms only is scored over the chunks each of its terms
+# weighs most in (its impact head), this many per term, rather than over
+# their whole posting lists. Heads and the dense term frequencies used to
+# score them are rebuilt once a list grew by IMPACT_HEAD_STALE_RATIO;
+# postings added since are candidates as well.
+IMPACT_HEAD_SIZE = 1000
+IMPACT_HEAD_STALE_RATIO = 0.1
+
+# `doc` is a position in the index's document arrays, not a chunk id, so
+# per-query scores can be summed with a single bincount
+POSTING = np.dtype([('doc', '<i4'), ('tf', '<u4')])
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords
+
+    Compounds such as course codes (CS-101), amounts (45,000) or roll
+    numbers (21.BCE.1234) yield their joined form and their parts, so both
+    spellings match.
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        parts = SEPARATOR_PATTERN.split(token)
+        if len(parts) > 1:
+            tokens.append(''.join(parts))
+            tokens.extend(parts)
+        else:
+            tokens.append(token)
+    return [token for token in tokens if token not in STOPWORDS]
+
+
+def _grow(array: np.ndarray, count: int, values: np.ndarray) -> np.ndarray:
+    """Append values after the first `count` items, reallocating with doubling when full
+
+    Readers holding the old array (and count) keep seeing a consistent prefix.
+    """
+    if count + len(values) > len(array):
+        grown = np.empty(max(2 * len(array), count + len(values), 4), dtype=array.dtype)
+        grown[:count] = array[:count]
+        array = grown
+    array[count:count + len(values)] = values
+    return array
+
+
+class LexicalIndex:
+    """In-memory BM25 inverted index over chunk texts
+
+    Postings are appended as chunks arrive and removed chunks are masked
+    until prune() drops them. Writers are serialized by `_write_lock` and
+    publish their changes under `_lock`, which searches only hold while
+    picking up the posting lists they need.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # term -> (postings array, number of postings in use)
+        self._postings = {}
+        # term -> (postings in use when built, impact head positions, tf by position)
+        self._impact_heads = {}
+        self._doc_ids = np.zeros(0, dtype='<i8')
+        self._doc_lengths = np.zeros(0, dtype='<u4')
+        self._removed = np.zeros(0, dtype=bool)
+        self._doc_count = 0
+        self._live_count = 0
+        self._total_length = 0
+        self._postings_bytes = 0
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    @property
+    def last_id(self) -> int:
+        """Highest chunk id indexed so far, -1 if none"""
+        return int(self._doc_ids[self._doc_count - 1]) if self._doc_count else -1
+
+    def doc_ids(self) -> np.ndarray:
+        """Ids of the indexed chunks that were not removed"""
+        count = self._doc_count
+        return self._doc_ids[:count][~self._removed[:count]]
+
+    def memory_bytes(self) -> int:
+        heads_bytes = sum(head.nbytes + tf_by_doc.nbytes for _, head, tf_by_doc in list(self._impact_heads.values()))
+        return (self._postings_bytes + heads_bytes + self._doc_ids.nbytes + self._doc_lengths.nbytes
+                + self._removed.nbytes)
+
+    def add(self, ids: Iterable[int], texts: Iterable[str]):
+        """Index chunks; ids must be larger than every id added before"""
+        ids = np.fromiter(ids, dtype='<i8')
+        term_counts = [Counter(tokenize(text)) for text in texts]
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype='<u4')
+
+        with self._write_lock:
+            # Group the batch by term so each posting list grows once
+            batch = {}
+            for position, counts in enumerate(term_counts, self._doc_count):
+                for term, tf in counts.items():
+                    batch.setdefault(term, []).append((position, tf))
+            grown = {}
+            grown_bytes = 0
+            for term, postings in batch.items():
+                array, count = self._postings.get(term, (np.zeros(0, dtype=POSTING), 0))
+                new_array = _grow(array, count, np.array(postings, dtype=POSTING))
+                if new_array is not array:
+                    grown_bytes += new_array.nbytes - array.nbytes
+                grown[term] = (new_array, count + len(postings))
+
+            doc_ids = _grow(self._doc_ids, self._doc_count, ids)
+            doc_lengths = _grow(self._doc_lengths, self._doc_count, lengths)
+            removed = _grow(self._removed, self._doc_count, np.zeros(len(ids), dtype=bool))
+
+            with self._lock:
+                self._postings.update(grown)
+                self._postings_bytes += grown_bytes
+                self._doc_ids, self._doc_lengths, self._removed = doc_ids, doc_lengths, removed
+                self._total_length += int(lengths.sum())
+                self._live_count += len(ids)
+                self._doc_count += len(ids)
+
+    def remove(self, ids: Iterable[int]):
+        """Hide chunks from searches; their postings stay until prune()"""
+        with self._write_lock:
+            positions = self._positions(ids)
+            positions = positions[~self._removed[positions]]
+            with self._lock:
+                self._removed[positions] = True
+                self._total_length -= int(self._doc_lengths[positions].sum())
+                self._live_count -= len(positions)
+
+    def prune(self):
+        """Drop the postings of removed chunks"""
+        with self._write_lock:
+            count = self._doc_count
+            keep = ~self._removed[:count]
+            if keep.all():
+                return
+            new_positions = np.cumsum(keep, dtype='<i4') - 1
+
+            # Searches keep using the current lists while the new ones are built
+            postings = {}
+            for term, (array, used) in self._postings.items():
+                kept = array[:used][keep[array['doc'][:used]]]
+                if len(kept):
+                    kept['doc'] = new_positions[kept['doc']]
+                    postings[term] = (kept, len(kept))
+            doc_ids = self._doc_ids[:count][keep]
+            doc_lengths = self._doc_lengths[:count][keep]
+
+            with self._lock:
+                self._postings = postings
+                self._impact_heads = {}
+                self._postings_bytes = sum(array.nbytes for array, _ in postings.values())
+                self._doc_ids, self._doc_lengths = doc_ids, doc_lengths
+                self._removed = np.zeros(len(doc_ids), dtype=bool)
+                self._doc_count = len(doc_ids)
+
+    def search(self, query: str, k: int, allowed: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Chunk ids and BM25 scores of the best k matches, best first
+
+        Terms found in more than COMMON_TERM_RATIO of the chunks only add
+        to the scores of chunks matched by the query's rarer terms, so a
+        query's cost follows its selective terms rather than its longest
+        posting lists. A query of common terms only is scored over their
+        impact heads, unless that leaves fewer than k matches. `allowed`
+        (sorted chunk ids) restricts the matches before the top k are taken.
+        """
+        ids, scores, bounded = self._search(query, k, allowed, bounded=True)
+        if bounded and len(ids) < k:
+            ids, scores, _ = self._search(query, k, allowed, bounded=False)
+        return ids, scores
+
+    def _search(self, query: str, k: int, allowed: np.ndarray, bounded: bool):
+        """(ids, scores, whether only impact heads were scored) of the best k matches"""
+        terms = set(tokenize(query))
+        with self._lock:
+            matched = {term: self._postings[term][0][:self._postings[term][1]]
+                       for term in terms if term in self._postings}
+            doc_ids, doc_lengths, removed = self._doc_ids, self._doc_lengths, self._removed
+            doc_count, live_count, total_length = self._doc_count, self._live_count, self._total_length
+            impact_heads = self._impact_heads
+        if not matched or not live_count or (allowed is not None and not len(allowed)):
+            return np.zeros(0, dtype='<i8'), np.zeros(0, dtype='float32'), False
+        average_length = total_length / live_count
+
+        selective = [postings for postings in matched.values() if len(postings) <= COMMON_TERM_RATIO * live_count]
+        common = [postings for postings in matched.values() if len(postings) > COMMON_TERM_RATIO * live_count]
+        bounded = bounded and not selective
+        if not selective and not bounded:
+            selective, common = common, []
+
+        # BM25 length normalization k1 * (1 - b + b * length / average), in float32
+        norm_base = np.float32(self.k1 * (1 - self.b))
+        norm_scale = np.float32(self.k1 * self.b / average_length)
+
+        def term_scores(postings, tf, docs):
+            idf = math.log(1 + (max(live_count - len(postings), 0) + 0.5) / (len(postings) + 0.5))
+            norm = doc_lengths[docs] * norm_scale + norm_base
+            return np.float32(idf * (self.k1 + 1)) * tf / (tf + norm)
+
+        if bounded:
+            # Every term is common: candidates are the chunks each weighs most in, and
+            # the chunks added since, scored without searching the whole posting lists
+            heads = [self._impact_head(impact_heads, term, postings, doc_lengths, norm_scale, norm_base)
+                     for term, postings in matched.items()]
+            docs = np.concatenate([np.concatenate([head, postings['doc'][built:]])
+                                   for (built, head, _), postings in zip(heads, matched.values())])
+            docs.sort()
+            docs = docs[np.concatenate([[True], docs[1:] != docs[:-1]])]
+            scores = np.zeros(len(docs), dtype='float32')
+            for (built, _, tf_by_doc), postings in zip(heads, matched.values()):
+                tf = np.zeros(len(docs), dtype='float32')
+                covered = docs < len(tf_by_doc)
+                tf[covered] = tf_by_doc[docs[covered]]
+                newer, tail = docs[~covered], postings[built:]
+                if len(newer) and len(tail):
+                    positions = np.minimum(np.searchsorted(tail['doc'], newer), len(tail) - 1)
+                    tf[~covered] = np.where(tail['doc'][positions] == newer, tail['tf'][positions], 0)
+                scores += term_scores(postings, tf, docs)
+            common = []
+        elif len(selective) == 1:
+            docs = selective[0]['doc']
+            scores = term_scores(selective[0], selective[0]['tf'].astype('float32'), docs)
+        else:
+            # Sum per-term scores by document position
+            all_docs = np.concatenate([postings['doc'] for postings in selective])
+            all_scores = np.concatenate([term_scores(postings, postings['tf'].astype('float32'), postings['doc'])
+                                         for postings in selective])
+            if len(all_docs) * 16 < doc_count:
+                docs, inverse = np.unique(all_docs, return_inverse=True)
+                scores = np.bincount(inverse, weights=all_scores)
+            else:
+                totals = np.bincount(all_docs, weights=all_scores, minlength=doc_count)
+                docs = np.flatnonzero(totals)
+                scores = totals[docs]
+
+        # Posting lists are sorted by position, so common terms are looked up
+        for postings in common:
+            positions = np.minimum(np.searchsorted(postings['doc'], docs), len(postings) - 1)
+            tf = np.where(postings['doc'][positions] == docs, postings['tf'][positions], 0).astype('float32')
+            scores = scores + term_scores(postings, tf, docs)
+
+        live = ~removed[docs]
+        if allowed is not None:
+            ids = doc_ids[docs]
+            positions = np.minimum(np.searchsorted(allowed, ids), len(allowed) - 1)
+            live &= allowed[positions] == ids
+        docs, scores = docs[live], scores[live]
+        if len(docs) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return doc_ids[docs[order]], scores[order].astype('float32'), bounded
+
+    @staticmethod
+    def _impact_head(impact_heads: dict, term: str, postings: np.ndarray, doc_lengths: np.ndarray,
+                     norm_scale: np.float32, norm_base: np.float32) -> tuple:
+        """(postings covered, positions of the chunks a term weighs most in, its tf by position)
+
+        Postings past the first `covered` ones are not in the head. A list
+        of at most IMPACT_HEAD_SIZE postings is left out entirely, so all
+        of it is searched. `impact_heads` is the cache belonging to the
+        lists `postings` was taken from; prune() starts a new one, as it
+        renumbers positions.
+        """
+        if len(postings) <= IMPACT_HEAD_SIZE:
+            return 0, postings['doc'][:0], np.zeros(0, dtype='<u2')
+        entry = impact_heads.get(term)
+        if entry is None or not entry[0] <= len(postings) <= (1 + IMPACT_HEAD_STALE_RATIO) * entry[0]:
+            # The term's BM25 weight up to its idf, which is the same for all its chunks
+            tf = postings['tf'].astype('float32')
+            impact = tf / (tf + doc_lengths[postings['doc']] * norm_scale + norm_base)
+            top = np.argpartition(-impact, IMPACT_HEAD_SIZE - 1)[:IMPACT_HEAD_SIZE]
+            tf_by_doc = np.zeros(int(postings['doc'][-1]) + 1, dtype='<u2')
+            tf_by_doc[postings['doc']] = np.minimum(postings['tf'], np.iinfo('<u2').max)
+            entry = (len(postings), np.sort(postings['doc'][top]), tf_by_doc)
+            impact_heads[term] = entry
+        return entry
+
+    def save(self, path: Path):
+        """Write a snapshot atomically"""
+        with self._write_lock:
+            count = self._doc_count
+            entries = [(term, array[:used]) for term, (array, used) in self._postings.items()]
+            doc_ids = self._doc_ids[:count].copy()
+            doc_lengths = self._doc_lengths[:count].copy()
+            removed = self._removed[:count].copy()
+
+        terms = '\n'.join(term for term, _ in entries).encode('utf-8')
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                terms=np.frombuffer(terms, dtype='u1'),
+                counts=np.array([len(postings) for _, postings in entries], dtype='<i8'),
+                postings=np.concatenate([postings for _, postings in entries]) if entries else np.zeros(0, POSTING),
+                doc_ids=doc_ids,
+                doc_lengths=doc_lengths,
+                removed=removed,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path, k1: float = 1.2, b: float = 0.75) -> 'LexicalIndex':
+        index = cls(k1=k1, b=b)
+        with np.load(path) as data:
+            terms = data['terms'].tobytes().decode('utf-8').split('\n') if len(data['terms']) else []
+            ends = np.cumsum(data['counts'])
+            postings = data['postings']
+            index._postings = {term: (postings[end - count:end], int(count))
+                               for term, count, end in zip(terms, data['counts'], ends)}
+            index._doc_ids = data['doc_ids']
+            index._doc_lengths = data['doc_lengths']
+            index._removed = data['removed']
+
+        index._doc_count = len(index._doc_ids)
+        index._postings_bytes = postings.nbytes
+        live = ~index._removed
+        index._live_count = int(live.sum())
+        index._total_length = int(index._doc_lengths[live].sum())
+        return index
+
+    def _positions(self, ids: Iterable[int]) -> np.ndarray:
+        ids = np.fromiter(ids, dtype='<i8')
+        stored = self._doc_ids[:self._doc_count]
+        positions = np.searchsorted(stored, ids)
+        found = positions < len(stored)
+        found[found] = stored[positions[found]] == ids[found]
+        return positions[found]
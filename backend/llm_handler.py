@@ -1,5 +1,5 @@
-import google.generativeai as genai
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,9 +7,21 @@ load_dotenv()
 
 class LLMHandler:
     def __init__(self):
-        # Configure Gemini API
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel('gemini-pro')
+        # The Gemini SDK is slow to import, so it is loaded on first use
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+
+                    # Configure Gemini API
+                    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                    self._model = genai.GenerativeModel('gemini-pro')
+        return self._model
 
     def generate_response(self, query: str, context: str) -> str:
         """Generate response using retrieved context"""
@@ -1,18 +1,61 @@
 # backend/main.py
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+import asyncio
+import functools
 import logging
-from typing import List, Dict
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Dict, Iterable, Literal, Optional
 
-from scraper import scrape_college_website
-from text_processor import clean_text, chunk_text
-from vector_store import vector_store
+from scraper import SCRAPER_SETTINGS, WebScraper, crawl_cache, parse_executor
+from text_processor import ChunkingPool, TokenChunker, page_fingerprint
+from near_duplicates import RepeatedParagraphFilter
+from vector_store import VectorStore, vector_store
+from namespaces import namespaces
+from jobs import Job, JobQueueFull, scrape_jobs
 from llm_handler import llm_handler
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# "lazy" warms the index and model up in the background after the server
+# starts accepting connections; "eager" finishes warmup before startup ends
+STARTUP_MODE = os.getenv("STARTUP_MODE", "lazy")
+
+# Upper bounds for /query and /query/batch
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "5000"))
+MAX_QUERY_K = int(os.getenv("MAX_QUERY_K", "50"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+
+# Encoding, FAISS searches and index writes run in bounded pools instead of
+# on the event loop. Ingestion has its own pool so a long scrape never takes
+# the threads queries need.
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", str(min(8, max(4, os.cpu_count() or 1)))))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+ingest_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+
+# Scraped pages are ingested INGEST_BATCH_PAGES at a time, or whatever has
+# arrived after INGEST_FLUSH_SECONDS. Batches of at least
+# PARALLEL_CHUNKING_MIN_PAGES changed pages are cleaned and chunked in
+# TEXT_WORKERS processes.
+TEXT_WORKERS = int(os.getenv("TEXT_WORKERS", str(os.cpu_count() or 1)))
+PARALLEL_CHUNKING_MIN_PAGES = int(os.getenv("PARALLEL_CHUNKING_MIN_PAGES", "64"))
+INGEST_BATCH_PAGES = int(os.getenv("INGEST_BATCH_PAGES", "256"))
+INGEST_FLUSH_SECONDS = float(os.getenv("INGEST_FLUSH_SECONDS", "10"))
+_chunking_pools = {}
+_chunking_pools_lock = threading.Lock()
+
+NO_RESULTS_ANSWER = "Sorry, I could not find relevant information about your query. Please make sure you have scraped a college website first."
+
 app = FastAPI(
     title="Campus Chatbot Backend",
     description="API for scraping, embedding, and querying campus information."
@@ -32,98 +75,430 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def warm_up_vector_store():
+    if STARTUP_MODE == "eager":
+        vector_store.warm_up()
+    else:
+        vector_store.start_warmup()
+
+@app.on_event("shutdown")
+def cancel_scrape_jobs():
+    scrape_jobs.cancel_all()
+
+@app.on_event("shutdown")
+def stop_worker_processes():
+    for pool in _chunking_pools.values():
+        pool.close()
+    if parse_executor is not None:
+        parse_executor.shutdown(cancel_futures=True)
+
 class ScrapeRequest(BaseModel):
     url: str
+    namespace: Optional[str] = None
+    # Replace the namespace's whole corpus with this scrape through a new snapshot
+    rebuild: bool = False
 
-class QueryRequest(BaseModel):
+SearchMode = Literal["dense", "lexical", "hybrid"]
+
+def utc_timestamp(value: datetime) -> int:
+    """Seconds since the epoch, reading a datetime without an offset as UTC rather than server time"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+class SearchFilters(BaseModel):
+    """Optional restrictions on the chunks a query may retrieve; bounds without an offset are UTC"""
+    url_prefix: Optional[str] = None
+    title: Optional[str] = None
+    ingested_after: Optional[datetime] = None
+    ingested_before: Optional[datetime] = None
+
+    def search_filters(self) -> Optional[Dict]:
+        """Filters in the form VectorStore.search takes, or None if there are none"""
+        filters = {
+            'url_prefix': self.url_prefix,
+            'title': self.title,
+            'ingested_after': utc_timestamp(self.ingested_after) if self.ingested_after else None,
+            'ingested_before': utc_timestamp(self.ingested_before) if self.ingested_before else None,
+        }
+        return {name: value for name, value in filters.items() if value is not None} or None
+
+class QueryRequest(SearchFilters):
     query: str
+    k: int = Field(3, ge=1, le=MAX_QUERY_K)
+    namespace: Optional[str] = None
+    mode: Optional[SearchMode] = None
+
+class BatchQueryRequest(SearchFilters):
+    queries: List[str]
+    k: int = Field(3, ge=1, le=MAX_QUERY_K)
+    generate_answers: bool = True
+    namespace: Optional[str] = None
+    mode: Optional[SearchMode] = None
+
+async def run_blocking(executor: ThreadPoolExecutor, func, *args, **kwargs):
+    """Run blocking vector store work on one of the bounded pools"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+async def get_store(namespace: Optional[str]) -> VectorStore:
+    """Vector store of a site / university namespace (the shared default if None)"""
+    try:
+        # Loading a namespace reads its index from disk
+        return await run_blocking(search_executor, namespaces.get, namespace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def get_chunking_pool(store: VectorStore) -> ChunkingPool:
+    """The chunking worker processes for a store's embedding model, started on first use"""
+    with _chunking_pools_lock:
+        pool = _chunking_pools.get(store.model_name)
+        if pool is None:
+            pool = ChunkingPool(TokenChunker.for_model(store.model), TEXT_WORKERS)
+            _chunking_pools[store.model_name] = pool
+        return pool
+
+class PageIngestion:
+    """Incremental ingest of one scrape into a store, fed batch by batch
+
+    chunk() keeps only the pages whose content changed since their last
+    ingest and cuts them into chunks that fit the embedding model's token
+    limit; store() embeds those chunks, replacing each page's old ones.
+    The two may run concurrently on consecutive batches, but each is
+    called for one batch at a time. Site-wide boilerplate paragraphs are
+    only kept on the first page that has them, across batches, and an
+    unchanged page counts as having them. With
+    `rebuild` every page is processed and the chunks replace the whole
+    corpus in finish(). Once `cancelled` is set, no further batch is
+    stored and finish() neither rebuilds nor deletes anything.
+    """
+
+    def __init__(self, store: VectorStore, rebuild: bool = False, cancelled: threading.Event = None):
+        self.store = store
+        self.rebuild = rebuild
+        self.cancelled = cancelled or threading.Event()
+        # Held while a batch, the rebuild or the deletes change the store
+        self._storing = threading.Lock()
+        self.chunker = TokenChunker.for_model(store.model)
+        # Pages are re-chunked when anything that shapes their chunks changes;
+        # "numbers" marks that repeated paragraphs must also match in their numbers
+        self.settings = (f"{store.model_name}:{self.chunker.max_tokens}:{self.chunker.min_tokens}:"
+                         f"{self.chunker.overlap_tokens}:{store.near_duplicate_distance}:numbers")
+        self.boilerplate = Counter()
+        self.paragraph_filter = (RepeatedParagraphFilter(store.near_duplicate_distance, self.boilerplate)
+                                 if store.near_duplicate_distance >= 0 else None)
+        self.report = Counter(pages_unchanged=0, pages_updated=0, pages_added=0, pages_removed=0)
+        self.upserted = Counter()
+        self.seen_urls = set()
+        # Progress: pages fully processed and chunks embedded so far
+        self.pages_stored = 0
+        self.chunks_stored = 0
+        # Changed pages chunked but not stored yet. Their old chunks are about
+        # to go, so they do not count as copies of a batch's new chunks;
+        # every other stored page does.
+        self.unstored_urls = set()
+        self._unstored_lock = threading.Lock()
+        self.rebuild_chunks = []
+        self.rebuild_fingerprints = {}
+
+    def chunk(self, pages: List[Dict]) -> Dict:
+        """Chunks of the new and changed pages of a batch, by url, with their fingerprints"""
+        if self.cancelled.is_set():
+            return {'chunks_by_url': {}, 'fingerprints': {}, 'pages': 0}
+        fingerprints = {page['url']: page_fingerprint(page, self.settings) for page in pages}
+        fingerprints = {url: fingerprint for url, fingerprint in fingerprints.items() if url not in self.seen_urls}
+        self.seen_urls.update(fingerprints)
+        previous = self.store.page_fingerprints.get_many(list(fingerprints))
+        changed = {url for url, fingerprint in fingerprints.items()
+                   if self.rebuild or previous.get(url) != fingerprint}
+        self.report['pages_unchanged'] += len(fingerprints) - len(changed)
+        self.report['pages_updated'] += sum(1 for url in changed if url in previous)
+        self.report['pages_added'] += sum(1 for url in changed if url not in previous)
+
+        logger.info(f"{len(changed)} of {len(fingerprints)} pages are new or changed")
+        with self._unstored_lock:
+            self.unstored_urls.update(changed)
+
+        changed_pages = list({page['url']: page for page in pages if page['url'] in changed}.values())
+        if self.paragraph_filter is not None:
+            # Boilerplate kept on an unchanged page is already stored with it
+            self.paragraph_filter.seed({page['url']: page for page in pages
+                                        if page['url'] in fingerprints and page['url'] not in changed}.values())
+            changed_pages = self.paragraph_filter.strip(changed_pages)
+        if TEXT_WORKERS > 1 and len(changed) >= PARALLEL_CHUNKING_MIN_PAGES:
+            pool = get_chunking_pool(self.store)
+            chunks = pool.chunk_pages(changed_pages, stats=self.chunker, max_pending=2 * pool.workers)
+        else:
+            chunks = self.chunker.chunk_pages(changed_pages)
+
+        # A page that no longer has content loses its old chunks
+        chunks_by_url = {url: [] for url in changed}
+        for chunk in chunks:
+            chunks_by_url[chunk['url']].append(chunk)
+        return {
+            'chunks_by_url': chunks_by_url,
+            'fingerprints': {url: fingerprints[url] for url in changed},
+            'pages': len(fingerprints),
+        }
+
+    def store_chunks(self, batch: Dict):
+        """Embed and store a batch from chunk()"""
+        with self._storing:
+            if not self.cancelled.is_set():
+                self._store_chunks(batch)
+
+    def _store_chunks(self, batch: Dict):
+        if self.rebuild:
+            self.rebuild_chunks.extend(chunk for chunks in batch['chunks_by_url'].values() for chunk in chunks)
+            self.rebuild_fingerprints.update(batch['fingerprints'])
+        elif batch['chunks_by_url']:
+            with self._unstored_lock:
+                replacing = self.unstored_urls.difference(batch['chunks_by_url'])
+            self.upserted.update(self.store.upsert_urls(batch['chunks_by_url'], replacing=replacing,
+                                                        fingerprints=batch['fingerprints']))
+            self.chunks_stored += sum(len(chunks) for chunks in batch['chunks_by_url'].values())
+        with self._unstored_lock:
+            self.unstored_urls.difference_update(batch['chunks_by_url'])
+        self.pages_stored += batch['pages']
+
+    def ingest(self, pages: List[Dict]):
+        """Chunk and store pages INGEST_BATCH_PAGES at a time, like ingest_pages without the concurrency
+
+        Each batch is chunked before the previous one is stored, so pages
+        about to be replaced do not suppress their new chunks elsewhere.
+        """
+        previous = None
+        for start in range(0, len(pages), INGEST_BATCH_PAGES):
+            batch = self.chunk(pages[start:start + INGEST_BATCH_PAGES])
+            if previous is not None:
+                self.store_chunks(previous)
+            previous = batch
+        if previous is not None:
+            self.store_chunks(previous)
+
+    def stop(self):
+        """Store nothing more, waiting for a batch, rebuild or delete already under way"""
+        self.cancelled.set()
+        with self._storing:
+            pass
+
+    def finish(self, gone_urls: Iterable[str] = ()) -> Dict:
+        """Rebuild or drop the pages in `gone_urls`, and report what changed"""
+        with self._storing:
+            if self.cancelled.is_set():
+                logger.info(f"Ingest cancelled; pages so far: {dict(self.report)}")
+                return {**self.report, 'chunks': self.chunks_stored}
+            return self._finish(gone_urls)
+
+    def _finish(self, gone_urls: Iterable[str]) -> Dict:
+        if self.rebuild:
+            known = self.store.page_fingerprints.urls()
+            stored = self.store.rebuild(self.rebuild_chunks, self.rebuild_fingerprints, self.cancelled)
+            self.chunks_stored = len(self.rebuild_chunks)
+            self.report['pages_removed'] = len(known - self.seen_urls)
+            logger.info(f"Rebuilt the vector store with {stored} chunks")
+        else:
+            self.report['pages_removed'] = sum(1 for url in set(gone_urls) - self.seen_urls
+                                               if self.store.delete_url(url))
+            logger.info(f"Upserted {self.chunker.stats()['chunks']} chunks: {self.upserted['added']} added, "
+                        f"{self.upserted['unchanged']} unchanged, {self.upserted['removed']} removed, "
+                        f"{self.upserted['near_duplicates']} near-duplicates dropped")
 
-class ScrapeResponse(BaseModel):
-    message: str
-    pages_scraped: int
+        chunks_count = self.chunker.stats()['chunks']
+        logger.info(f"Chunk lengths in tokens: {self.chunker.stats()}")
+        if self.boilerplate:
+            logger.info(f"Removed {self.boilerplate['paragraphs']} repeated paragraphs "
+                        f"({self.boilerplate['characters']} characters) before chunking")
+        if self.report['pages_updated'] + self.report['pages_added'] and not chunks_count:
+            logger.warning("No chunks were created from scraped data")
+        logger.info(f"Pages: {dict(self.report)}")
+        return {**self.report, 'chunks': chunks_count}
 
-def process_scraped_data(scraped_data: List[Dict]):
-    """Process scraped data and add to vector store"""
+def process_scraped_data(scraped_data: List[Dict], store: VectorStore = vector_store, rebuild: bool = False,
+                         gone_urls: Iterable[str] = ()) -> Dict:
+    """Chunk and embed the scraped pages whose content changed since their last ingest
+
+    Each changed page's chunks replace its old ones, and pages in
+    `gone_urls` lose theirs. With `rebuild` every scraped page is processed
+    and replaces the whole corpus instead.
+    """
     logger.info(f"Processing {len(scraped_data)} pages")
+    ingestion = PageIngestion(store, rebuild)
+    ingestion.ingest(scraped_data)
+    return ingestion.finish(gone_urls)
 
-    all_chunks = []
-    for page in scraped_data:
-        # Combine title, headings, and paragraphs
-        content_parts = []
-        if page.get('title'):
-            content_parts.append(f"Title: {page['title']}")
-
-        if page.get('headings'):
-            content_parts.append("Headings: " + " | ".join(page['headings']))
-
-        if page.get('paragraphs'):
-            content_parts.append("Content: " + " ".join(page['paragraphs']))
-
-        full_content = "\n".join(content_parts)
-        cleaned_content = clean_text(full_content)
-
-        if cleaned_content.strip():
-            chunks = chunk_text(cleaned_content)
-            for chunk in chunks:
-                chunk_with_metadata = {
-                    'text': chunk,
-                    'url': page['url'],
-                    'title': page['title']
-                }
-                all_chunks.append(chunk_with_metadata)
-
-    if all_chunks:
-        vector_store.add_documents(all_chunks)
-        logger.info(f"Added {len(all_chunks)} chunks to vector store")
-    else:
-        logger.warning("No chunks were created from scraped data")
+async def ingest_pages(pages: AsyncIterator[Dict], ingestion: PageIngestion) -> int:
+    """Chunk and embed pages while they are still being scraped, returning how many arrived
 
-    return len(all_chunks)
+    The scrape, chunking and embedding run as three stages connected by
+    bounded queues, so all three are busy at once and at most a few batches
+    of pages are held in memory. Call ingestion.finish() afterwards.
+    """
+    page_queue = asyncio.Queue(maxsize=INGEST_BATCH_PAGES)
+    chunk_queue = asyncio.Queue(maxsize=1)
+    received = 0
 
-@app.post("/scrape", response_model=ScrapeResponse)
-async def scrape_college_data(request: ScrapeRequest, background_tasks: BackgroundTasks):
-    """Endpoint to scrape college website data"""
-    if not request.url.startswith(('http://', 'https://')):
-        raise HTTPException(status_code=400, detail="Invalid URL format")
+    async def read():
+        nonlocal received
+        # Closed even when cancelled mid-crawl, which stops the crawl's workers
+        async with aclosing(pages):
+            async for page in pages:
+                received += 1
+                await page_queue.put(page)
+        await page_queue.put(None)
+
+    async def chunk():
+        batch, finished = [], False
+        while not finished:
+            try:
+                page = await asyncio.wait_for(page_queue.get(), INGEST_FLUSH_SECONDS if batch else None)
+            except asyncio.TimeoutError:
+                # A slow crawl still becomes searchable as it goes
+                page = ...
+            if page is None:
+                finished = True
+            elif page is not ...:
+                batch.append(page)
+                if len(batch) < INGEST_BATCH_PAGES:
+                    continue
+            if batch:
+                await chunk_queue.put(await run_blocking(ingest_executor, ingestion.chunk, batch))
+                batch = []
+        await chunk_queue.put(None)
 
+    async def store():
+        while (batch := await chunk_queue.get()) is not None:
+            await run_blocking(ingest_executor, ingestion.store_chunks, batch)
+
+    stages = [asyncio.create_task(stage()) for stage in (read, chunk, store)]
     try:
-        logger.info(f"Starting scraping for {request.url}")
+        await asyncio.gather(*stages)
+    finally:
+        for stage in stages:
+            stage.cancel()
+        await asyncio.gather(*stages, return_exceptions=True)
+    return received
+
+async def run_scrape_job(job: Job, request: ScrapeRequest, store: VectorStore) -> Dict:
+    """Crawl a site and embed its pages into a store, publishing progress on the job
 
-        scraped_data = await scrape_college_website(request.url)
-        logger.info(f"Scraped {len(scraped_data)} pages")
+    A cancelled job keeps the batches it already stored, but neither drops
+    the pages that disappeared nor, with `rebuild`, replaces the corpus.
+    It only reports cancelled once the store has stopped changing.
+    """
+    logger.info(f"Starting scraping for {request.url}")
 
-        if not scraped_data:
-            raise HTTPException(status_code=400, detail="No data could be scraped from the URL")
+    # Pages are chunked and embedded while the crawl goes on
+    scraper = WebScraper(cache=crawl_cache, parse_executor=parse_executor, **SCRAPER_SETTINGS)
+    ingestion = await run_blocking(ingest_executor, PageIngestion, store, request.rebuild)
+    job.progress = functools.partial(scrape_progress, job, scraper, ingestion)
+    try:
+        pages_scraped = await ingest_pages(scraper.pages(request.url), ingestion)
+        logger.info(f"Scraped {pages_scraped} pages")
 
-        # Process data immediately for debugging
-        chunks_count = process_scraped_data(scraped_data)
-        logger.info(f"Processed {chunks_count} chunks")
+        if not pages_scraped:
+            raise ValueError("No data could be scraped from the URL")
 
-        return ScrapeResponse(
-            message="Scraping completed successfully",
-            pages_scraped=len(scraped_data)
-        )
+        report = await run_blocking(ingest_executor, ingestion.finish, scraper.gone_urls)
+    except asyncio.CancelledError:
+        # Cancelling the task does not stop a batch or rebuild already running in a thread
+        await asyncio.to_thread(ingestion.stop)
+        raise
+    logger.info(f"Processed {report['chunks']} chunks")
 
-    except Exception as e:
-        logger.error(f"Scraping failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Scraping failed: {str(e)}")
+    # Pages re-chunked and re-embedded are the added and updated ones
+    return {
+        "message": "Scraping completed successfully",
+        "pages_scraped": pages_scraped,
+        **report
+    }
+
+def scrape_progress(job: Job, scraper: WebScraper, ingestion: PageIngestion) -> Dict:
+    """Pages fetched and embedded so far, with a rough estimate of the time left
+
+    The crawl is expected to reach its page budget unless it runs out of
+    queued urls first, so the estimate can grow as links are discovered.
+    """
+    expected = min(scraper.max_pages, scraper.pages_queued)
+    elapsed = (job.finished or time.time()) - job.started
+    fetched, processed = scraper.pages_scraped, ingestion.pages_stored
+    eta = None
+    if not job.active:
+        eta = 0.0
+    elif fetched:
+        eta = round(elapsed / fetched * max(0, expected - processed), 1)
+    return {
+        'pages_fetched': fetched,
+        'pages_expected': expected,
+        'pages_processed': processed,
+        'chunks_embedded': ingestion.chunks_stored,
+        'elapsed_seconds': round(elapsed, 1),
+        'eta_seconds': eta,
+    }
+
+@app.post("/scrape", status_code=202)
+async def scrape_college_data(request: ScrapeRequest):
+    """Start scraping a college website in the background, returning the job to poll
+
+    A scrape of the same site into the same namespace that is still queued
+    or running is returned instead of starting another.
+    """
+    if not request.url.startswith(('http://', 'https://')):
+        raise HTTPException(status_code=400, detail="Invalid URL format")
+    store = await get_store(request.namespace)
+
+    info = dict(url=request.url, namespace=namespaces.validate(request.namespace), rebuild=request.rebuild)
+    job = scrape_jobs.find_active(**info)
+    if job is None:
+        try:
+            job = scrape_jobs.submit(functools.partial(run_scrape_job, request=request, store=store), **info)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        logger.info(f"Queued scrape job {job.id} for {request.url}")
+    return job.to_dict()
+
+@app.get("/scrape")
+def list_scrape_jobs():
+    """Active and recently finished scrape jobs, oldest first"""
+    return {"jobs": [job.to_dict() for job in scrape_jobs.list()]}
+
+@app.get("/scrape/{job_id}")
+def scrape_job_status(job_id: str):
+    """Status, progress and, once finished, the result or error of a scrape job"""
+    job = scrape_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No scrape job {job_id}")
+    return job.to_dict()
+
+@app.delete("/scrape/{job_id}")
+def cancel_scrape_job(job_id: str):
+    """Stop a queued or running scrape job; a running one reports cancelled once it has stopped"""
+    if scrape_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"No scrape job {job_id}")
+    if not scrape_jobs.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Scrape job {job_id} already finished")
+    return scrape_jobs.get(job_id).to_dict()
 
 @app.post("/query")
 async def handle_query(request: QueryRequest):
     """API endpoint for user queries"""
     if not request.query:
         raise HTTPException(status_code=400, detail="Query cannot be empty")
+    store = await get_store(request.namespace)
 
     try:
-        retrieved_chunks = vector_store.search(request.query, k=3)
+        retrieved_chunks = await run_blocking(search_executor, store.search, request.query, k=request.k,
+                                              mode=request.mode, filters=request.search_filters())
 
         if not retrieved_chunks:
             return {
-                "answer": "Sorry, I could not find relevant information about your query. Please make sure you have scraped a college website first."
+                "answer": NO_RESULTS_ANSWER
             }
 
         context = "\n".join([chunk['text'] for chunk in retrieved_chunks])
-        answer = llm_handler.generate_response(query=request.query, context=context)
+        # The Gemini SDK is synchronous
+        answer = await asyncio.to_thread(llm_handler.generate_response, query=request.query, context=context)
 
         return {
             "answer": answer,
@@ -133,21 +508,96 @@ async def handle_query(request: QueryRequest):
         logger.error(f"Query processing failed: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to process query")
 
+@app.post("/query/batch")
+async def handle_batch_query(request: BatchQueryRequest):
+    """API endpoint for answering many queries in one request"""
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="Queries cannot be empty")
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    if any(not query for query in request.queries):
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    store = await get_store(request.namespace)
+
+    try:
+        # One encode pass and one index search for the whole batch
+        retrieved = await run_blocking(search_executor, store.search_batch, request.queries, k=request.k,
+                                       mode=request.mode, filters=request.search_filters())
+
+        if not request.generate_answers:
+            return {"results": [{"query": query, "source_context": chunks}
+                                for query, chunks in zip(request.queries, retrieved)]}
+
+        # The Gemini SDK is synchronous, so each call runs in a worker thread;
+        # the semaphore keeps us within the provider's rate limits.
+        semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+
+        async def answer(query: str, chunks: List[Dict]) -> Dict:
+            if not chunks:
+                return {"query": query, "answer": NO_RESULTS_ANSWER}
+
+            context = "\n".join([chunk['text'] for chunk in chunks])
+            async with semaphore:
+                response = await asyncio.to_thread(llm_handler.generate_response, query=query, context=context)
+            return {"query": query, "answer": response, "source_context": chunks}
+
+        results = await asyncio.gather(*[answer(query, chunks) for query, chunks in zip(request.queries, retrieved)])
+        return {"results": results}
+    except Exception as e:
+        logger.error(f"Batch query processing failed: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to process queries")
+
+@app.delete("/documents")
+async def delete_documents(url: str, namespace: Optional[str] = None):
+    """Remove every chunk scraped from a page"""
+    store = await get_store(namespace)
+    removed = await run_blocking(ingest_executor, store.delete_url, url)
+    if not removed:
+        raise HTTPException(status_code=404, detail=f"No documents stored for {url}")
+    return {"url": url, "removed": removed}
+
+@app.get("/snapshots")
+async def list_snapshots(namespace: Optional[str] = None):
+    """Index snapshots kept on disk for a namespace"""
+    store = await get_store(namespace)
+    return {"snapshots": await run_blocking(search_executor, store.snapshots)}
+
+@app.post("/snapshots/rollback")
+async def rollback_snapshot(namespace: Optional[str] = None, version: Optional[str] = None):
+    """Make an older snapshot active again (by default the previous one)"""
+    store = await get_store(namespace)
+    try:
+        active = await run_blocking(ingest_executor, store.rollback, version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"active": active}
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+def readiness_check():
+    """Whether the index and the embedding model are loaded, and the memory of the loaded namespaces"""
+    status = {**vector_store.status(), 'namespaces': namespaces.status()}
+    return JSONResponse(status_code=200 if status['ready'] else 503, content=status)
+
 @app.get("/")
 def root():
     return {"status": "Campus Chatbot API is running"}
 
+@app.get("/namespaces")
+def list_namespaces():
+    return {"namespaces": namespaces.names()}
+
 # Debug endpoint to check stored data
 @app.get("/debug/data")
-async def debug_data():
+async def debug_data(namespace: Optional[str] = None):
     """Debug endpoint to check stored data"""
     try:
-        doc_count = len(vector_store.documents)
-        sample_docs = vector_store.documents[:3] if vector_store.documents else []
+        store = await run_blocking(search_executor, namespaces.get, namespace)
+        doc_count = len(store.documents)
+        sample_docs = [store.documents[i] for i in range(min(3, doc_count))]
         return {
             "document_count": doc_count,
             "sample_documents": [{"text": doc["text"][:200] + "..." if len(doc["text"]) > 200 else doc["text"]} for doc in sample_docs]
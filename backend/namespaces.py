@@ -0,0 +1,111 @@
+import functools
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List
+
+from vector_store import STORE_SETTINGS, VectorStore, vector_store
+
+DEFAULT_NAMESPACE = "default"
+NAMESPACE_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+
+class NamespaceRegistry:
+    """One isolated VectorStore per site / university id
+
+    Each namespace keeps its own index files under <root>/namespaces/<name>
+    and is loaded on first use. Loaded namespaces are kept in LRU order and
+    the least recently used ones are unloaded once their combined index size
+    passes `memory_budget` bytes. The default namespace is the store at
+    <root> itself, so data scraped before namespaces existed stays visible.
+    """
+
+    def __init__(self, root: Path, memory_budget: int, default_store: VectorStore = None):
+        self.root = Path(root)
+        self.memory_budget = memory_budget
+        self._stores = {}
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        if default_store is not None:
+            self._stores[DEFAULT_NAMESPACE] = default_store
+            default_store.on_load = functools.partial(self._register, DEFAULT_NAMESPACE, default_store)
+
+    def get(self, namespace: str = None, load: bool = True) -> VectorStore:
+        """Store for a namespace, loading it (and evicting others) if needed"""
+        namespace = self.validate(namespace)
+        with self._lock:
+            store = self._stores.get(namespace)
+            if store is None:
+                store = VectorStore(storage_path=self.root / "namespaces" / namespace,
+                                    embedding_cache_path=self.root / "embeddings.sqlite",
+                                    **STORE_SETTINGS)
+                store.on_load = functools.partial(self._register, namespace, store)
+                self._stores[namespace] = store
+
+        if load:
+            store.load()
+            with self._lock:
+                self._lru[namespace] = store
+                self._lru.move_to_end(namespace)
+            self._evict(keep=namespace)
+        return store
+
+    def validate(self, namespace: str = None) -> str:
+        namespace = namespace or DEFAULT_NAMESPACE
+        if not NAMESPACE_PATTERN.match(namespace):
+            raise ValueError(f"Invalid namespace: {namespace!r}")
+        return namespace
+
+    def names(self) -> List[str]:
+        """Every namespace on disk or in memory"""
+        names = {DEFAULT_NAMESPACE} | set(self._stores)
+        namespaces_path = self.root / "namespaces"
+        if namespaces_path.exists():
+            names.update(path.name for path in namespaces_path.iterdir() if path.is_dir())
+        return sorted(names)
+
+    def status(self) -> Dict:
+        """Loaded namespaces, least recently used first, with their index bytes against the budget"""
+        with self._lock:
+            loaded = {name: store.memory_usage() for name, store in self._lru.items() if store.is_loaded()}
+        return {
+            'loaded_namespaces': loaded,
+            'memory_usage': sum(loaded.values()),
+            'memory_budget': self.memory_budget
+        }
+
+    def _evict(self, keep: str):
+        """Unload least recently used namespaces until we are within the memory budget"""
+        with self._lock:
+            usage = sum(store.memory_usage() for store in self._lru.values())
+            for name in list(self._lru):
+                if usage <= self.memory_budget:
+                    break
+                store = self._lru[name]
+                # Never evict the default store (readiness depends on it), the
+                # namespace being served, or one still writing a snapshot
+                if name in (keep, DEFAULT_NAMESPACE) or store.is_busy():
+                    continue
+                memory = store.memory_usage()
+                # Stores being searched or written to stay loaded
+                if not store.unload(only_if_idle=True):
+                    continue
+                usage -= memory
+                del self._lru[name]
+                print(f"Evicted namespace {name} from memory")
+
+    def _register(self, namespace: str, store: VectorStore):
+        """Count a store that was loaded outside get(), e.g. by an ingest, against the budget"""
+        with self._lock:
+            if namespace not in self._lru and store.is_loaded():
+                self._lru[namespace] = store
+
+
+# Global instance
+namespaces = NamespaceRegistry(
+    root=vector_store.storage_path,
+    memory_budget=int(os.getenv("NAMESPACE_MEMORY_BUDGET_MB", "1024")) * 1024 * 1024,
+    default_store=vector_store
+)
@@ -0,0 +1,168 @@
+import hashlib
+import re
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r'\w+')
+NUMBER_PATTERN = re.compile(r'\d+(?:[.,]\d+)*')
+SHINGLE_SIZE = 3
+
+# Stable 64-bit hashes of words seen so far; the vocabulary of a site is small
+_word_hashes = {}
+MAX_CACHED_WORDS = 1_000_000
+
+
+def _hash_words(words: List[str]) -> np.ndarray:
+    if len(_word_hashes) > MAX_CACHED_WORDS:
+        _word_hashes.clear()
+    for word in set(words).difference(_word_hashes):
+        _word_hashes[word] = int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+    return np.fromiter(map(_word_hashes.__getitem__, words), dtype='uint64', count=len(words))
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, so every bit of a shingle hash depends on all of its words"""
+    with np.errstate(over='ignore'):
+        values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return values ^ (values >> np.uint64(31))
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over word 3-shingles; similar texts differ in few bits
+
+    Never 0, which the document store uses for "not computed".
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if not words:
+        return 1
+    hashes = _hash_words(words)
+    if len(hashes) >= SHINGLE_SIZE:
+        with np.errstate(over='ignore'):
+            hashes = (hashes[:-2] * np.uint64(0x9E3779B97F4A7C15)
+                      ^ hashes[1:-1] * np.uint64(0xC2B2AE3D27D4EB4F) ^ hashes[2:])
+    hashes = _mix(hashes)
+
+    # Each shingle votes on every bit
+    ones = np.unpackbits(hashes.astype('<u8').view('u1').reshape(-1, 8), axis=1, bitorder='little').sum(axis=0)
+    value = int(np.packbits(ones * 2 > len(hashes), bitorder='little').view('<u8')[0])
+    return value or 1
+
+
+def simhash_many(texts: Iterable[str]) -> np.ndarray:
+    return np.array([simhash(text) for text in texts], dtype='uint64')
+
+
+def numbers(text: str) -> List[str]:
+    """Numbers in a text, in order
+
+    Texts whose SimHashes are close but whose numbers differ (a fee, a date,
+    a phone number) state different facts, so they are not near-duplicates.
+    """
+    return NUMBER_PATTERN.findall(text)
+
+
+class SimHashIndex:
+    """Chunk fingerprints searchable by Hamming distance
+
+    Fingerprints within `max_distance` bits of each other agree exactly on
+    at least one of `max_distance + 1` bands, so candidates are found by
+    band lookups and only those are compared bit by bit.
+    """
+
+    def __init__(self, max_distance: int = 4):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        edges = [64 * band // bands for band in range(bands + 1)]
+        self._bands = [(start, (1 << (end - start)) - 1) for start, end in zip(edges, edges[1:])]
+        self._tables = [{} for _ in self._bands]
+        self._fingerprints = {}
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def add(self, ids: Iterable[int], fingerprints: Iterable[int]):
+        for chunk_id, fingerprint in zip(ids, fingerprints):
+            chunk_id, fingerprint = int(chunk_id), int(fingerprint)
+            self._fingerprints[chunk_id] = fingerprint
+            for table, (shift, mask) in zip(self._tables, self._bands):
+                table.setdefault((fingerprint >> shift) & mask, []).append(chunk_id)
+
+    def remove(self, ids: Iterable[int]):
+        for chunk_id in ids:
+            fingerprint = self._fingerprints.pop(int(chunk_id), None)
+            if fingerprint is None:
+                continue
+            for table, (shift, mask) in zip(self._tables, self._bands):
+                key = (fingerprint >> shift) & mask
+                bucket = table[key]
+                bucket.remove(int(chunk_id))
+                if not bucket:
+                    del table[key]
+
+    def find(self, fingerprint: int, ignore=(), accept: Callable[[int], bool] = None) -> int:
+        """Id of a stored chunk within max_distance bits that `accept` (if given) agrees to, or -1"""
+        fingerprint = int(fingerprint)
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            for chunk_id in table.get((fingerprint >> shift) & mask, ()):
+                if chunk_id in ignore:
+                    continue
+                if ((self._fingerprints[chunk_id] ^ fingerprint).bit_count() <= self.max_distance
+                        and (accept is None or accept(chunk_id))):
+                    return chunk_id
+        return -1
+
+    def memory_bytes(self) -> int:
+        # Dict entries plus one list slot per band
+        return len(self._fingerprints) * (100 + 8 * len(self._bands))
+
+
+class RepeatedParagraphFilter:
+    """Drops the paragraphs that near-duplicate one of an earlier page, numbers included
+
+    Site-wide headers, footers and cookie banners stay on the first page
+    they appear on. Pages may come in any number of batches; counts of
+    removed paragraphs and characters go to `removed`. Pages that are
+    already stored are passed to seed(), so their paragraphs are not
+    kept again on the pages after them.
+    """
+
+    def __init__(self, max_distance: int = 4, removed: Counter = None):
+        self.removed = removed if removed is not None else Counter()
+        self._index = SimHashIndex(max_distance)
+        self._page_of = []
+        self._numbers = []
+        self._pages = 0
+
+    def strip(self, pages: Iterable[Dict]) -> Iterator[Dict]:
+        for page in pages:
+            paragraphs, removed = self._first_occurrences(page)
+            self.removed['paragraphs'] += len(removed)
+            self.removed['characters'] += sum(len(paragraph) for paragraph in removed)
+            yield {**page, 'paragraphs': paragraphs}
+
+    def seed(self, pages: Iterable[Dict]):
+        """Remember the paragraphs of pages that are not stripped, e.g. unchanged ones"""
+        for page in pages:
+            self._first_occurrences(page)
+
+    def _first_occurrences(self, page: Dict) -> tuple:
+        """(paragraphs of a page seen on no earlier page, the others), remembering the former"""
+        page_number = self._pages
+        self._pages += 1
+        paragraphs, removed = [], []
+        for paragraph in page.get('paragraphs', []):
+            fingerprint = simhash(paragraph)
+            paragraph_numbers = numbers(paragraph)
+            match = self._index.find(fingerprint, accept=lambda other: (self._page_of[other] != page_number and
+                                                                        self._numbers[other] == paragraph_numbers))
+            if match != -1:
+                removed.append(paragraph)
+                continue
+            self._index.add([len(self._page_of)], [fingerprint])
+            self._page_of.append(page_number)
+            self._numbers.append(paragraph_numbers)
+            paragraphs.append(paragraph)
+        return paragraphs, removed
@@ -0,0 +1,54 @@
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+
+class PageFingerprints:
+    """Persistent url -> content fingerprint of the pages last ingested, backed by SQLite"""
+
+    def __init__(self, db_path: Path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    def get_many(self, urls: List[str]) -> Dict[str, str]:
+        """Fingerprints of whichever urls are present"""
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(urls), 500):
+                batch = urls[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f'SELECT url, fingerprint FROM pages WHERE url IN ({placeholders})', batch
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def urls(self) -> Set[str]:
+        with self._lock:
+            return {url for url, in self._conn.execute('SELECT url FROM pages')}
+
+    def put_many(self, fingerprints: Dict[str, str]):
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO pages (url, fingerprint) VALUES (?, ?)',
+                                   fingerprints.items())
+            self._conn.commit()
+
+    def delete_many(self, urls: Iterable[str]):
+        with self._lock:
+            self._conn.executemany('DELETE FROM pages WHERE url = ?', ((url,) for url in urls))
+            self._conn.commit()
+
+    def replace_all(self, fingerprints: Dict[str, str]):
+        with self._lock:
+            self._conn.execute('DELETE FROM pages')
+            self._conn.executemany('INSERT INTO pages (url, fingerprint) VALUES (?, ?)', fingerprints.items())
+            self._conn.commit()
@@ -0,0 +1,127 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+import faiss
+import numpy as np
+
+from embedding_cache import normalize_text
+
+
+class QueryEncoder:
+    """Normalized query embeddings with an LRU cache and micro-batching
+
+    Single queries that miss the cache are handed to one worker thread, which
+    encodes everything queued in one forward pass. While queries keep
+    arriving concurrently it also waits up to `max_wait_ms` for more, so a
+    lone query is never delayed. Larger batches are encoded directly.
+    """
+
+    def __init__(self, model_loader: Callable, dimension: int, cache_size: int = 4096,
+                 max_batch: int = 64, max_wait_ms: float = 5.0):
+        self.model_loader = model_loader
+        self.dimension = dimension
+        self.cache_size = cache_size
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self._last_batch_size = 0
+
+    def encode(self, queries: List[str], batch_size: int = 64) -> np.ndarray:
+        """Unit-length float32 embeddings, one row per query"""
+        keys = [normalize_text(query) for query in queries]
+        embeddings = np.empty((len(queries), self.dimension), dtype='float32')
+
+        missing = {}
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    embeddings[i] = cached
+            self.hits += len(keys) - sum(len(rows) for rows in missing.values())
+            self.misses += len(missing)
+
+        if not missing:
+            return embeddings
+
+        texts = list(missing)
+        if len(texts) == 1:
+            new_embeddings = self._submit(texts[0]).result()[None, :]
+        else:
+            new_embeddings = self._encode_now(texts, batch_size)
+
+        for text, embedding in zip(texts, new_embeddings):
+            embeddings[missing[text]] = embedding
+        self._remember(texts, new_embeddings)
+        return embeddings
+
+    def stats(self) -> Dict:
+        with self._cache_lock:
+            return {'cached': len(self._cache), 'hits': self.hits, 'misses': self.misses, 'batches': self.batches}
+
+    def _remember(self, keys: List[str], embeddings: np.ndarray):
+        with self._cache_lock:
+            for key, embedding in zip(keys, embeddings):
+                self._cache[key] = embedding
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _encode_now(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        embeddings = np.asarray(self.model_loader().encode(texts, batch_size=batch_size), dtype='float32')
+        faiss.normalize_L2(embeddings)
+        self.batches += 1
+        return embeddings
+
+    def _submit(self, text: str) -> Future:
+        future = Future()
+        self._queue.put((text, future))
+        if self._worker is None or not self._worker.is_alive():
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, daemon=True)
+                    self._worker.start()
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Take whatever is already queued, and when the last batch showed
+            # concurrent traffic, whatever else arrives within the wait window
+            wait = self.max_wait if self._last_batch_size > 1 else 0
+            deadline = time.monotonic() + wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._last_batch_size = len(batch)
+
+            # Concurrent requests for the same query share one row
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                embeddings = dict(zip(texts, self._encode_now(texts)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for text, future in batch:
+                future.set_result(embeddings[text])
@@ -1,27 +1,154 @@
 # backend/scraper.py
 import asyncio
 import aiohttp
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import json
-from difflib import SequenceMatcher
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional
 import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from urllib.robotparser import RobotFileParser
+
+from crawl_cache import CrawlCache
+from html_parser import DEFAULT_PARSER, parse_html
+from sitemaps import parse_sitemap
 
 logger = logging.getLogger(__name__)
 
+# Crawl limits; `workers` bounds the requests in flight, `per_host` those to one host
+SCRAPER_SETTINGS = dict(
+    max_pages=int(os.getenv("SCRAPER_MAX_PAGES", "20")),
+    max_depth=int(os.getenv("SCRAPER_MAX_DEPTH", "2")),
+    workers=int(os.getenv("SCRAPER_WORKERS", "8")),
+    per_host=int(os.getenv("SCRAPER_PER_HOST", "4")),
+    links_per_page=int(os.getenv("SCRAPER_LINKS_PER_PAGE", "5")),
+    request_timeout=float(os.getenv("SCRAPER_REQUEST_TIMEOUT", "10")),
+    parser=os.getenv("SCRAPER_PARSER", DEFAULT_PARSER),
+    # robots.txt rules and crawl delays are honoured, and the pages listed in
+    # the site's sitemaps (at most max_sitemaps files, max_sitemap_urls
+    # pages) are queued before any link is followed
+    respect_robots=os.getenv("SCRAPER_ROBOTS", "1") != "0",
+    sitemaps=os.getenv("SCRAPER_SITEMAPS", "1") != "0",
+    max_sitemaps=int(os.getenv("SCRAPER_MAX_SITEMAPS", "20")),
+    max_sitemap_urls=int(os.getenv("SCRAPER_MAX_SITEMAP_URLS", "50000")),
+)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# HTML is parsed in this many processes, so a large page neither stalls the
+# event loop nor holds the GIL it needs; 0 parses in a thread instead
+PARSER_WORKERS = int(os.getenv("SCRAPER_PARSER_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Pages with an ETag or Last-Modified header are cached here and revalidated
+# on the next crawl; an empty path turns the cache off
+CRAWL_CACHE_PATH = os.getenv("CRAWL_CACHE_PATH", "crawl_cache.sqlite")
+CRAWL_CACHE_MAX_AGE_DAYS = float(os.getenv("CRAWL_CACHE_MAX_AGE_DAYS", "30"))
+
+
+# Link keywords by how much the pages they lead to are worth; a link scores
+# the summed weights of the keywords in its url and anchor text
+LINK_KEYWORDS = {
+    'fee': 3, 'admission': 3, 'faq': 3, 'eligibility': 2, 'application': 2, 'enroll': 2,
+    'course': 2, 'program': 2, 'contact': 1, 'campus': 1, 'academic': 1, 'student': 1, 'faculty': 1,
+}
+
+
+class KeywordMatcher:
+    """Weighted keyword scoring with one precompiled regex, so a text is scanned once for all keywords"""
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = {keyword.lower(): weight for keyword, weight in weights.items()}
+        # Longest first, so a keyword is not shadowed by one of its prefixes
+        alternatives = sorted(self.weights, key=len, reverse=True)
+        self.pattern = re.compile('|'.join(re.escape(keyword) for keyword in alternatives))
+
+    def score(self, text: str) -> float:
+        """Summed weights of the distinct keywords in `text`"""
+        return sum(self.weights[keyword] for keyword in set(self.pattern.findall(text.lower())))
+
+
+class ParsePool(Executor):
+    """Process pool that starts over once one of its workers dies
+
+    A worker killed mid-parse (by the OOM killer, say) breaks a
+    ProcessPoolExecutor for good: the parses in flight fail with
+    BrokenProcessPool, and so would every later one. Here the next
+    submit replaces the broken pool with a new one.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        with self._lock:
+            try:
+                return self._pool.submit(fn, *args, **kwargs)
+            except BrokenProcessPool:
+                logger.warning("A parser process died; starting a new pool")
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._new_pool()
+                return self._pool.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._lock:
+            self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
 
 class WebScraper:
-    def __init__(self):
+    def __init__(self, max_pages: int = 20, max_depth: int = 2, workers: int = 8, per_host: int = 4,
+                 links_per_page: int = 5, request_timeout: float = 10, cache: CrawlCache = None,
+                 parser: str = DEFAULT_PARSER, parse_executor: Executor = None, keywords: Dict[str, float] = None,
+                 respect_robots: bool = True, sitemaps: bool = True, max_sitemaps: int = 20,
+                 max_sitemap_urls: int = 50000):
         self.visited_urls = set()
-        self.max_depth = 2  # Reduced depth
-        self.max_pages = 20  # Limit total pages
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.workers = workers
+        self.per_host = per_host
+        self.links_per_page = links_per_page
+        self.request_timeout = request_timeout
+        self.cache = cache
+        self.parser = parser
+        self.parse_executor = parse_executor
+        self.respect_robots = respect_robots
+        self.use_sitemaps = sitemaps
+        self.max_sitemaps = max_sitemaps
+        self.max_sitemap_urls = max_sitemap_urls
+
+        self.base_url = None
+        # robots.txt rules, seconds between requests and the earliest next request, by host
+        self.robots: Dict[str, RobotFileParser] = {}
+        self.crawl_delays: Dict[str, float] = {}
+        self.next_request: Dict[str, float] = {}
+        # Sitemap lastmod timestamps of the queued pages that have one
+        self.lastmod: Dict[str, float] = {}
         self.pages_scraped = 0
-
-        self.keywords = [
-            'faq', 'admission', 'application', 'enroll', 'fee', 'contact', 'course',
-            'campus', 'program', 'eligibility', 'academic', 'student', 'faculty'
-        ]
+        self.pages_failed = 0
+        self.pages_not_modified = 0
+        # Cached pages whose sitemap lastmod says they did not change since, served without a request
+        self.pages_skipped = 0
+        self.pages_disallowed = 0
+        self.sitemaps_fetched = 0
+        self.sitemap_urls = 0
+        # Fetched urls that no longer exist or no longer have content
+        self.gone_urls = set()
+        self.bytes_downloaded = 0
+        self.pages_with_content = 0
+        self.pages_queued = 0
+        self.elapsed = 0.0
+
+        self.link_matcher = KeywordMatcher(keywords or LINK_KEYWORDS)
 
     def is_internal_link(self, base_url: str, url: str) -> bool:
         try:
@@ -31,35 +158,146 @@ class WebScraper:
         except Exception:
             return False
 
-    def similar(self, a: str, b: str) -> float:
-        try:
-            return SequenceMatcher(None, a.lower(), b.lower()).ratio()
-        except Exception:
-            return 0.0
+    def link_score(self, href: str, text: str) -> float:
+        return self.link_matcher.score(href + " " + text)
 
     def is_relevant_link(self, href: str, text: str) -> bool:
+        return self.link_score(href, text) > 0
+
+    def is_allowed(self, url: str) -> bool:
+        robots = self.robots.get(urlparse(url).netloc)
+        return robots is None or robots.can_fetch(USER_AGENT, url)
+
+    async def wait_for_host(self, url: str):
+        """Space requests to a host by its robots.txt crawl delay
+
+        Each request reserves the next free slot before it sleeps, so
+        concurrent workers queue up behind each other instead of all
+        firing once the delay has passed.
+        """
+        host = urlparse(url).netloc
+        delay = self.crawl_delays.get(host)
+        if not delay:
+            return
+        now = asyncio.get_running_loop().time()
+        start = max(now, self.next_request.get(host, now))
+        self.next_request[host] = start + delay
+        await asyncio.sleep(start - now)
+
+    async def load_robots(self, session: aiohttp.ClientSession, url: str):
+        """Fetch the robots.txt of url's host; a missing or unreachable one allows everything"""
+        host = urlparse(url).netloc
+        robots = RobotFileParser(urljoin(url, '/robots.txt'))
         try:
-            target_str = (href + " " + text).lower()
-            for kw in self.keywords:
-                if kw in target_str:
-                    return True
-                if self.similar(kw, target_str) > 0.6:
-                    return True
-            return False
-        except Exception:
-            return False
+            async with session.get(robots.url, timeout=self.request_timeout,
+                                   headers={'User-Agent': USER_AGENT}) as response:
+                if response.status == 200:
+                    self.bytes_downloaded += len(await response.read())
+                    robots.parse((await response.text(errors='replace')).splitlines())
+                elif response.status in (401, 403):
+                    robots.disallow_all = True
+                else:
+                    robots.allow_all = True
+        except Exception as e:
+            logger.warning(f"Could not fetch {robots.url}: {str(e)}")
+            robots.allow_all = True
+        self.robots[host] = robots
+
+        delay = float(robots.crawl_delay(USER_AGENT) or 0)
+        rate = robots.request_rate(USER_AGENT)
+        if rate and rate.requests:
+            delay = max(delay, rate.seconds / rate.requests)
+        if delay:
+            logger.info(f"Waiting {delay:g}s between requests to {host}")
+            self.crawl_delays[host] = delay
+
+    async def sitemap_pages(self, session: aiohttp.ClientSession, base_url: str) -> Dict[str, Optional[float]]:
+        """url -> lastmod timestamp (or None) of the site's pages listed in its sitemaps
+
+        Sitemaps come from robots.txt, or /sitemap.xml if it lists none;
+        sitemap indexes are followed and gzipped sitemaps decompressed.
+        """
+        robots = self.robots.get(urlparse(base_url).netloc)
+        queue = list((robots.site_maps() if robots else None) or [urljoin(base_url, '/sitemap.xml')])
+        seen = set()
+        pages = {}
+        loop = asyncio.get_running_loop()
+        while queue and len(seen) < self.max_sitemaps and len(pages) < self.max_sitemap_urls:
+            sitemap_url = queue.pop(0)
+            if sitemap_url in seen:
+                continue
+            seen.add(sitemap_url)
+            try:
+                await self.wait_for_host(sitemap_url)
+                async with session.get(sitemap_url, timeout=self.request_timeout,
+                                       headers={'User-Agent': USER_AGENT}) as response:
+                    if response.status != 200:
+                        logger.info(f"HTTP {response.status} for sitemap {sitemap_url}")
+                        continue
+                    data = await response.read()
+                self.bytes_downloaded += len(data)
+                parsed = await loop.run_in_executor(self.parse_executor, parse_sitemap, data)
+            except Exception as e:
+                logger.warning(f"Could not read sitemap {sitemap_url}: {str(e)}")
+                continue
+            self.sitemaps_fetched += 1
+            queue.extend(parsed['sitemaps'])
+            for url, lastmod in parsed['pages']:
+                url = url.split('#')[0].split('?')[0]
+                if len(pages) < self.max_sitemap_urls and self.is_internal_link(base_url, url):
+                    pages[url] = max(lastmod or 0, pages.get(url) or 0) or None
+        return pages
+
+    async def seed_from_sitemaps(self, session: aiohttp.ClientSession, frontier: asyncio.PriorityQueue,
+                                 base_url: str):
+        """Queue the pages in the site's sitemaps, ahead of the links found by crawling
+
+        Pages are fetched best scoring first and, among equals, most
+        recently modified first.
+        """
+        pages = await self.sitemap_pages(session, base_url)
+        scored = [(self.link_score(url, ''), lastmod or 0, url) for url, lastmod in pages.items()]
+        for score, lastmod, url in sorted(scored, key=lambda page: (-page[0], -page[1])):
+            if lastmod:
+                self.lastmod[url] = lastmod
+            self.enqueue(frontier, url, 0, score)
+        self.sitemap_urls = len(pages)
+        logger.info(f"Queued {len(pages)} pages from {self.sitemaps_fetched} sitemaps")
 
     async def fetch_page(self, session: aiohttp.ClientSession, url: str) -> str:
         try:
             headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+                'User-Agent': USER_AGENT
             }
-            async with session.get(url, timeout=10, headers=headers) as response:
+            cached = await asyncio.to_thread(self.cache.get, url) if self.cache else None
+            if cached and url in self.lastmod and cached['checked'] >= self.lastmod[url]:
+                self.pages_skipped += 1
+                return cached['body']
+            if cached and cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached and cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+            await self.wait_for_host(url)
+            async with session.get(url, timeout=self.request_timeout, headers=headers) as response:
+                if response.status == 304 and cached:
+                    self.pages_not_modified += 1
+                    await asyncio.to_thread(self.cache.touch, url)
+                    return cached['body']
                 if response.status != 200:
                     logger.warning(f"HTTP {response.status} for {url}")
+                    if response.status in (404, 410):
+                        self.gone_urls.add(url)
                     return None
+                self.bytes_downloaded += len(await response.read())
                 content = await response.text()
-                return content
+
+            etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+            if self.cache and (etag or last_modified):
+                await asyncio.to_thread(self.cache.put, url, content, etag, last_modified)
+            elif cached:
+                await asyncio.to_thread(self.cache.delete, url)
+            return content
         except asyncio.TimeoutError:
             logger.warning(f"Timeout fetching {url}")
             return None
@@ -67,122 +305,174 @@ class WebScraper:
             logger.error(f"Error fetching {url}: {str(e)}")
             return None
 
-    async def scrape_page(self, session: aiohttp.ClientSession, url: str, base_url: str, depth: int) -> List[Dict]:
-        # Check limits
-        if (url in self.visited_urls or
-                depth > self.max_depth or
-                self.pages_scraped >= self.max_pages):
-            return []
-
-        self.visited_urls.add(url)
-        self.pages_scraped += 1
-        logger.info(f"Scraping (depth {depth}, page {self.pages_scraped}): {url}")
+    async def parse_page(self, html: str, url: str):
+        """(page data or None if the page has no content, candidate links) of a fetched page
 
+        Parsing runs on `parse_executor` (a thread if None), never on the event loop.
+        A page lost because another one killed a parser process is parsed
+        once more on the new pool.
+        """
+        loop = asyncio.get_running_loop()
         try:
-            html = await self.fetch_page(session, url)
-            if not html:
-                return []
-
-            soup = BeautifulSoup(html, 'html.parser')
-
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-
-            title = soup.title.string.strip() if soup.title and soup.title.string else 'No Title'
-
-            # Extract text content with better filtering
-            paragraphs = []
-            for p in soup.find_all('p'):
-                text = p.get_text(strip=True)
-                if text and len(text) > 20:  # Filter out very short paragraphs
-                    paragraphs.append(text)
-
-            headings = []
-            for h in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-                text = h.get_text(strip=True)
-                if text:
-                    headings.append(text)
+            parsed = await loop.run_in_executor(self.parse_executor, parse_html, html, self.parser)
+        except BrokenProcessPool:
+            parsed = await loop.run_in_executor(self.parse_executor, parse_html, html, self.parser)
 
-            # Only include pages with substantial content
-            if not paragraphs and not headings:
-                logger.info(f"Skipping {url} - no content found")
-                return []
+        # Filter out very short paragraphs
+        paragraphs = [text for text in parsed['paragraphs'] if len(text) > 20]
+        headings = parsed['headings']
 
+        page_data = None
+        if paragraphs or headings:
             page_data = {
                 'url': url,
-                'title': title,
+                'title': parsed['title'] or 'No Title',
                 'paragraphs': paragraphs[:50],  # Limit paragraphs
                 'headings': headings[:20]  # Limit headings
             }
 
-            results = [page_data]
-
-            # Find relevant links for further scraping (only if not at max depth)
-            if depth < self.max_depth and self.pages_scraped < self.max_pages:
-                links = []
-                for link in soup.find_all('a', href=True):
-                    try:
-                        href = link['href']
-                        text = link.get_text(strip=True)
-                        absolute_link = urljoin(url, href)
-
-                        # Clean the URL (remove fragments and query params for deduplication)
-                        clean_url = absolute_link.split('#')[0].split('?')[0]
-
-                        if (clean_url not in self.visited_urls and
-                                self.is_internal_link(base_url, absolute_link) and
-                                self.is_relevant_link(href, text) and
-                                len(links) < 5):  # Limit links per page
-                            links.append(clean_url)
-                    except Exception as e:
-                        logger.error(f"Error processing link: {e}")
-                        continue
-
-                # Process links with controlled concurrency
-                if links:
-                    semaphore = asyncio.Semaphore(3)  # Reduce concurrency
-
-                    async def scrape_with_semaphore(link):
-                        async with semaphore:
-                            try:
-                                return await self.scrape_page(session, link, base_url, depth + 1)
-                            except Exception as e:
-                                logger.error(f"Error in recursive scrape: {e}")
-                                return []
-
-                    tasks = [scrape_with_semaphore(link) for link in links]
-                    try:
-                        nested_results = await asyncio.gather(*tasks, return_exceptions=True)
-
-                        for nested_result in nested_results:
-                            if isinstance(nested_result, list):
-                                results.extend(nested_result)
-                            elif isinstance(nested_result, Exception):
-                                logger.error(f"Task failed: {nested_result}")
-                    except Exception as e:
-                        logger.error(f"Error gathering results: {e}")
-
-            return results
-
-        except Exception as e:
-            logger.error(f"Critical error scraping {url}: {str(e)}")
-            return []
-
-
-async def scrape_college_website(base_url: str) -> List[Dict]:
-    """Main function to scrape college website"""
-    try:
-        scraper = WebScraper()
-
-        connector = aiohttp.TCPConnector(limit=10, limit_per_host=5)
+        # The best scoring relevant links, by url
+        scores = {}
+        for href, text in parsed['links']:
+            try:
+                absolute_link = urljoin(url, href)
+
+                # Clean the URL (remove fragments and query params for deduplication)
+                clean_url = absolute_link.split('#')[0].split('?')[0]
+
+                if clean_url not in self.visited_urls and self.is_internal_link(self.base_url, absolute_link):
+                    score = self.link_score(href, text)
+                    if score > scores.get(clean_url, 0):
+                        scores[clean_url] = score
+            except Exception as e:
+                logger.error(f"Error processing link: {e}")
+                continue
+        # Limit links per page; ties keep document order
+        links = sorted(scores.items(), key=lambda link: -link[1])[:self.links_per_page]
+        return page_data, links
+
+    def enqueue(self, frontier: asyncio.PriorityQueue, url: str, depth: int, score: float = 0):
+        """Queue a url once; urls are deduplicated before they are fetched
+
+        The highest scoring url is fetched next, the shallowest among equals.
+        """
+        if url in self.visited_urls or depth > self.max_depth:
+            return
+        self.visited_urls.add(url)
+        if self.respect_robots and not self.is_allowed(url):
+            self.pages_disallowed += 1
+            return
+        self.pages_queued += 1
+        frontier.put_nowait((-score, depth, len(self.visited_urls), url))
+
+    async def scrape_page(self, session: aiohttp.ClientSession, frontier: asyncio.PriorityQueue,
+                          output: asyncio.Queue, url: str, depth: int, score: float):
+        # Claim a slot of the page budget before the first await
+        if self.pages_scraped >= self.max_pages:
+            return
+        self.pages_scraped += 1
+        logger.info(f"Scraping (depth {depth}, score {score:g}, page {self.pages_scraped}): {url}")
+
+        html = await self.fetch_page(session, url)
+        if not html:
+            self.pages_failed += 1
+            return
+
+        page_data, links = await self.parse_page(html, url)
+        if depth < self.max_depth:
+            for link, link_score in links:
+                self.enqueue(frontier, link, depth + 1, link_score)
+
+        if page_data:
+            self.pages_with_content += 1
+            # Waits while the consumer is behind, which holds this worker back
+            await output.put(page_data)
+        else:
+            logger.info(f"Skipping {url} - no content found")
+            self.gone_urls.add(url)
+
+    async def worker(self, session: aiohttp.ClientSession, frontier: asyncio.PriorityQueue, output: asyncio.Queue):
+        while True:
+            priority, depth, _, url = await frontier.get()
+            try:
+                await self.scrape_page(session, frontier, output, url, depth, -priority)
+            except Exception as e:
+                logger.error(f"Critical error scraping {url}: {str(e)}")
+            finally:
+                frontier.task_done()
+
+    async def pages(self, base_url: str) -> AsyncIterator[Dict]:
+        """Crawl from base_url, best scoring links first, yielding pages as they are parsed
+
+        A fixed pool of workers takes urls from one priority frontier, so the
+        number of requests in flight never exceeds `workers` in total and
+        `per_host` per host, however wide the site is, and the page budget
+        goes to the links that look most useful (fees, admissions, FAQ).
+        The site's sitemap pages are queued first, so a large site is
+        covered without crawling through its navigation pages.
+        Parsed pages wait in a small queue, so a slow consumer slows the
+        crawl down instead of letting pages pile up in memory.
+        """
+        started = time.perf_counter()
+        self.base_url = base_url
+        frontier = asyncio.PriorityQueue()
+        output = asyncio.Queue(maxsize=2 * self.workers)
+
+        async def finish():
+            await frontier.join()
+            await output.put(None)
+
+        connector = aiohttp.TCPConnector(limit=self.workers, limit_per_host=self.per_host)
         timeout = aiohttp.ClientTimeout(total=30, connect=10)
-
-        async with aiohttp.ClientSession(
-                connector=connector,
-                timeout=timeout
-        ) as session:
-            results = await scraper.scrape_page(session, base_url, base_url, 0)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            if self.respect_robots:
+                await self.load_robots(session, base_url)
+            self.enqueue(frontier, base_url, 0)
+            self.visited_urls.add(base_url.split('#')[0].split('?')[0])
+            if self.use_sitemaps:
+                await self.seed_from_sitemaps(session, frontier, base_url)
+
+            tasks = [asyncio.create_task(self.worker(session, frontier, output)) for _ in range(self.workers)]
+            tasks.append(asyncio.create_task(finish()))
+            try:
+                while (page := await output.get()) is not None:
+                    yield page
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.elapsed = time.perf_counter() - started
+        logger.info(f"Fetched {self.pages_scraped} pages ({self.pages_failed} failed, "
+                    f"{self.pages_not_modified} not modified, {self.pages_skipped} unchanged in sitemap, "
+                    f"{self.pages_disallowed} disallowed, {self.bytes_downloaded} bytes) in {self.elapsed:.1f}s, "
+                    f"{self.stats()['pages_per_second']} pages/s")
+
+    async def crawl(self, base_url: str) -> List[Dict]:
+        """Every page of pages(base_url), in the order they were parsed"""
+        return [page async for page in self.pages(base_url)]
+
+    def stats(self) -> Dict:
+        return {
+            'pages_fetched': self.pages_scraped,
+            'pages_failed': self.pages_failed,
+            'pages_not_modified': self.pages_not_modified,
+            'pages_skipped': self.pages_skipped,
+            'pages_disallowed': self.pages_disallowed,
+            'sitemaps_fetched': self.sitemaps_fetched,
+            'sitemap_urls': self.sitemap_urls,
+            'bytes_downloaded': self.bytes_downloaded,
+            'pages_with_content': self.pages_with_content,
+            'seconds': round(self.elapsed, 2),
+            'pages_per_second': round(self.pages_scraped / self.elapsed, 2) if self.elapsed else 0.0,
+        }
+
+
+async def scrape_college_website(base_url: str, scraper: WebScraper = None) -> List[Dict]:
+    """Main function to scrape college website, seeded from its robots.txt and sitemaps"""
+    try:
+        scraper = scraper or WebScraper(cache=crawl_cache, parse_executor=parse_executor, **SCRAPER_SETTINGS)
+        results = await scraper.crawl(base_url)
 
         logger.info(f"Scraping completed. Found {len(results)} pages")
 
@@ -196,3 +486,8 @@ async def scrape_college_website(base_url: str) -> List[Dict]:
     except Exception as e:
         logger.error(f"Fatal error in scrape_college_website: {str(e)}")
         raise Exception(f"Scraping failed: {str(e)}")
+
+
+# Global instances; worker processes start on the first parse
+crawl_cache = CrawlCache(Path(CRAWL_CACHE_PATH), CRAWL_CACHE_MAX_AGE_DAYS) if CRAWL_CACHE_PATH else None
+parse_executor = ParsePool(PARSER_WORKERS) if PARSER_WORKERS else None
@@ -0,0 +1,77 @@
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+try:
+    from lxml import etree
+except ImportError:  # the standard library parser is used instead
+    etree = None
+    from xml.etree import ElementTree
+
+# The sitemap protocol caps a sitemap at 50MB uncompressed
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def decompress(data: bytes) -> bytes:
+    """The body of a gzipped sitemap, or `data` itself if it is not gzipped"""
+    if not data.startswith(GZIP_MAGIC):
+        return data
+    # Bounded, so a small file cannot expand without limit
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    body = decompressor.decompress(data, MAX_SITEMAP_BYTES)
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"Sitemap is larger than {MAX_SITEMAP_BYTES} bytes uncompressed")
+    return body
+
+
+def parse_lastmod(text: Optional[str]) -> Optional[float]:
+    """Timestamp of a W3C datetime (2024, 2024-05, 2024-05-01, 2024-05-01T10:00:00+02:00), or None"""
+    if not text:
+        return None
+    text = text.strip()
+    if len(text) == 4:
+        text += '-01-01'
+    elif len(text) == 7:
+        text += '-01'
+    try:
+        value = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _local_name(tag) -> str:
+    # Comments and processing instructions have no string tag
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+
+def parse_sitemap(data: bytes) -> Dict:
+    """Child sitemap urls of a sitemap index, or (url, lastmod timestamp) pages of a urlset
+
+    `data` may be gzipped. Returns {'sitemaps': [...], 'pages': [...]}, with
+    one of the two empty.
+    """
+    data = decompress(data)
+    if etree is not None:
+        parser = etree.XMLParser(resolve_entities=False, no_network=True, recover=True, remove_comments=True)
+        root = etree.fromstring(data, parser=parser)
+    else:
+        root = ElementTree.fromstring(data)
+    result = {'sitemaps': [], 'pages': []}
+    if root is None:
+        return result
+
+    kind = _local_name(root.tag)
+    for entry in root:
+        fields = {_local_name(child.tag): (child.text or '').strip() for child in entry}
+        if not fields.get('loc'):
+            continue
+        if kind == 'sitemapindex':
+            result['sitemaps'].append(fields['loc'])
+        elif kind == 'urlset':
+            result['pages'].append((fields['loc'], parse_lastmod(fields.get('lastmod'))))
+    return result
+
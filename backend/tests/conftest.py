@@ -0,0 +1,38 @@
+import hashlib
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# The global stores and the crawl cache live under the working directory
+os.chdir(tempfile.mkdtemp(prefix="backend-tests-"))
+os.environ.setdefault("CRAWL_CACHE_PATH", "")
+
+import vector_store  # noqa: E402
+
+
+class HashModel:
+    """Stand-in sentence transformer: a fixed random unit vector per text"""
+
+    max_seq_length = 256
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        vectors = [np.random.default_rng(int(hashlib.md5(text.encode()).hexdigest()[:8], 16)).standard_normal(384)
+                   for text in texts]
+        return np.array(vectors, dtype='float32').reshape(len(texts), 384)
+
+
+@pytest.fixture(autouse=True)
+def hash_model(monkeypatch):
+    monkeypatch.setitem(vector_store._models, 'all-MiniLM-L6-v2', HashModel())
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    def make(**settings):
+        return vector_store.VectorStore(storage_path=tmp_path / "store", **settings)
+    return make
@@ -0,0 +1,35 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.mark.parametrize('path, body', [
+    ("/query", {'query': "When do applications close?"}),
+    ("/query/batch", {'queries': ["When do applications close?"], 'generate_answers': False}),
+])
+@pytest.mark.parametrize('k', [0, main.MAX_QUERY_K + 1])
+def test_queries_reject_out_of_range_k(path, body, k):
+    response = TestClient(main.app).post(path, json={**body, 'k': k})
+    assert response.status_code == 422
+
+
+def test_ready_reports_namespace_memory():
+    body = TestClient(main.app).get("/ready").json()
+    assert set(body['namespaces']) == {'loaded_namespaces', 'memory_usage', 'memory_budget'}
+    assert body['namespaces']['memory_budget'] == main.namespaces.memory_budget
+
+
+def test_naive_ingest_bounds_are_utc(monkeypatch):
+    # 2024-05-01T00:00:00Z, whatever the server's time zone
+    monkeypatch.setenv('TZ', 'Asia/Kolkata')
+    time.tzset()
+    try:
+        filters = main.SearchFilters(ingested_after="2024-05-01T00:00:00",
+                                     ingested_before="2024-05-01T05:30:00+05:30").search_filters()
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    assert filters == {'ingested_after': 1714521600, 'ingested_before': 1714521600}
@@ -0,0 +1,36 @@
+import main
+
+
+def college_pages(count, suffix=''):
+    return [{'url': f"https://college.example/{i}{suffix}", 'title': f"Page {i}", 'headings': [],
+             'paragraphs': [f"Department {i} offers a bachelor programme in subject {i} with small seminar groups, "
+                            f"weekly tutorials and a final year research project supervised by faculty {i}."]}
+            for i in range(count)]
+
+
+def test_scrape_drops_copies_of_existing_pages(make_store):
+    store = make_store()
+    main.process_scraped_data(college_pages(5), store)
+
+    ingestion = main.PageIngestion(store)
+    ingestion.ingest(college_pages(5, suffix='?print=1'))
+    report = ingestion.finish()
+    assert report['pages_added'] == 5
+    assert ingestion.upserted['near_duplicates'] == 5
+    assert ingestion.upserted['added'] == 0
+
+
+def test_recrawl_strips_footer_kept_on_unchanged_page(make_store):
+    footer = "Campus College, 12 University Road. Contact the admissions office for help with applications."
+    pages = [{**page, 'paragraphs': page['paragraphs'] + [footer]} for page in college_pages(2)]
+    store = make_store()
+    main.process_scraped_data(pages, store)
+
+    # Page 0 still carries the footer in its stored chunks; page 1 changed
+    pages[1] = {**pages[1], 'paragraphs': ["Department 1 now also offers evening classes for working students, "
+                                           "with the same seminar groups and a shorter final project.", footer]}
+    ingestion = main.PageIngestion(store)
+    ingestion.ingest(pages)
+    ingestion.finish()
+    assert ingestion.report['pages_unchanged'] == 1
+    assert ingestion.boilerplate['paragraphs'] == 1
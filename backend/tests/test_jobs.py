@@ -0,0 +1,43 @@
+import asyncio
+import threading
+import time
+
+import main
+from jobs import JobManager
+from test_ingest import college_pages
+
+
+def test_cancelled_rebuild_leaves_store_unchanged(make_store, monkeypatch):
+    store = make_store()
+    main.process_scraped_data(college_pages(5), store)
+    before = store.search("bachelor programme", k=5)
+
+    async def pages(self, base_url):
+        for page in college_pages(3, suffix='?v=2'):
+            yield page
+    monkeypatch.setattr(main.WebScraper, 'pages', pages)
+
+    encoding = threading.Event()
+    encode = store.embedding_cache.encode
+
+    def slow_encode(model, texts):
+        encoding.set()
+        time.sleep(0.5)
+        return encode(model, texts)
+    monkeypatch.setattr(store.embedding_cache, 'encode', slow_encode)
+
+    async def cancel_during_rebuild():
+        jobs = JobManager()
+        request = main.ScrapeRequest(url="https://college.example/", rebuild=True)
+        job = jobs.submit(lambda job: main.run_scrape_job(job, request=request, store=store))
+        await asyncio.to_thread(encoding.wait, 5)
+        jobs.cancel(job.id)
+        while job.active:
+            await asyncio.sleep(0.01)
+        return job
+
+    job = asyncio.run(cancel_during_rebuild())
+    assert job.status == 'cancelled'
+    time.sleep(0.6)
+    assert store.status()['documents'] == 5
+    assert store.search("bachelor programme", k=5) == before
@@ -0,0 +1,25 @@
+import lexical_index
+from lexical_index import LexicalIndex
+
+
+def test_common_terms_only_query_scores_impact_heads_and_newer_chunks(monkeypatch):
+    monkeypatch.setattr(lexical_index, 'IMPACT_HEAD_SIZE', 5)
+    index = LexicalIndex()
+    # "campus" and "hostel" are in every chunk, most often in the last three
+    texts = [f"campus hostel room {i}" for i in range(37)] + ["campus campus hostel hostel room"] * 3
+    index.add(range(40), texts)
+
+    ids, scores = index.search("campus hostel", 3)
+    exhaustive_ids, exhaustive_scores = index._search("campus hostel", 3, None, bounded=False)[:2]
+    assert sorted(ids.tolist()) == sorted(exhaustive_ids.tolist()) == [37, 38, 39]
+    assert scores.tolist() == exhaustive_scores.tolist()
+
+    # Chunks added after the heads were picked are candidates too
+    index.add([40], ["campus " * 8 + "hostel " * 8])
+    assert index.search("campus hostel", 1)[0].tolist() == [40]
+
+    # Too few live matches in the heads falls back to the whole lists
+    index.remove(range(30, 41))
+    index.prune()
+    ids, _ = index.search("campus hostel", 30)
+    assert sorted(ids.tolist()) == list(range(30))
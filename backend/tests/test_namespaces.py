@@ -0,0 +1,54 @@
+from namespaces import NamespaceRegistry
+from vector_store import VectorStore
+
+
+def filled_store(path, count=20):
+    store = VectorStore(storage_path=path, near_duplicate_distance=-1)
+    store.add_documents([{'text': f"Chunk {i} of {path.name}", 'url': f"https://{path.name}.example/{i}"}
+                         for i in range(count)])
+    return store
+
+
+def test_eviction_keeps_default_and_searched_stores(tmp_path):
+    default = filled_store(tmp_path / "default")
+    registry = NamespaceRegistry(tmp_path, memory_budget=0, default_store=default)
+    registry.get(None)
+    site = registry.get("site")
+    site.add_documents([{'text': "Admissions open in May", 'url': "https://site.example/admissions"}])
+
+    # A search in progress on "site" keeps it loaded
+    site._searches += 1
+    registry.get("other")
+    assert default.is_loaded() and site.is_loaded()
+    site._searches -= 1
+
+    registry.get("other")
+    assert default.is_loaded()
+    assert not site.is_loaded()
+
+
+def test_store_reloaded_outside_get_counts_against_budget(tmp_path):
+    registry = NamespaceRegistry(tmp_path, memory_budget=0, default_store=filled_store(tmp_path / "default"))
+    site = registry.get("site")
+    site.add_documents([{'text': "Fees are due in June", 'url': "https://site.example/fees"}])
+    registry.get("other")
+    assert not site.is_loaded()
+
+    # An ingest holding the store loads it again without going through get()
+    site.add_documents([{'text': "Hostel fees are due in July", 'url': "https://site.example/hostel"}])
+    assert site.is_loaded()
+    registry.get("other")
+    assert not site.is_loaded()
+
+
+def test_status_reports_loaded_namespaces_against_budget(tmp_path):
+    registry = NamespaceRegistry(tmp_path, memory_budget=10 ** 9, default_store=filled_store(tmp_path / "default"))
+    registry.get(None)
+    site = registry.get("site")
+    site.add_documents([{'text': "Admissions open in May", 'url': "https://site.example/admissions"}])
+
+    status = registry.status()
+    assert list(status['loaded_namespaces']) == ["default", "site"]
+    assert status['loaded_namespaces']["site"] == site.memory_usage() > 0
+    assert status['memory_usage'] == sum(status['loaded_namespaces'].values())
+    assert status['memory_budget'] == 10 ** 9
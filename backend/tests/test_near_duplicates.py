@@ -0,0 +1,22 @@
+from near_duplicates import RepeatedParagraphFilter
+
+FEE_TEXT = ("The annual tuition fee for the bachelor of science in computer engineering programme is {fee} rupees, "
+            "payable in two instalments at the start of each semester through the student portal or at the "
+            "accounts office on the main campus between nine and four on working days.")
+
+
+def test_chunks_differing_only_in_a_fee_are_kept(make_store):
+    store = make_store()
+    store.add_documents([{'text': FEE_TEXT.format(fee='85000'), 'url': "https://college.example/fees"}])
+    result = store.upsert_urls({"https://college.example/fees/2025": [{'text': FEE_TEXT.format(fee='92000')}],
+                                "https://college.example/fees/copy": [{'text': FEE_TEXT.format(fee='85000') + " "}]})
+    assert result['added'] == 1
+    assert result['near_duplicates'] == 1
+    assert store.status()['documents'] == 2
+
+
+def test_repeated_paragraphs_with_other_numbers_are_kept():
+    pages = [{'url': f"https://college.example/{i}", 'paragraphs': [FEE_TEXT.format(fee=fee)]}
+             for i, fee in enumerate(('85000', '85000', '92000'))]
+    stripped = list(RepeatedParagraphFilter(4).strip(pages))
+    assert [len(page['paragraphs']) for page in stripped] == [1, 0, 1]
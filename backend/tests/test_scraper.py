@@ -0,0 +1,19 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from html_parser import DEFAULT_PARSER, parse_html
+from scraper import ParsePool
+
+
+def test_parse_pool_recovers_after_a_worker_dies():
+    pool = ParsePool(1)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            pool.submit(os._exit, 1).result(timeout=60)
+        html = "<html><title>Admissions</title><body><p>Applications close in March.</p></body></html>"
+        parsed = pool.submit(parse_html, html, DEFAULT_PARSER).result(timeout=60)
+        assert parsed['title'] == 'Admissions'
+    finally:
+        pool.shutdown()
@@ -0,0 +1,47 @@
+from test_storage import chunks, reopen, texts
+from vector_store import SNAPSHOT_POINTER, VectorStore
+
+
+def test_rebuild_rollback_and_reopen(tmp_path):
+    store = VectorStore(storage_path=tmp_path, compact_every=1000, near_duplicate_distance=-1)
+    store.add_documents(chunks(0, 5))
+    original = store.data_path.name
+    ids, next_id = store.documents.column('id').tolist(), store.next_id
+
+    assert store.rebuild(chunks(10, 3)) == 3
+    rebuilt = store.data_path.name
+    assert rebuilt > original
+    assert (tmp_path / SNAPSHOT_POINTER).read_text() == rebuilt
+    assert texts(store) == [chunk['text'] for chunk in chunks(10, 3)]
+    assert min(store.documents.column('id')) >= next_id
+
+    assert store.rollback() == original
+    assert (tmp_path / SNAPSHOT_POINTER).read_text() == original
+    assert texts(store) == [chunk['text'] for chunk in chunks(0, 5)]
+    assert store.documents.column('id').tolist() == ids
+    assert store.next_id == next_id
+
+    # A build that crashed before it was published
+    half_written = store.snapshots_path / f"{int(rebuilt) + 1:06d}.tmp"
+    (half_written / "documents").mkdir(parents=True)
+    (half_written / "main.index").write_bytes(b"partial")
+
+    store = reopen(store)
+    assert store.data_path.name == original
+    assert not half_written.exists()
+    assert texts(store) == [chunk['text'] for chunk in chunks(0, 5)]
+    assert store.documents.column('id').tolist() == ids
+    assert store.next_id == next_id
+    assert store.search(chunks(3, 1)[0]['text'], k=1)[0]['url'] == "https://college.example/3"
+
+
+def test_rebuilds_keep_the_newest_snapshots(tmp_path):
+    store = VectorStore(storage_path=tmp_path, keep_snapshots=2, near_duplicate_distance=-1)
+    store.add_documents(chunks(0, 2))
+    for start in range(10, 50, 10):
+        store.rebuild(chunks(start, 2))
+
+    names = store._snapshot_names()
+    assert len(names) == 3
+    assert names[-1] == store.data_path.name == (tmp_path / SNAPSHOT_POINTER).read_text()
+    assert texts(reopen(store)) == [chunk['text'] for chunk in chunks(40, 2)]
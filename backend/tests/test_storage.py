@@ -0,0 +1,100 @@
+import pickle
+
+import faiss
+
+from conftest import HashModel
+from vector_store import VectorStore
+
+
+def chunks(start, count):
+    return [{'text': f"Hostel block {i} has {i + 10} rooms and a common kitchen", 'url': f"https://college.example/{i}"}
+            for i in range(start, start + count)]
+
+
+def reopen(store):
+    store = VectorStore(storage_path=store.storage_path, compact_every=1000, near_duplicate_distance=-1)
+    store.load()
+    return store
+
+
+def texts(store):
+    return [store.documents[row]['text'] for row in range(len(store.documents))]
+
+
+def test_torn_delta_record_is_dropped_on_load(tmp_path):
+    store = VectorStore(storage_path=tmp_path, compact_every=1000, near_duplicate_distance=-1)
+    store.add_documents(chunks(0, 3))
+    store.add_documents(chunks(3, 2))
+    delta_path = store.data_path / "delta.log"
+    size = delta_path.stat().st_size
+    # A crash in the middle of appending the second batch
+    with open(delta_path, 'r+b') as f:
+        f.truncate(size - 100)
+
+    store = reopen(store)
+    assert store.index.ntotal == 3
+    assert texts(store) == [chunk['text'] for chunk in chunks(0, 3)]
+    assert store.delta_records == 1
+    assert delta_path.stat().st_size < size - 100
+
+    # The log is writable again from the last good record
+    store.add_documents(chunks(5, 1))
+    store = reopen(store)
+    assert store.index.ntotal == 4
+    assert store.next_id == int(store.documents.column('id')[-1]) + 1
+    assert store.search(chunks(5, 1)[0]['text'], k=1)[0]['url'] == "https://college.example/5"
+
+
+def test_crash_between_compaction_index_write_and_delta_truncation(tmp_path, monkeypatch):
+    store = VectorStore(storage_path=tmp_path, compact_every=1000, near_duplicate_distance=-1)
+    store.add_documents(chunks(0, 3))
+    store.add_documents(chunks(3, 2))
+
+    write_atomic = store._write_atomic
+
+    def crash_on_delta(path, data):
+        if path.name == "delta.log":
+            raise OSError("crashed")
+        write_atomic(path, data)
+    monkeypatch.setattr(store, '_write_atomic', crash_on_delta)
+    try:
+        store.compact()
+    except OSError:
+        pass
+    assert faiss.read_index(str(store.data_path / "main.index")).ntotal == 5
+    assert (store.data_path / "delta.log").stat().st_size > 0
+
+    # Records already in main.index are skipped rather than added twice
+    store = reopen(store)
+    assert store.index.ntotal == 5
+    assert texts(store) == [chunk['text'] for chunk in chunks(0, 5)]
+    results = store.search(chunks(4, 1)[0]['text'], k=2)
+    assert [result['url'] for result in results].count("https://college.example/4") == 1
+
+
+def test_migrates_documents_pkl_layout(tmp_path):
+    # main.index and documents.pkl at the top level, plus a delta record
+    # carrying its documents, as written before the columnar store
+    legacy = chunks(0, 5)
+    embeddings = HashModel().encode([chunk['text'] for chunk in legacy])
+    faiss.normalize_L2(embeddings)
+    index = faiss.IndexFlatIP(embeddings.shape[1])
+    index.add(embeddings[:3])
+    faiss.write_index(index, str(tmp_path / "main.index"))
+    with open(tmp_path / "documents.pkl", 'wb') as f:
+        pickle.dump(legacy[:3], f)
+    with open(tmp_path / "delta.log", 'wb') as f:
+        pickle.dump({'start': 3, 'embeddings': embeddings[3:], 'documents': legacy[3:]}, f)
+
+    store = VectorStore(storage_path=tmp_path, compact_every=1000, near_duplicate_distance=-1)
+    store.load()
+    assert not (tmp_path / "documents.pkl").exists()
+    assert not (store.data_path / "documents.pkl").exists()
+    assert texts(store) == [chunk['text'] for chunk in legacy]
+    assert store.search(legacy[4]['text'], k=1)[0]['url'] == legacy[4]['url']
+
+    ids = store.documents.column('id').tolist()
+    store = reopen(store)
+    assert store.documents.column('id').tolist() == ids
+    assert store.index.ntotal == 5 and store.next_id == 5
+    assert store.search(legacy[1]['text'], k=1)[0]['url'] == legacy[1]['url']
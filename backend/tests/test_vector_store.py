@@ -0,0 +1,76 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import vector_store
+
+
+def page_chunks(count):
+    return [{'text': f"Chunk {i} about course {i} in department {i % 7}", 'url': f"https://college.example/{i}",
+             'title': f"Page {i}"} for i in range(count)]
+
+
+def test_flat_pq_search_skips_tombstones_and_filters(make_store, monkeypatch):
+    # Filters over FILTER_EXACT_LIMIT chunks go through an ID selector too
+    monkeypatch.setattr(vector_store, 'FILTER_EXACT_LIMIT', 10)
+    store = make_store(quantization='pq', pq_m=8, promote_at=1, near_duplicate_distance=-1)
+    store.add_documents(page_chunks(300))
+    store.promote()
+    assert vector_store.describe_index(store.index) == ('flat', 'pq')
+
+    assert store.delete_url("https://college.example/15") == 1
+    for mode in ('dense', 'hybrid'):
+        results = store.search("Chunk 15 about course 15 in department 1", k=5, mode=mode)
+        assert results
+        assert all(result['url'] != "https://college.example/15" for result in results)
+
+    results = store.search("Chunk 12", k=5, mode='dense', filters={'url_prefix': "https://college.example/1"})
+    assert len(results) == 5
+    assert all(result['url'].startswith("https://college.example/1") for result in results)
+    assert all(result['url'] != "https://college.example/15" for result in results)
+
+
+def test_default_search_scores_are_cosine_similarities(make_store):
+    store = make_store()
+    store.add_documents(page_chunks(20))
+    best = store.search("Chunk 3 about course 3 in department 3", k=3)[0]
+    assert best['url'] == "https://college.example/3"
+    assert abs(best['score'] - 1.0) < 1e-4
+
+
+def test_cached_filter_does_not_wait_for_writers(make_store):
+    store = make_store()
+    store.add_documents(page_chunks(20))
+    filters = {'url_prefix': "https://college.example/1"}
+    expected = store.search("Chunk 12", k=3, filters=filters)
+
+    held, release = threading.Event(), threading.Event()
+
+    def write():
+        with store._lock:
+            held.set()
+            release.wait(10)
+    writer = threading.Thread(target=write)
+    writer.start()
+    held.wait(10)
+    try:
+        with ThreadPoolExecutor(1) as pool:
+            assert pool.submit(store.search, "Chunk 12", k=3, filters=filters).result(timeout=5) == expected
+    finally:
+        release.set()
+        writer.join()
+
+
+def test_exact_duplicates_are_skipped_per_url(make_store, tmp_path):
+    chunk = {'text': "Tuition is due before the first week of term.", 'url': "https://college.example/fees"}
+    copy = {**chunk, 'url': "https://college.example/admissions"}
+
+    store = make_store(near_duplicate_distance=-1)
+    assert store.add_documents([chunk, chunk]) == 1
+    assert store.add_documents([chunk]) == 0
+    # Another page keeps its own copy
+    assert store.add_documents([copy]) == 1
+
+    # ... unless the near-duplicate check drops it
+    store = vector_store.VectorStore(storage_path=tmp_path / "near_duplicates", near_duplicate_distance=4)
+    store.add_documents([chunk])
+    assert store.add_documents([copy]) == 0
@@ -1,14 +1,28 @@
+import hashlib
+import multiprocessing
+import os
 import re
-from typing import List
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# Sentence ends, including the Devanagari danda used by Indic-language pages
+SENTENCE_END = re.compile(r'(?<=[.!?\u0964\u0965])\s+')
+WORD_PATTERN = re.compile(r'\w+|[^\w\s]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# Anything but word characters, whitespace, basic punctuation, and the vowel
+# signs and dandas of Indic scripts, which \w does not match
+SPECIAL_CHARACTERS_PATTERN = re.compile(r'[^\w\s\.\,\!\?\-\(\)\u0900-\u0DFF]')
 
 
 def clean_text(text: str) -> str:
     """Clean and normalize text"""
     # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text)
+    text = WHITESPACE_PATTERN.sub(' ', text)
 
     # Remove special characters but keep basic punctuation
-    text = re.sub(r'[^\w\s\.\,\!\?\-\(\)]', '', text)
+    text = SPECIAL_CHARACTERS_PATTERN.sub('', text)
 
     # Strip and return
     return text.strip()
@@ -41,3 +55,249 @@ def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]
             break
 
     return chunks
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough WordPiece token count, for when no tokenizer is at hand
+
+    ASCII words count one token per 8 started characters; words in other
+    scripts, which an English vocabulary splits much further, one per
+    character.
+    """
+    return sum(1 + (len(word) - 1) // 8 if word.isascii() else len(word) for word in WORD_PATTERN.findall(text))
+
+
+def page_blocks(page: Dict) -> Iterator[Tuple[bool, str]]:
+    """(is_heading, text) blocks of a scraped page, in reading order"""
+    if page.get('title'):
+        yield True, f"Title: {page['title']}"
+    if page.get('headings'):
+        yield True, "Headings: " + " | ".join(page['headings'])
+    for paragraph in page.get('paragraphs', []):
+        yield False, paragraph
+
+
+def page_fingerprint(page: Dict, salt: str = '') -> str:
+    """Hash of a page's cleaned text, salted with whatever else decides its chunks
+
+    Pages that only differ in markup, whitespace or stripped characters match.
+    """
+    digest = hashlib.blake2b(salt.encode('utf-8'), digest_size=16)
+    for is_heading, block in page_blocks(page):
+        digest.update(f"{int(is_heading)}{clean_text(block)}\0".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class TokenChunker:
+    """Packs page text into chunks of at most `max_tokens` model tokens
+
+    Blocks are split into sentences, which are packed greedily. A heading
+    starts a new chunk unless the current one is still under `min_tokens`,
+    and only sentences longer than the whole budget are cut, between words.
+    Consecutive chunks of a section share up to `overlap_tokens` of whole
+    sentences, and a short tail is folded into the chunk before it. Token
+    counts come from the model's tokenizer when one is given.
+    """
+
+    def __init__(self, tokenizer=None, max_tokens: int = 254, min_tokens: int = 64, overlap_tokens: int = 32):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.min_tokens = min(min_tokens, max_tokens)
+        self.overlap_tokens = overlap_tokens
+
+        self.pages = 0
+        self.split_sentences = 0
+        # Chunk length in tokens -> number of chunks; bounded by max_tokens
+        self._lengths = Counter()
+
+    @classmethod
+    def for_model(cls, model, **kwargs) -> 'TokenChunker':
+        """Chunker sized to a sentence transformer's sequence limit, less [CLS] and [SEP]"""
+        max_tokens = (getattr(model, 'max_seq_length', None) or 256) - 2
+        return cls(tokenizer=getattr(model, 'tokenizer', None), max_tokens=max_tokens, **kwargs)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        if self.tokenizer is None:
+            return [estimate_tokens(text) for text in texts]
+        return [len(ids) for ids in self.tokenizer(texts, add_special_tokens=False, verbose=False)['input_ids']]
+
+    def chunk_pages(self, pages: Iterable[Dict]) -> Iterator[Dict]:
+        """Chunks with their page's url and title, one page at a time"""
+        for page in pages:
+            self.pages += 1
+            for text in self.chunk_blocks(page_blocks(page)):
+                yield {'text': text, 'url': page['url'], 'title': page.get('title', '')}
+
+    def chunk_blocks(self, blocks: Iterable[Tuple[bool, str]]) -> Iterator[str]:
+        """Chunks of one document given as (is_heading, text) blocks"""
+        chunks = list(self._pack(self._sentences(blocks)))
+        if len(chunks) > 1:
+            # Fold a short tail into the chunk before it when both fit the budget
+            sentences, carried = chunks[-1]
+            new = sentences[carried:]
+            new_tokens = sum(tokens for _, tokens in new)
+            previous, previous_carried = chunks[-2]
+            if new_tokens < self.min_tokens and sum(tokens for _, tokens in previous) + new_tokens <= self.max_tokens:
+                chunks[-2:] = [(previous + new, previous_carried)]
+        for sentences, _ in chunks:
+            tokens = sum(sentence_tokens for _, sentence_tokens in sentences)
+            self._lengths[tokens] += 1
+            yield ' '.join(text for text, _ in sentences)
+
+    def stats(self) -> Dict:
+        """Chunk length statistics in tokens"""
+        count = sum(self._lengths.values())
+        if not count:
+            return {'pages': self.pages, 'chunks': 0}
+        lengths = sorted(self._lengths.items())
+
+        def percentile(p: float) -> int:
+            seen = 0
+            for length, times in lengths:
+                seen += times
+                if seen >= p * count:
+                    return length
+            return lengths[-1][0]
+
+        return {
+            'pages': self.pages,
+            'chunks': count,
+            'tokens': sum(length * times for length, times in lengths),
+            'mean': round(sum(length * times for length, times in lengths) / count, 1),
+            'min': lengths[0][0],
+            'p50': percentile(0.5),
+            'p95': percentile(0.95),
+            'max': lengths[-1][0],
+            'under_min': sum(times for length, times in lengths if length < self.min_tokens),
+            'over_budget': sum(times for length, times in lengths if length > self.max_tokens),
+            'split_sentences': self.split_sentences,
+        }
+
+    def _sentences(self, blocks: Iterable[Tuple[bool, str]]) -> List[Tuple[bool, str, int]]:
+        """(starts_section, cleaned sentence, tokens) with over-long sentences cut into pieces"""
+        units = []
+        for is_heading, block in blocks:
+            sentences = [clean_text(sentence) for sentence in SENTENCE_END.split(block)]
+            sentences = [sentence for sentence in sentences if sentence]
+            for i, (sentence, tokens) in enumerate(zip(sentences, self.count_tokens(sentences))):
+                starts_section = is_heading and i == 0
+                if tokens <= self.max_tokens:
+                    units.append((starts_section, sentence, tokens))
+                    continue
+                self.split_sentences += 1
+                for j, (piece, piece_tokens) in enumerate(self._split_words(sentence)):
+                    units.append((starts_section and j == 0, piece, piece_tokens))
+        return units
+
+    def _split_words(self, sentence: str) -> Iterator[Tuple[str, int]]:
+        words = sentence.split(' ')
+        piece, piece_tokens = [], 0
+        for word, tokens in zip(words, self.count_tokens(words)):
+            # A single word over the budget is left to the model to truncate
+            if piece and piece_tokens + tokens > self.max_tokens:
+                yield ' '.join(piece), piece_tokens
+                piece, piece_tokens = [], 0
+            piece.append(word)
+            piece_tokens += tokens
+        if piece:
+            yield ' '.join(piece), piece_tokens
+
+    def _pack(self, units: List[Tuple[bool, str, int]]) -> Iterator[Tuple[List[Tuple[str, int]], int]]:
+        """Greedy packing into (sentences, number of them carried over from the previous chunk)"""
+        sentences, tokens, carried = [], 0, 0
+        for starts_section, text, text_tokens in units:
+            if sentences and (tokens + text_tokens > self.max_tokens
+                              or (starts_section and tokens >= self.min_tokens)):
+                yield sentences, carried
+                sentences = [] if starts_section else self._overlap(sentences, self.max_tokens - text_tokens)
+                tokens = sum(sentence_tokens for _, sentence_tokens in sentences)
+                carried = len(sentences)
+            sentences.append((text, text_tokens))
+            tokens += text_tokens
+        if sentences:
+            yield sentences, carried
+
+    def _overlap(self, sentences: List[Tuple[str, int]], room: int) -> List[Tuple[str, int]]:
+        """Trailing sentences to repeat at the start of the next chunk"""
+        budget = min(self.overlap_tokens, room)
+        kept = []
+        for text, tokens in reversed(sentences):
+            if tokens > budget:
+                break
+            kept.append((text, tokens))
+            budget -= tokens
+        return kept[::-1]
+
+
+# The chunker of a ChunkingPool worker process, set when the worker starts
+_worker_chunker = None
+
+
+def _start_worker(chunker: TokenChunker):
+    global _worker_chunker
+    _worker_chunker = chunker
+
+
+def _chunk_batch(pages: List[Dict]) -> Tuple[List[List[str]], Counter, int]:
+    """Chunk texts of each page, with the batch's length histogram and split sentences"""
+    chunker = _worker_chunker
+    chunker._lengths, chunker.split_sentences = Counter(), 0
+    texts = [list(chunker.chunk_blocks(page_blocks(page))) for page in pages]
+    return texts, chunker._lengths, chunker.split_sentences
+
+
+class ChunkingPool:
+    """Cleans and chunks batches of pages in worker processes
+
+    Every worker gets a copy of `chunker`, tokenizer included, once when it
+    starts. Workers are spawned rather than forked: the server runs threads
+    (executors, torch, FAISS) that a fork could catch holding a lock.
+    """
+
+    def __init__(self, chunker: TokenChunker, workers: int = None, batch_pages: int = 16):
+        self.chunker = chunker
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_pages = batch_pages
+        self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_start_worker, initargs=(chunker,))
+
+    def chunk_pages(self, pages: Iterable[Dict], stats: TokenChunker = None,
+                    max_pending: int = None) -> Iterator[Dict]:
+        """Chunks with their page's url and title, in page order
+
+        Up to `max_pending` batches (two per worker by default) are chunked
+        ahead of the consumer, so the workers keep going while it embeds
+        what it has. Page and length counts are added to `stats`.
+        """
+        max_pending = max_pending or 2 * self.workers
+        pages = iter(pages)
+        pending = deque()
+
+        def submit() -> bool:
+            batch = list(islice(pages, self.batch_pages))
+            if batch:
+                pending.append((batch, self._executor.submit(_chunk_batch, batch)))
+            return bool(batch)
+
+        try:
+            while len(pending) < max_pending and submit():
+                pass
+            while pending:
+                batch, future = pending.popleft()
+                submit()
+                texts, lengths, split_sentences = future.result()
+                if stats is not None:
+                    stats.pages += len(batch)
+                    stats._lengths.update(lengths)
+                    stats.split_sentences += split_sentences
+                for page, page_texts in zip(batch, texts):
+                    for text in page_texts:
+                        yield {'text': text, 'url': page['url'], 'title': page.get('title', '')}
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
@@ -0,0 +1,67 @@
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+
+class VectorFile:
+    """Append-only file of full-precision float32 vectors, read through mmap
+
+    Row i holds the exact embedding of vector i in the index. Compressed
+    indexes use it to re-rank candidates and to rebuild without the loss of
+    reconstructing from quantized codes. Only the rows that are read get
+    paged in.
+    """
+
+    def __init__(self, path: Path, dimension: int):
+        self.path = path
+        self.dimension = dimension
+        self.row_bytes = dimension * 4
+        self._lock = threading.Lock()
+        self._map = None
+
+        size = self.path.stat().st_size if self.path.exists() else 0
+        self._count = size // self.row_bytes
+        # Drop a partially written final row
+        if size != self._count * self.row_bytes:
+            self.truncate(self._count)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def rows(self, ids: np.ndarray) -> np.ndarray:
+        """Exact vectors for the given row ids"""
+        return np.asarray(self._mapped()[ids], dtype='float32')
+
+    def read_all(self) -> np.ndarray:
+        return np.array(self._mapped()[:self._count], dtype='float32')
+
+    def append(self, vectors: np.ndarray):
+        with self._lock:
+            with open(self.path, 'ab') as f:
+                f.write(np.ascontiguousarray(vectors, dtype='<f4').tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._count += len(vectors)
+
+    def truncate(self, count: int):
+        with self._lock:
+            if self.path.exists():
+                with open(self.path, 'r+b') as f:
+                    f.truncate(count * self.row_bytes)
+            self._count = min(self._count, count)
+            self._map = None
+
+    def map_all(self):
+        """Map the file now, so reads keep working if it is replaced"""
+        self._mapped()
+
+    def _mapped(self) -> np.ndarray:
+        mapped = self._map
+        if mapped is None or len(mapped) < self._count:
+            if self._count == 0:
+                return np.zeros((0, self.dimension), dtype='float32')
+            mapped = np.memmap(self.path, dtype='<f4', mode='r', shape=(self._count, self.dimension))
+            self._map = mapped
+        return mapped
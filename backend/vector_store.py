@@ -1,95 +1,1616 @@
 import numpy as np
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Iterable
+import bisect
 import faiss
 import pickle
 import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 
+from doc_store import DocumentStore
+from embedding_cache import EmbeddingCache, content_hash
+from lexical_index import LexicalIndex
+from near_duplicates import SimHashIndex, numbers, simhash_many
+from page_fingerprints import PageFingerprints
+from query_encoder import QueryEncoder
+from rwlock import ReadWriteLock
+from vector_file import VectorFile
+
+INDEX_TYPES = ('flat', 'ivf', 'hnsw')
+
+# How vectors are stored inside the index: raw float32, float16, 8-bit
+# scalar quantization (4x smaller) or product quantization (pq_m bytes each)
+QUANTIZATIONS = ('none', 'fp16', 'sq8', 'pq')
+
+# Map main.index instead of reading it into RAM (FAISS >= 1.10). A mapped
+# index is a read-only view and must be copied before anything is added.
+MMAP_IO_FLAGS = (faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY) if hasattr(faiss, 'IO_FLAG_MMAP_IFC') else None
+
+# dense: embeddings only, scored by cosine similarity (the default); lexical:
+# BM25 only; hybrid: both, fused by reciprocal rank, so scores are rank-based
+# (at most 2/(RRF_CONSTANT + 1)) and not comparable to cosine ones
+SEARCH_MODES = ('dense', 'lexical', 'hybrid')
+RRF_CONSTANT = 60
+
+# Metadata filters accepted by search(): url_prefix and title match the page,
+# ingested_after / ingested_before are unix timestamps (after inclusive)
+FILTER_KEYS = ('url_prefix', 'title', 'ingested_after', 'ingested_before')
+
+# Filters matching at most this many chunks are scored exactly against their
+# vectors; IVF / HNSW would visit too few of them to fill k results
+FILTER_EXACT_LIMIT = 4096
+FILTER_CACHE_SIZE = 64
+
+# Each version of a store's files lives in snapshots/<version>/, and the
+# CURRENT file names the active one. Vacuums and rebuilds write a complete new
+# snapshot next to it and switch CURRENT with one atomic rename, so a crash
+# leaves either the old or the new version, never a mix.
+SNAPSHOT_POINTER = "CURRENT"
+SNAPSHOT_FILES = ("main.index", "delta.log", "documents.pkl", "documents", "vectors.f32", "lexical.index")
+
+# Before snapshots, a vacuum wrote <name>.new next to these files and swapped
+# them in once the marker existed
+LEGACY_VACUUM_FILES = ("documents", "vectors.f32", "main.index")
+LEGACY_VACUUM_MARKER = "vacuum.commit"
+
+
+# Sentence transformers shared by every store (e.g. all namespaces)
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(model_name: str):
+    """Import and construct a sentence transformer once per process"""
+    model = _models.get(model_name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(model_name)
+            if model is None:
+                from sentence_transformers import SentenceTransformer
+                started = time.time()
+                model = SentenceTransformer(model_name)
+                _models[model_name] = model
+                print(f"Loaded {model_name} in {time.time() - started:.1f}s")
+    return model
+
+
+# Query encoders shared per model, so concurrent queries to different
+# namespaces are batched together too
+_query_encoders = {}
+
+QUERY_ENCODER_SETTINGS = dict(
+    cache_size=int(os.getenv("QUERY_CACHE_SIZE", "4096")),
+    max_batch=int(os.getenv("QUERY_BATCH_MAX", "64")),
+    max_wait_ms=float(os.getenv("QUERY_BATCH_WAIT_MS", "5")),
+)
+
+
+def get_query_encoder(model_name: str, dimension: int) -> QueryEncoder:
+    """The cached, micro-batching query encoder of a model"""
+    encoder = _query_encoders.get(model_name)
+    if encoder is None:
+        with _models_lock:
+            encoder = _query_encoders.get(model_name)
+            if encoder is None:
+                encoder = QueryEncoder(lambda: get_model(model_name), dimension, **QUERY_ENCODER_SETTINGS)
+                _query_encoders[model_name] = encoder
+    return encoder
+
+
+def unwrap_index(index):
+    """The index inside an IndexIDMap / IndexIDMap2, or the index itself"""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def index_memory_bytes(index) -> int:
+    """Approximate resident size of a FAISS index"""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        # id_map plus the reverse map of IndexIDMap2
+        return index_memory_bytes(unwrap_index(index)) + index.ntotal * 24
+    if isinstance(index, faiss.IndexHNSW):
+        storage = faiss.downcast_index(index.storage)
+        # Codes plus 2*M int32 neighbour links per vector on level 0
+        return index.ntotal * (storage.code_size + index.hnsw.nb_neighbors(0) * 4)
+    if isinstance(index, faiss.IndexIVF):
+        return index.ntotal * (index.code_size + 8)
+    return index.ntotal * getattr(index, 'code_size', index.d * 4)
+
+
+def build_index(index_type: str, dimension: int, vectors: np.ndarray, nlist: int = None, hnsw_m: int = 32,
+                quantization: str = 'none', pq_m: int = 96, ids: np.ndarray = None):
+    """Build and fill a FAISS index of the given type from normalized vectors
+
+    With `ids` the index is wrapped in an IndexIDMap2 and searches return
+    those ids instead of insertion positions.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type}")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization: {quantization}")
+
+    storage = {'none': 'Flat', 'fp16': 'SQfp16', 'sq8': 'SQ8', 'pq': f'PQ{pq_m}'}[quantization]
+    if index_type == 'flat':
+        description = storage
+    elif index_type == 'ivf':
+        # Rule of thumb from the FAISS wiki: ~4*sqrt(n) lists, and k-means
+        # wants at least 39 training points per list
+        nlist = nlist or int(4 * np.sqrt(len(vectors)))
+        nlist = max(1, min(nlist, len(vectors) // 39))
+        description = f'IVF{nlist},{storage}'
+    else:
+        if quantization == 'pq':
+            # IndexHNSWPQ only supports L2, which would break our cosine scores
+            raise ValueError("PQ is not supported with HNSW, use sq8 or fp16")
+        description = f'HNSW{hnsw_m}' if quantization == 'none' else f'HNSW{hnsw_m},{storage}'
+
+    index = faiss.index_factory(dimension, description, faiss.METRIC_INNER_PRODUCT)
+    if not index.is_trained:
+        index.train(vectors)
+    if ids is not None:
+        index = faiss.IndexIDMap2(index)
+        if len(vectors):
+            index.add_with_ids(vectors, np.asarray(ids, dtype='int64'))
+    elif len(vectors):
+        index.add(vectors)
+    return index
+
+
+def empty_index(dimension: int):
+    """An empty exact index keyed by chunk id"""
+    return faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+
+
+def describe_index(index) -> tuple:
+    """(index_type, quantization) of a FAISS index built by build_index"""
+    index = unwrap_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        index_type, storage = 'ivf', index
+    elif isinstance(index, faiss.IndexHNSW):
+        index_type, storage = 'hnsw', faiss.downcast_index(index.storage)
+    else:
+        index_type, storage = 'flat', index
+
+    if isinstance(storage, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return index_type, 'pq'
+    if isinstance(storage, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return index_type, 'fp16' if storage.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else 'sq8'
+    return index_type, 'none'
+
+
+def reconstruct_all(index, start: int = 0) -> np.ndarray:
+    """Return the stored vectors of an index from `start` on as a float32 matrix"""
+    index = unwrap_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    if index.ntotal <= start:
+        return np.zeros((0, index.d), dtype='float32')
+    return index.reconstruct_n(start, index.ntotal - start)
+
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], k: int, constant: int = RRF_CONSTANT):
+    """Merge ranked lists of rows, returning the best k rows and their fused scores"""
+    fused = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking[ranking != -1].tolist()):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (constant + rank + 1)
+    best = sorted(fused.items(), key=lambda item: -item[1])[:k]
+    return (np.array([score for _, score in best], dtype='float32'),
+            np.array([row for row, _ in best], dtype='int64'))
+
 
 class VectorStore:
-    def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+    def __init__(self, compact_every: int = 20, index_type: str = 'flat', promote_at: int = 50000,
+                 nprobe: int = 16, ef_search: int = 64, nlist: int = None, hnsw_m: int = 32,
+                 mmap_index: bool = True, quantization: str = 'none', pq_m: int = 96,
+                 rerank: bool = True, rerank_factor: int = 4, storage_path: Path = Path("vector_storage"),
+                 embedding_cache_path: Path = None, vacuum_ratio: float = 0.2, search_mode: str = 'dense',
+                 keep_snapshots: int = 3, near_duplicate_distance: int = 4):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"index_type must be one of {INDEX_TYPES}")
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"quantization must be one of {QUANTIZATIONS}")
+        if index_type == 'hnsw' and quantization == 'pq':
+            raise ValueError("PQ is not supported with HNSW, use sq8 or fp16")
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"search_mode must be one of {SEARCH_MODES}")
+
+        # The model and the index are loaded on first use or by warm_up(),
+        # so constructing the store (and importing this module) stays cheap
+        self.model_name = 'all-MiniLM-L6-v2'
+        self._loaded = threading.Event()
+        self._load_lock = threading.Lock()
+        self.mmap_index = mmap_index
+        self._index_mapped = False
+
         self.dimension = 384
-        self.index = faiss.IndexFlatIP(self.dimension)
-        self.documents = []
-        self.storage_path = Path("vector_storage")
-        self.storage_path.mkdir(exist_ok=True)
+        self.index = empty_index(self.dimension)
+        self.storage_path = Path(storage_path)
+        self.storage_path.mkdir(parents=True, exist_ok=True)
+
+        # Directory of the active snapshot, resolved by load(). The newest
+        # `keep_snapshots` older ones stay on disk for rollback().
+        self.snapshots_path = self.storage_path / "snapshots"
+        self.data_path = None
+        self.keep_snapshots = keep_snapshots
+
+        # Row i of the document store and of the full-precision vector file
+        # belong to the i-th vector added to the index. The index is an
+        # IndexIDMap2 keyed by stable chunk ids, which the document store maps
+        # back to rows. Opened together with the index in load().
+        self.documents = None
+        self.vectors = None
+        self.next_id = 0
+
+        # Deleted / superseded chunks stay in the index as tombstones that
+        # searches exclude through an ID selector, until a vacuum rewrites
+        # the store once they exceed `vacuum_ratio` of it
+        self.tombstones = set()
+        self.vacuum_ratio = vacuum_ratio
+        self._tombstone_selector = None
+        self._vacuum_thread = None
+
+        # column ('url' / 'title') -> {string id -> rows}, built on first use
+        # by upserts, deletes and filtered searches and extended by every
+        # batch. Filters resolve to chunk ids (and an ID selector for large
+        # sets) through them, cached until the next write. Cache hits only
+        # take _filter_cache_lock, so filtered searches never wait for a writer.
+        self._value_rows = {}
+        self._sorted_urls = None
+        self._filter_cache = OrderedDict()
+        self._filter_cache_lock = threading.Lock()
+
+        # BM25 index over chunk texts for exact tokens (course codes, fees)
+        # that embeddings miss. Updated with every batch, snapshotted to
+        # lexical.index by compaction and caught up from the document store
+        # on load. Hybrid searches fuse it with the dense top k * rerank_factor.
+        self.lexical = None
+        self.search_mode = search_mode
+
+        # Embeddings survive across scrapes, and chunks already in the index
+        # (same url, same normalized text) are not inserted again. The key
+        # set is read from the document store on the first ingest.
+        self.embedding_cache = EmbeddingCache(embedding_cache_path or self.storage_path / "embeddings.sqlite",
+                                              self.model_name, self.dimension)
+        self.document_keys = None
+
+        # Content fingerprint of each page as last ingested, so a re-crawl
+        # only re-chunks and re-embeds the pages that changed. It lives next
+        # to the snapshots and is cleared whenever the corpus is swapped for
+        # one it does not describe.
+        self.page_fingerprints = PageFingerprints(self.storage_path / "pages.sqlite")
+        self._replacements = 0
+
+        # Chunks whose SimHash is within `near_duplicate_distance` bits of a
+        # live chunk or of an earlier chunk of the same batch (site-wide
+        # boilerplate) are dropped before embedding; negative disables it.
+        # The fingerprint index is read from the document store on first use.
+        self.near_duplicate_distance = near_duplicate_distance
+        self.near_duplicates = None
+        self.near_duplicate_stats = {'dropped': 0, 'embedding_seconds_saved': 0.0}
+        self._embedding_seconds_per_chunk = 0.0
+
+        # Batches appended to the delta log since the last base snapshot.
+        # Once there are `compact_every` of them, a background thread folds
+        # them into main.index.
+        self.compact_every = compact_every
+        self.delta_records = 0
+        self._compaction_lock = threading.Lock()
+
+        # `_lock` serializes writers (file appends, fsyncs, bookkeeping).
+        # `_index_lock` guards the in-memory index and the objects searched
+        # with it: searches share it, while writers take it exclusively only
+        # to mutate or swap them, so a long ingest does not stall queries.
+        self._lock = threading.RLock()
+        self._index_lock = ReadWriteLock()
+        self._compaction_thread = None
+
+        # Searches in progress, so unload(only_if_idle=True) leaves a store
+        # being searched alone. `on_load` is called after every load.
+        self._searches = 0
+        self._searches_lock = threading.Lock()
+        self.on_load = None
+
+        # Approximate / compressed index settings. The store starts as an
+        # exact flat index and is rebuilt as `index_type` with `quantization`
+        # once it holds `promote_at` vectors. Results from a quantized index
+        # are re-ranked with the exact vectors of the top k * rerank_factor.
+        self.index_type = index_type
+        self.quantization = quantization
+        self.pq_m = pq_m
+        self.rerank = rerank
+        self.rerank_factor = rerank_factor
+        self.promote_at = promote_at
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.nlist = nlist
+        self.hnsw_m = hnsw_m
+        self._promotion_thread = None
+
+    @property
+    def model(self):
+        """The sentence transformer, imported and constructed on first use"""
+        return get_model(self.model_name)
+
+    @property
+    def query_encoder(self) -> QueryEncoder:
+        return get_query_encoder(self.model_name, self.dimension)
+
+    def load(self):
+        """Load index and documents from disk once"""
+        if self._loaded.is_set():
+            return
+        with self._load_lock:
+            if self._loaded.is_set():
+                return
+            self._load_data()
+            self._loaded.set()
+        if self.on_load is not None:
+            self.on_load()
+
+    def warm_up(self):
+        """Load the index, then the model"""
+        self.load()
+        self.model
 
-        # Load existing data on startup
-        self._load_data()
+    def start_warmup(self) -> threading.Thread:
+        """Warm up in a background thread so the server can accept connections meanwhile"""
+        thread = threading.Thread(target=self._warm_up_in_background, daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_up_in_background(self):
+        try:
+            self.warm_up()
+        except Exception as e:
+            print(f"Error warming up vector store: {e}")
+
+    def status(self) -> Dict:
+        """Readiness of the index and the model"""
+        index_loaded = self._loaded.is_set()
+        model_loaded = self.model_name in _models
+        return {
+            'index_loaded': index_loaded,
+            'model_loaded': model_loaded,
+            'ready': index_loaded and model_loaded,
+            'documents': self.index.ntotal - len(self.tombstones) if index_loaded else None,
+            'snapshot': self.data_path.name if index_loaded else None,
+            'query_cache': self.query_encoder.stats(),
+            'near_duplicates': dict(self.near_duplicate_stats)
+        }
+
+    def is_loaded(self) -> bool:
+        return self._loaded.is_set()
+
+    def is_busy(self) -> bool:
+        """Whether a background compaction or promotion is running"""
+        return any(thread is not None and thread.is_alive()
+                   for thread in (self._compaction_thread, self._promotion_thread, self._vacuum_thread))
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held in RAM by the loaded index and dedup keys"""
+        if not self.is_loaded():
+            return 0
+        usage = 0 if self._index_mapped else index_memory_bytes(self.index)
+        if self.document_keys is not None:
+            usage += len(self.document_keys) * 60
+        if self.near_duplicates is not None:
+            usage += self.near_duplicates.memory_bytes()
+        if self.lexical is not None:
+            usage += self.lexical.memory_bytes()
+        return usage
+
+    def in_use(self) -> bool:
+        """Whether a search is running"""
+        return self._searches > 0
+
+    def unload(self, only_if_idle: bool = False) -> bool:
+        """Drop the index and documents from memory; the next call loads them again
+
+        With `only_if_idle` a store that is being searched or written to
+        stays loaded. Returns whether the store is unloaded.
+        """
+        with self._searches_lock:
+            if only_if_idle and self._searches:
+                return False
+            # New searches wait on _searches_lock, so none can start until we are done
+            if not self._lock.acquire(blocking=not only_if_idle):
+                return False
+            try:
+                with self._load_lock, self._index_lock.write():
+                    self._unload()
+            finally:
+                self._lock.release()
+        return True
+
+    def _unload(self):
+        if not self.is_loaded():
+            return
+        self._loaded.clear()
+        self._reset_row_maps()
+        self.index = empty_index(self.dimension)
+        self._index_mapped = False
+        self.documents = None
+        self.vectors = None
+        self.lexical = None
+        self.document_keys = None
+        self.near_duplicates = None
+        self.tombstones = set()
+        self._tombstone_selector = None
+        self.delta_records = 0
+
+    def _writable_index(self):
+        """Replace a memory-mapped (read-only) index by an in-memory copy"""
+        if self._index_mapped:
+            self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            self._index_mapped = False
+        return self.index
+
+    def add_documents(self, documents: List[Dict]) -> int:
+        """Add documents to vector store, returning how many were new"""
+        return self._add_documents(documents)[0]
+
+    def _add_documents(self, documents: List[Dict], superseded: set = frozenset()) -> tuple:
+        """Add new documents, returning how many were added and how many dropped as near-duplicates
+
+        Chunks in `superseded` are about to be removed, so they do not count
+        as existing copies. Exact duplicates are skipped per url, see
+        _document_key().
+        """
+        with self._lock:
+            self.load()
+            document_keys = self._known_keys()
+
+        new_documents = []
+        batch_keys = []
+        seen = set()
+        for doc in documents:
+            key = self._document_key(doc)
+            if key not in document_keys and key not in seen:
+                seen.add(key)
+                batch_keys.append(key)
+                new_documents.append(doc)
+
+        skipped = len(documents) - len(new_documents)
+        if skipped:
+            print(f"Skipping {skipped} documents already in the vector store")
+        if not new_documents:
+            return 0, 0
+        documents = new_documents
+
+        fingerprints = simhash_many(doc['text'] for doc in documents)
+        if self.near_duplicate_distance >= 0:
+            with self._lock:
+                self.load()
+                keep = self._distinct([doc['text'] for doc in documents], fingerprints,
+                                      self._near_duplicate_index(), superseded)
+            dropped = len(documents) - len(keep)
+            documents = [documents[i] for i in keep]
+            batch_keys = [batch_keys[i] for i in keep]
+            fingerprints = fingerprints[keep]
+        else:
+            dropped = 0
+        if not documents:
+            self._record_near_duplicates(dropped)
+            return 0, dropped
 
-    def add_documents(self, documents: List[Dict]):
-        """Add documents to vector store"""
         texts = [doc['text'] for doc in documents]
-        embeddings = self.model.encode(texts)
+        started = time.perf_counter()
+        embeddings = self.embedding_cache.encode(self.model, texts)
+        self._embedding_seconds_per_chunk = (time.perf_counter() - started) / len(texts)
+        self._record_near_duplicates(dropped)
 
         # Normalize embeddings for cosine similarity
         faiss.normalize_L2(embeddings)
+        embeddings = embeddings.astype('float32')
+
+        with self._lock:
+            # The store may have been unloaded while we were encoding
+            self.load()
+            start = self.index.ntotal
+            ids = np.arange(self.next_id, self.next_id + len(documents), dtype='int64')
+            self.next_id += len(documents)
+
+            # Store documents first so a search never sees a vector without its row
+            self.documents.append(documents, batch_keys, ids, fingerprints)
+            self._known_keys().update(batch_keys)
+            if self.near_duplicates is not None:
+                self.near_duplicates.add(ids, fingerprints)
+            self.vectors.append(embeddings)
+            for column, value_rows in self._value_rows.items():
+                for row, doc in enumerate(documents, start):
+                    string_id = self.documents.string_id(doc.get(column, ''))
+                    if column == 'url' and string_id not in value_rows:
+                        self._sorted_urls = None
+                    value_rows.setdefault(string_id, []).append(row)
+            self._clear_filter_cache()
+
+            # Persist only this batch; the base snapshot is rewritten by compaction
+            self._append_delta(start, ids, embeddings)
+
+            # Add to FAISS index
+            with self._index_lock.write():
+                self._writable_index().add_with_ids(embeddings, ids)
+            self.lexical.add(ids, texts)
+
+        if not self._maybe_promote():
+            self._maybe_compact()
+
+        return len(documents), dropped
+
+    def _distinct(self, texts: List[str], fingerprints: np.ndarray, corpus: SimHashIndex = None,
+                  superseded: set = frozenset()) -> list:
+        """Positions of the texts not near-duplicating the corpus or an earlier one
+
+        Near-duplicates must also contain the same numbers, so chunks that
+        differ only in a fee or a date are all kept.
+        """
+        batch = SimHashIndex(self.near_duplicate_distance)
+        batch_numbers = [numbers(text) for text in texts]
+        keep = []
+        for i, fingerprint in enumerate(fingerprints):
+            if corpus is not None and corpus.find(
+                    fingerprint, ignore=superseded,
+                    accept=lambda chunk_id: numbers(self._chunk_text(chunk_id)) == batch_numbers[i]) != -1:
+                continue
+            if batch.find(fingerprint, accept=lambda j: batch_numbers[j] == batch_numbers[i]) != -1:
+                continue
+            batch.add([i], [fingerprint])
+            keep.append(i)
+        return keep
+
+    def _chunk_text(self, chunk_id: int) -> str:
+        row = int(self.documents.rows_of(np.array([chunk_id], dtype='int64'))[0])
+        return self.documents[row]['text']
+
+    def _record_near_duplicates(self, dropped: int):
+        if not dropped:
+            return
+        # Priced at the per-chunk cost of the latest embedding batch
+        saved = dropped * self._embedding_seconds_per_chunk
+        self.near_duplicate_stats['dropped'] += dropped
+        self.near_duplicate_stats['embedding_seconds_saved'] += saved
+        print(f"Dropped {dropped} near-duplicate chunks (~{saved:.2f}s of embedding saved)")
 
-        # Add to FAISS index
-        self.index.add(embeddings.astype('float32'))
+    def _near_duplicate_index(self) -> SimHashIndex:
+        """Fingerprints of the live chunks, computing those stored before they were tracked"""
+        if self.near_duplicates is None:
+            rows = self.documents.live_rows()
+            fingerprints = np.array(self.documents.column('simhash')[rows])
+            missing = np.flatnonzero(fingerprints == 0)
+            if len(missing):
+                fingerprints[missing] = simhash_many(self.documents[int(row)]['text'] for row in rows[missing])
+            index = SimHashIndex(self.near_duplicate_distance)
+            index.add(self.documents.column('id')[rows], fingerprints)
+            self.near_duplicates = index
+        return self.near_duplicates
 
-        # Store documents
-        self.documents.extend(documents)
+    def upsert_url(self, url: str, chunks: List[Dict]) -> Dict:
+        """Replace the chunks of one page"""
+        return self.upsert_urls({url: chunks})
 
-        # Save to disk
-        self._save_data()
+    def upsert_urls(self, chunks_by_url: Dict[str, List[Dict]], replacing: Iterable[str] = (),
+                    fingerprints: Dict[str, str] = None) -> Dict:
+        """Replace the chunks of several pages in one batch
 
-    def search(self, query: str, k: int = 5) -> List[Dict]:
-        """Search for similar documents"""
+        Chunks whose text did not change keep their ids, new ones are added
+        and the rest of each page's old chunks become tombstones. New chunks
+        are added before old ones are removed, so a page never disappears
+        from search results midway. New chunks that near-duplicate a chunk
+        kept elsewhere are not added; chunks of the `replacing` pages, which
+        a later batch replaces, do not count. Page `fingerprints` are
+        recorded once the pages are stored.
+        """
+        with self._lock:
+            self.load()
+            replacements = self._replacements
+            superseded = {int(chunk_id) for url in replacing
+                          for chunk_id in self.documents.column('id')[self._rows_for_url(url)]}
+            stale_ids = []
+            unchanged = 0
+            for url, chunks in chunks_by_url.items():
+                new_keys = np.array([self._document_key({**chunk, 'url': url}) for chunk in chunks], dtype='uint64')
+                rows = self._rows_for_url(url)
+                kept = np.isin(self.documents.column('key')[rows], new_keys)
+                unchanged += int(kept.sum())
+                stale_ids.extend(self.documents.column('id')[rows[~kept]].tolist())
+
+        documents = [{**chunk, 'url': url} for url, chunks in chunks_by_url.items() for chunk in chunks]
+        added, near_duplicates = self._add_documents(documents, superseded | set(stale_ids)) if documents else (0, 0)
+        removed = self._delete_ids(stale_ids)
+        if fingerprints:
+            with self._lock:
+                # A rebuild or rollback meanwhile may have dropped these chunks
+                if self._replacements == replacements:
+                    self.page_fingerprints.put_many(fingerprints)
+        return {'added': added, 'removed': removed, 'unchanged': unchanged, 'near_duplicates': near_duplicates}
+
+    def delete_url(self, url: str) -> int:
+        """Remove every chunk of a page, returning how many were removed"""
+        with self._lock:
+            self.load()
+            ids = self.documents.column('id')[self._rows_for_url(url)]
+            self.page_fingerprints.delete_many([url])
+        return self._delete_ids(ids.tolist())
+
+    def _delete_ids(self, ids: List[int]) -> int:
+        """Tombstone chunks by id"""
+        if not len(ids):
+            return 0
+        with self._lock:
+            self.load()
+            rows = self.documents.rows_of(np.asarray(ids, dtype='int64'))
+            rows = rows[rows != -1]
+            rows = rows[self.documents.column('deleted')[rows] == 0]
+            if not len(rows):
+                return 0
+
+            self.documents.mark_deleted(rows)
+            deleted_ids = self.documents.column('id')[rows].tolist()
+            # Before the tombstones, so no cached filter hands out a deleted id
+            self._clear_filter_cache()
+            with self._index_lock.write():
+                self.tombstones.update(deleted_ids)
+                self._tombstone_selector = None
+            self.lexical.remove(deleted_ids)
+            if self.near_duplicates is not None:
+                self.near_duplicates.remove(deleted_ids)
+            self._known_keys().difference_update(self.documents.column('key')[rows].tolist())
+
+        self._maybe_vacuum()
+        return len(rows)
+
+    def _rows_for_url(self, url: str) -> np.ndarray:
+        """Live rows of one page"""
+        rows = np.array(self._rows_by_value('url').get(self.documents.string_id(url), []), dtype='int64')
+        return rows[self.documents.column('deleted')[rows] == 0]
+
+    def _rows_by_value(self, column: str) -> Dict[int, List[int]]:
+        """Rows of every interned url / title, in increasing order"""
+        value_rows = self._value_rows.get(column)
+        if value_rows is None:
+            values = self.documents.column(column)
+            order = np.argsort(values, kind='stable')
+            string_ids, starts = np.unique(values[order], return_index=True)
+            value_rows = {int(string_id): rows.tolist()
+                          for string_id, rows in zip(string_ids, np.split(order, starts[1:]))}
+            self._value_rows[column] = value_rows
+        return value_rows
+
+    def _rows_with_url_prefix(self, prefix: str) -> np.ndarray:
+        url_rows = self._rows_by_value('url')
+        if self._sorted_urls is None:
+            self._sorted_urls = sorted((self.documents.string(string_id), string_id) for string_id in url_rows)
+        rows = []
+        for url, string_id in self._sorted_urls[bisect.bisect_left(self._sorted_urls, (prefix,)):]:
+            if not url.startswith(prefix):
+                break
+            rows.extend(url_rows[string_id])
+        return np.sort(np.array(rows, dtype='int64'))
+
+    def _reset_row_maps(self):
+        """Forget row maps and cached filters once rows were renumbered or dropped"""
+        self._value_rows = {}
+        self._sorted_urls = None
+        self._clear_filter_cache()
+
+    def _clear_filter_cache(self):
+        """Forget cached filters; writers call this with _lock held, before their change is visible
+
+        Misses are built under _lock, so nothing stale is cached again
+        until the writer is done.
+        """
+        with self._filter_cache_lock:
+            self._filter_cache.clear()
+
+    def _filter(self, filters: Dict) -> tuple:
+        """Sorted ids of the live chunks matching `filters`, and an ID selector for them
+
+        The selector is only built for sets above FILTER_EXACT_LIMIT, which
+        are searched through the index rather than exactly.
+        """
+        unknown = set(filters) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown filters {sorted(unknown)}, expected some of {FILTER_KEYS}")
+        key = tuple(sorted((name, value) for name, value in filters.items() if value is not None))
+
+        cached = self._cached_filter(key)
+        if cached is None:
+            with self._lock:
+                # Another search may have built it while we waited
+                cached = self._cached_filter(key)
+                if cached is None:
+                    cached = self._build_filter(dict(key))
+                    with self._filter_cache_lock:
+                        self._filter_cache[key] = cached
+                        while len(self._filter_cache) > FILTER_CACHE_SIZE:
+                            self._filter_cache.popitem(last=False)
+        return cached[0], cached[-1]
+
+    def _cached_filter(self, key: tuple):
+        with self._filter_cache_lock:
+            cached = self._filter_cache.get(key)
+            if cached is not None:
+                self._filter_cache.move_to_end(key)
+            return cached
+
+    def _build_filter(self, filters: Dict) -> tuple:
+        rows = None
+        if 'url_prefix' in filters:
+            rows = self._rows_with_url_prefix(filters['url_prefix'])
+        if 'title' in filters:
+            title_id = self.documents.string_id(filters['title'])
+            title_rows = np.array(self._rows_by_value('title').get(title_id, []), dtype='int64')
+            rows = title_rows if rows is None else np.intersect1d(rows, title_rows, assume_unique=True)
+        if rows is None:
+            rows = np.arange(len(self.documents))
+
+        ingested = self.documents.column('ingested')
+        if 'ingested_after' in filters:
+            rows = rows[ingested[rows] >= filters['ingested_after']]
+        if 'ingested_before' in filters:
+            rows = rows[ingested[rows] < filters['ingested_before']]
+        rows = rows[self.documents.column('deleted')[rows] == 0]
+        # Ids increase with the row
+        ids = np.array(self.documents.column('id')[rows])
+
+        if len(ids) <= FILTER_EXACT_LIMIT:
+            return ids, None
+        # Keep the bitmap alive as long as the selector reading it
+        bits = np.zeros(int(ids[-1]) + 1, dtype=bool)
+        bits[ids] = True
+        bitmap = np.packbits(bits, bitorder='little')
+        return ids, bitmap, faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+
+    def _selector(self):
+        """ID selector excluding tombstones, or None when there are none"""
+        if not self.tombstones:
+            return None
+        if self._tombstone_selector is None:
+            # Keep the id array and the inner selector alive as long as the outer one
+            ids = np.fromiter(self.tombstones, dtype='int64', count=len(self.tombstones))
+            batch = faiss.IDSelectorBatch(ids)
+            self._tombstone_selector = (ids, batch, faiss.IDSelectorNot(batch))
+        return self._tombstone_selector[2]
+
+    def _known_keys(self) -> set:
+        if self.document_keys is None:
+            live = self.documents.column('deleted') == 0
+            self.document_keys = set(self.documents.column('key')[live].tolist())
+        return self.document_keys
+
+    def _document_key(self, doc: Dict) -> int:
+        """Exact-duplicate key of a chunk: its normalized text on its page
+
+        Only copies on the same url are skipped by it, so deleting or
+        changing one page never takes chunks away from another. Copies on
+        other pages are dropped by the near-duplicate check instead, unless
+        near_duplicate_distance is negative.
+        """
+        return int(content_hash(doc['text'], salt=doc.get('url', ''))[:16], 16)
+
+    def search(self, query: str, k: int = 5, nprobe: int = None, ef_search: int = None,
+               rerank: bool = None, mode: str = None, filters: Dict = None) -> List[Dict]:
+        """Search for similar documents
+
+        nprobe / ef_search override the store defaults for IVF / HNSW indexes,
+        rerank the store default for quantized indexes and mode the store's
+        search_mode. `filters` restricts results to chunks matching every
+        given FILTER_KEYS entry.
+        """
+        self.load()
         if self.index.ntotal == 0:
             print("No documents in vector store")
             return []
 
         print(f"Searching in {self.index.ntotal} documents for: {query}")
+        results = self.search_batch([query], k=k, nprobe=nprobe, ef_search=ef_search, rerank=rerank, mode=mode,
+                                    filters=filters)[0]
+        print(f"Found {len(results)} relevant documents")
+        return results
 
-        # Encode query
-        query_embedding = self.model.encode([query])
-        faiss.normalize_L2(query_embedding)
+    def search_batch(self, queries: List[str], k: int = 5, nprobe: int = None, ef_search: int = None,
+                     rerank: bool = None, batch_size: int = 64, mode: str = None,
+                     filters: Dict = None) -> List[List[Dict]]:
+        """Search for several queries with one encode pass and one FAISS search"""
+        with self._searches_lock:
+            self._searches += 1
+        try:
+            return self._search_batch(queries, k, nprobe, ef_search, rerank, batch_size, mode, filters)
+        finally:
+            with self._searches_lock:
+                self._searches -= 1
 
-        # Search
-        scores, indices = self.index.search(query_embedding.astype('float32'), k)
+    def _search_batch(self, queries: List[str], k: int, nprobe: int, ef_search: int, rerank: bool,
+                      batch_size: int, mode: str, filters: Dict) -> List[List[Dict]]:
+        mode = mode or self.search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"mode must be one of {SEARCH_MODES}")
+        if not queries:
+            return []
+        self.load()
+        if self.index.ntotal == 0:
+            return [[] for _ in queries]
+
+        # Resolved before taking the index lock, since it may wait for a writer's _lock
+        allowed, filter_selector = self._filter(filters) if filters else (None, None)
+        if allowed is not None and not len(allowed):
+            return [[] for _ in queries]
+
+        # Cached queries skip the model; single queries are micro-batched with concurrent ones
+        query_embeddings = None
+        if mode != 'lexical':
+            query_embeddings = self.query_encoder.encode(queries, batch_size=batch_size)
+
+        # Both sides contribute candidates beyond k so fusion can reorder them
+        candidates = k if mode == 'dense' else k * self.rerank_factor
+        with self._index_lock.read():
+            # Keep working on these even if the store is swapped or unloaded afterwards
+            index, documents, vectors, lexical = self.index, self.documents, self.vectors, self.lexical
+            if index.ntotal == 0:
+                return [[] for _ in queries]
+            if query_embeddings is not None and allowed is not None and filter_selector is None:
+                dense_scores, dense_rows = self._exact_search(documents, vectors, allowed, query_embeddings,
+                                                              candidates)
+            elif query_embeddings is not None:
+                # Filtered ids are all live, so their selector replaces the tombstone one
+                selector = self._selector() if allowed is None else filter_selector
+                dense_scores, dense_rows = self._dense_search(index, documents, vectors, selector,
+                                                              query_embeddings, candidates, nprobe, ef_search, rerank,
+                                                              allowed)
+
+        if mode == 'dense':
+            return [self._collect_results(documents, row_scores, row_indices)
+                    for row_scores, row_indices in zip(dense_scores, dense_rows)]
 
-        # Return documents with scores
         results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx != -1 and idx < len(self.documents):
-                doc = self.documents[idx].copy()
+        for i, query in enumerate(queries):
+            ids, scores = lexical.search(query, candidates, allowed=allowed)
+            rows = documents.rows_of(ids)
+            if mode == 'hybrid':
+                scores, rows = reciprocal_rank_fusion([dense_rows[i], rows], k)
+            results.append(self._collect_results(documents, scores[:k], rows[:k]))
+        return results
+
+    def _dense_search(self, index, documents: DocumentStore, vectors: VectorFile, selector,
+                      query_embeddings: np.ndarray, k: int, nprobe: int, ef_search: int, rerank: bool,
+                      allowed: np.ndarray = None):
+        """Scores and document rows of the k nearest chunks of each query
+
+        `selector` excludes tombstones, or admits only the `allowed` ids.
+        """
+        rerank = self.rerank if rerank is None else rerank
+        rerank = rerank and describe_index(index)[1] != 'none'
+        fetch_k = k * self.rerank_factor if rerank else k
+        if selector is not None and isinstance(unwrap_index(index), faiss.IndexPQ):
+            # IndexPQ rejects search parameters, so the selector is applied afterwards
+            params = self._search_params(index, nprobe, ef_search)
+            excluded = self._tombstone_selector[0] if allowed is None else None
+            scores, ids = self._post_filtered_search(index, params, query_embeddings, fetch_k, allowed, excluded)
+        else:
+            params = self._search_params(index, nprobe, ef_search, selector)
+            scores, ids = index.search(query_embeddings, fetch_k, params=params)
+
+        # Chunk ids -> rows of the document store and the vector file
+        rows = documents.rows_of(ids.ravel()).reshape(ids.shape)
+        rows[ids == -1] = -1
+        if rerank:
+            scores, rows = self._rerank(vectors, query_embeddings, rows, k)
+        return scores, rows
+
+    def _post_filtered_search(self, index, params, query_embeddings: np.ndarray, k: int,
+                              allowed: np.ndarray = None, excluded: np.ndarray = None):
+        """The k best ids per query within `allowed` / outside `excluded`, from an index without selectors
+
+        Over-fetches by the number of excluded ids, and keeps doubling
+        while a query has fewer than k matches left and the index has more.
+        """
+        fetch = min(index.ntotal, k + (len(excluded) if excluded is not None else 0))
+        while True:
+            scores, ids = index.search(query_embeddings, fetch, params=params)
+            if allowed is not None:
+                keep = np.isin(ids, allowed)
+            else:
+                keep = (ids != -1) & ~np.isin(ids, excluded)
+            if fetch >= index.ntotal or keep.sum(axis=1).min() >= k:
+                break
+            fetch = min(index.ntotal, fetch * 2)
+
+        kept_scores = np.full((len(ids), k), -np.inf, dtype='float32')
+        kept_ids = np.full((len(ids), k), -1, dtype='int64')
+        for row, mask in enumerate(keep):
+            best = np.flatnonzero(mask)[:k]
+            kept_scores[row, :len(best)] = scores[row, best]
+            kept_ids[row, :len(best)] = ids[row, best]
+        return kept_scores, kept_ids
+
+    def _exact_search(self, documents: DocumentStore, vectors: VectorFile, ids: np.ndarray,
+                      query_embeddings: np.ndarray, k: int):
+        """Scores and document rows of the k best of the given chunks, by brute force"""
+        rows = documents.rows_of(ids)
+        rows = rows[rows != -1]
+        scores = np.full((len(query_embeddings), k), -np.inf, dtype='float32')
+        indices = np.full((len(query_embeddings), k), -1, dtype='int64')
+        if len(rows):
+            exact = query_embeddings @ vectors.rows(rows).T
+            top = min(k, len(rows))
+            best = np.argsort(-exact, axis=1, kind='stable')[:, :top]
+            scores[:, :top] = np.take_along_axis(exact, best, axis=1)
+            indices[:, :top] = rows[best]
+        return scores, indices
+
+    def _rerank(self, vectors: VectorFile, query_embeddings: np.ndarray, candidates: np.ndarray, k: int):
+        """Re-score candidate rows with the exact vectors and keep the best k"""
+        scores = np.full((len(candidates), k), -np.inf, dtype='float32')
+        indices = np.full((len(candidates), k), -1, dtype='int64')
+        for row, (query, rows) in enumerate(zip(query_embeddings, candidates)):
+            rows = rows[rows != -1]
+            if not len(rows):
+                continue
+            exact = vectors.rows(rows) @ query
+            best = np.argsort(-exact)[:k]
+            scores[row, :len(best)] = exact[best]
+            indices[row, :len(best)] = rows[best]
+        return scores, indices
+
+    def _collect_results(self, documents: DocumentStore, scores: np.ndarray, rows: np.ndarray) -> List[Dict]:
+        """Return documents with scores for one row of FAISS results"""
+        results = []
+        for score, row in zip(scores, rows):
+            if row != -1 and row < len(documents):
+                doc = documents[row]
                 doc['score'] = float(score)
                 results.append(doc)
-
-        print(f"Found {len(results)} relevant documents")
         return results
 
-    def _save_data(self):
-        """Save index and documents to disk"""
-        index_path = self.storage_path / "main.index"
-        docs_path = self.storage_path / "documents.pkl"
+    def _search_params(self, index, nprobe: int = None, ef_search: int = None, selector=None):
+        """Per-call search parameters for the given index type"""
+        index = unwrap_index(index)
+        if isinstance(index, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(nprobe=nprobe or self.nprobe, sel=selector)
+        if isinstance(index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(efSearch=ef_search or self.ef_search, sel=selector)
+        if selector is not None:
+            return faiss.SearchParameters(sel=selector)
+        return None
+
+    def current_index_type(self) -> str:
+        return describe_index(self.index)[0]
+
+    def _target_index(self) -> tuple:
+        return self.index_type, self.quantization
+
+    def promote(self):
+        """Rebuild the flat index as the configured approximate / compressed index"""
+        self.load()
+        with self._lock:
+            if describe_index(self.index) == self._target_index():
+                return
+            covered = self.index.ntotal
+            # Reconstructing from a quantized index would be lossy
+            vectors = self.vectors.read_all()[:covered]
+            ids = np.array(self.documents.column('id')[:covered])
+            documents = self.documents
+
+        # Training / graph construction runs without the lock; searches keep
+        # using the flat index until the swap below.
+        started = time.time()
+        index = build_index(self.index_type, self.dimension, vectors, nlist=self.nlist, hnsw_m=self.hnsw_m,
+                            quantization=self.quantization, pq_m=self.pq_m, ids=ids)
+
+        with self._lock:
+            if self.documents is not documents:
+                # Vacuumed or unloaded meanwhile; the next batch retries
+                return
+            if self.index.ntotal > covered:
+                index.add_with_ids(self.vectors.read_all()[covered:self.index.ntotal],
+                                   np.array(self.documents.column('id')[covered:self.index.ntotal]))
+            with self._index_lock.write():
+                self.index = index
+                self._index_mapped = False
+
+        print(f"Promoted index to {'/'.join(self._target_index())} with {index.ntotal} vectors "
+              f"in {time.time() - started:.1f}s")
+        self.compact(force=True)
+
+    def _maybe_promote(self) -> bool:
+        """Start a background promotion once the flat index passes promote_at"""
+        if self._target_index() == ('flat', 'none') or describe_index(self.index) != ('flat', 'none'):
+            return False
+        if self.index.ntotal < self.promote_at:
+            return False
+        if self._promotion_thread is not None and self._promotion_thread.is_alive():
+            return True
+
+        self._promotion_thread = threading.Thread(target=self._promote_in_background, daemon=True)
+        self._promotion_thread.start()
+        return True
 
-        # Save FAISS index
-        faiss.write_index(self.index, str(index_path))
+    def _promote_in_background(self):
+        try:
+            self.promote()
+        except Exception as e:
+            print(f"Error promoting index: {e}")
 
-        # Save documents
-        with open(docs_path, 'wb') as f:
-            pickle.dump(self.documents, f)
+    def compact(self, force: bool = False):
+        """Fold the delta log into a new base snapshot"""
+        self.load()
+        with self._compaction_lock:
+            self._compact(force)
+
+    def _compact(self, force: bool):
+        delta_path = self.data_path / "delta.log"
+
+        with self._lock:
+            if self.delta_records == 0 and not force:
+                return
+            index = faiss.clone_index(self.index)
+            lexical = self.lexical
+            delta_offset = delta_path.stat().st_size if delta_path.exists() else 0
+            compacted_records = self.delta_records
+
+        # The expensive full write happens outside the lock so searches and
+        # new batches are not held up by it.
+        self._save_data(index)
+        if lexical is not None:
+            lexical.save(self.data_path / "lexical.index")
+
+        with self._lock:
+            # Keep whatever was appended while the snapshot was being written
+            tail = b''
+            if delta_path.exists():
+                with open(delta_path, 'rb') as f:
+                    f.seek(delta_offset)
+                    tail = f.read()
+            self._write_atomic(delta_path, tail)
+            self.delta_records -= compacted_records
+
+        print(f"Compacted {index.ntotal} vectors into main.index")
+
+    def _maybe_compact(self):
+        """Start a background compaction once enough deltas have piled up"""
+        if self.delta_records < self.compact_every:
+            return
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+
+        self._compaction_thread = threading.Thread(target=self._compact_in_background, daemon=True)
+        self._compaction_thread.start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"Error compacting vector store: {e}")
+
+    def vacuum(self):
+        """Rewrite the store without tombstoned chunks"""
+        self.load()
+        with self._compaction_lock:
+            self._vacuum()
+
+    def _vacuum(self):
+        with self._lock:
+            if not self.tombstones:
+                return
+            documents, vectors, lexical = self.documents, self.vectors, self.lexical
+            covered = len(documents)
+            tombstones = set(self.tombstones)
+            current_index = describe_index(self.index)
+
+        # The new snapshot is built outside the lock; searches and new
+        # batches keep using the active one until it is published.
+        started = time.time()
+        build_path = self._new_snapshot_path()
+        live = documents.live_rows()
+        live = live[live < covered]
+
+        new_documents = DocumentStore(build_path / "documents")
+        documents.copy_rows(new_documents, live)
+        new_vectors = VectorFile(build_path / "vectors.f32", self.dimension)
+        live_vectors = vectors.rows(live)
+        new_vectors.append(live_vectors)
+
+        # A store that shrank below promote_at goes back to flat until it grows again
+        index_type, quantization = current_index if len(live) >= self.promote_at else ('flat', 'none')
+        index = build_index(index_type, self.dimension, live_vectors, nlist=self.nlist, hnsw_m=self.hnsw_m,
+                            quantization=quantization, pq_m=self.pq_m, ids=np.array(documents.column('id')[live]))
+        self._write_index_durably(index, build_path / "main.index")
+        # Postings of removed chunks are dropped on load, and later chunks caught up
+        lexical.save(build_path / "lexical.index")
+
+        with self._lock:
+            if self.documents is not documents or describe_index(self.index) != current_index:
+                # Unloaded or promoted meanwhile; try again later
+                self._remove_path(build_path)
+                return
+
+            # Catch up with batches added while we were copying
+            appended = np.arange(covered, len(documents))
+            appended = appended[documents.column('deleted')[appended] == 0]
+            if len(appended):
+                documents.copy_rows(new_documents, appended)
+                new_vectors.append(vectors.rows(appended))
+                index.add_with_ids(vectors.rows(appended), np.array(documents.column('id')[appended]))
+                self._write_index_durably(index, build_path / "main.index")
+
+            # ... and with deletions
+            deleted = new_documents.rows_of(np.fromiter(self.tombstones - tombstones, dtype='int64'))
+            new_documents.mark_deleted(deleted[deleted != -1])
+
+            self._publish_snapshot(build_path, index, lexical)
+
+        # Outside the lock; searches keep using the old posting lists meanwhile
+        lexical.prune()
+        print(f"Vacuumed {covered - len(live)} deleted chunks, {index.ntotal} remain "
+              f"({time.time() - started:.1f}s)")
+
+    def _maybe_vacuum(self) -> bool:
+        """Start a background vacuum once tombstones pass vacuum_ratio of the index"""
+        if not self.tombstones or len(self.tombstones) < self.vacuum_ratio * self.index.ntotal:
+            return False
+        if self._vacuum_thread is not None and self._vacuum_thread.is_alive():
+            return True
+
+        self._vacuum_thread = threading.Thread(target=self._vacuum_in_background, daemon=True)
+        self._vacuum_thread.start()
+        return True
+
+    def _vacuum_in_background(self):
+        try:
+            self.vacuum()
+        except Exception as e:
+            print(f"Error vacuuming vector store: {e}")
+
+    def rebuild(self, documents: List[Dict], page_fingerprints: Dict[str, str] = None,
+                cancelled: threading.Event = None) -> int:
+        """Replace the whole corpus with `documents`, returning how many chunks it holds
+
+        The new snapshot is embedded, indexed and fsynced next to the active
+        one while searches keep using it, then swapped in at once. Chunks
+        added to the active snapshot meanwhile are superseded by it, and
+        the page fingerprints by `page_fingerprints`. If `cancelled` is set
+        before the swap, the new snapshot is discarded and 0 returned.
+        """
+        self.load()
+        with self._compaction_lock:
+            return self._rebuild(documents, page_fingerprints or {}, cancelled)
+
+    def _rebuild(self, documents: List[Dict], page_fingerprints: Dict[str, str],
+                 cancelled: threading.Event = None) -> int:
+        started = time.time()
+        unique = {}
+        for doc in documents:
+            unique.setdefault(self._document_key(doc), doc)
+        keys, documents = list(unique), list(unique.values())
+        fingerprints = simhash_many(doc['text'] for doc in documents)
+        if self.near_duplicate_distance >= 0:
+            keep = self._distinct([doc['text'] for doc in documents], fingerprints)
+            self._record_near_duplicates(len(documents) - len(keep))
+            keys, documents, fingerprints = [keys[i] for i in keep], [documents[i] for i in keep], fingerprints[keep]
+        texts = [doc['text'] for doc in documents]
+
+        embeddings = self.embedding_cache.encode(self.model, texts)
+        faiss.normalize_L2(embeddings)
+        with self._lock:
+            # Ids stay unique across snapshots
+            ids = np.arange(self.next_id, self.next_id + len(documents), dtype='int64')
+            self.next_id += len(documents)
+
+        build_path = self._new_snapshot_path()
+        DocumentStore(build_path / "documents").append(documents, keys, ids, fingerprints)
+        VectorFile(build_path / "vectors.f32", self.dimension).append(embeddings)
+        index_type, quantization = self._target_index() if len(documents) >= self.promote_at else ('flat', 'none')
+        index = build_index(index_type, self.dimension, embeddings, nlist=self.nlist, hnsw_m=self.hnsw_m,
+                            quantization=quantization, pq_m=self.pq_m, ids=ids)
+        self._write_index_durably(index, build_path / "main.index")
+        lexical = LexicalIndex()
+        lexical.add(ids, texts)
+        lexical.save(build_path / "lexical.index")
+
+        with self._lock:
+            if cancelled is not None and cancelled.is_set():
+                shutil.rmtree(build_path, ignore_errors=True)
+                print(f"Discarded cancelled rebuild of {len(documents)} chunks")
+                return 0
+            self._publish_snapshot(build_path, index, lexical)
+            self.page_fingerprints.replace_all(page_fingerprints)
+            self._replacements += 1
+        print(f"Rebuilt snapshot {self.data_path.name} with {len(documents)} chunks in {time.time() - started:.1f}s")
+        return len(documents)
+
+    def rollback(self, version: str = None) -> str:
+        """Make an older snapshot active again, by default the one before the active one
+
+        Chunks added since that snapshot was replaced are dropped. Returns
+        the version now active.
+        """
+        self.load()
+        with self._compaction_lock:
+            with self._lock:
+                names = self._snapshot_names()
+                if version is None:
+                    older = [name for name in names if name < self.data_path.name]
+                    if not older:
+                        raise ValueError("No older snapshot to roll back to")
+                    version = older[-1]
+                elif version not in names:
+                    raise ValueError(f"Unknown snapshot: {version}")
+                self._point_to(version)
+                self.page_fingerprints.replace_all({})
+                self._replacements += 1
+                with self._load_lock, self._index_lock.write():
+                    self._unload()
+        self.load()
+        print(f"Rolled back to snapshot {version}")
+        return version
+
+    def snapshots(self) -> List[Dict]:
+        """Snapshots on disk, oldest first"""
+        self.load()
+        return [{'version': name,
+                 'active': name == self.data_path.name,
+                 'modified': int((self.snapshots_path / name).stat().st_mtime)}
+                for name in self._snapshot_names()]
+
+    def _snapshot_names(self) -> List[str]:
+        if not self.snapshots_path.exists():
+            return []
+        return sorted(path.name for path in self.snapshots_path.iterdir() if path.is_dir() and path.name.isdigit())
+
+    def _new_snapshot_path(self) -> Path:
+        """Empty directory for the next snapshot; it gets its final name once published"""
+        names = self._snapshot_names()
+        path = self.snapshots_path / f"{int(names[-1]) + 1 if names else 1:06d}.tmp"
+        self._remove_path(path)
+        path.mkdir(parents=True)
+        return path
+
+    def _publish_snapshot(self, build_path: Path, index, lexical: LexicalIndex):
+        """Make a finished build durable, point CURRENT at it and swap it in
+
+        Called with `_lock` held, once every file of the build is written.
+        Searches keep using the previous snapshot until the final swap.
+        """
+        self._fsync_dir(build_path / "documents")
+        self._fsync_dir(build_path)
+        path = build_path.with_name(build_path.name[:-len(".tmp")])
+        os.replace(build_path, path)
+        self._fsync_dir(self.snapshots_path)
+        self._point_to(path.name)
+
+        # In-flight searches keep reading the previous files, which pruning may delete
+        self.documents.map_all()
+        self.vectors.map_all()
+
+        documents = DocumentStore(path / "documents")
+        vectors = VectorFile(path / "vectors.f32", self.dimension)
+        self._reset_row_maps()
+        with self._index_lock.write():
+            self.data_path = path
+            self.documents = documents
+            self.vectors = vectors
+            self.index = index
+            self._index_mapped = False
+            self.lexical = lexical
+            self.tombstones = set(documents.column('id')[documents.column('deleted') != 0].tolist())
+            self._tombstone_selector = None
+        self.document_keys = None
+        self.near_duplicates = None
+        self.delta_records = 0
+        self._prune_snapshots()
+
+    def _prune_snapshots(self):
+        """Delete all but the newest keep_snapshots snapshots besides the active one"""
+        older = [name for name in self._snapshot_names() if name != self.data_path.name]
+        for name in older[:max(0, len(older) - self.keep_snapshots)]:
+            self._remove_path(self.snapshots_path / name)
+
+    def _open_snapshot(self) -> Path:
+        """Directory of the active snapshot, moving the files of an older layout into one"""
+        self.snapshots_path.mkdir(exist_ok=True)
+        for path in self.snapshots_path.glob("*.tmp"):
+            # Builds that were never published
+            self._remove_path(path)
+
+        pointer = self.storage_path / SNAPSHOT_POINTER
+        if pointer.exists():
+            return self.snapshots_path / pointer.read_text().strip()
+
+        # Files at the top level (from before snapshots) become the first one
+        self._recover_legacy_vacuum()
+        path = self.snapshots_path / f"{1:06d}"
+        path.mkdir(exist_ok=True)
+        moved = [name for name in SNAPSHOT_FILES if (self.storage_path / name).exists()]
+        for name in moved:
+            os.replace(self.storage_path / name, path / name)
+        self._fsync_dir(path)
+        self._point_to(path.name)
+        if moved:
+            print(f"Moved vector store files into {path}")
+        return path
+
+    def _recover_legacy_vacuum(self):
+        """Roll forward a vacuum interrupted before snapshots existed, or discard its files"""
+        marker = self.storage_path / LEGACY_VACUUM_MARKER
+        for name in LEGACY_VACUUM_FILES:
+            path = self.storage_path / name
+            new_path = self.storage_path / (name + ".new")
+            old_path = self.storage_path / (name + ".old")
+            if marker.exists() and new_path.exists():
+                if path.exists():
+                    self._remove_path(old_path)
+                    os.replace(path, old_path)
+                os.replace(new_path, path)
+            self._remove_path(new_path)
+            self._remove_path(old_path)
+
+        if marker.exists():
+            # Every vector is in the new main.index, and the log's row positions are stale
+            self._write_atomic(self.storage_path / "delta.log", b'')
+            marker.unlink()
+            print("Finished an interrupted vacuum")
+
+    def _point_to(self, version: str):
+        self._write_atomic(self.storage_path / SNAPSHOT_POINTER, version.encode('utf-8'))
+        self._fsync_dir(self.storage_path)
+
+    def _fsync_dir(self, path: Path):
+        """Make the names of files created or renamed in a directory durable"""
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _remove_path(self, path: Path):
+        if path.is_dir():
+            shutil.rmtree(path)
+        elif path.exists():
+            path.unlink()
+
+    def _write_index_durably(self, index, path: Path):
+        faiss.write_index(index, str(path))
+        with open(path, 'rb') as f:
+            os.fsync(f.fileno())
+
+    def _append_delta(self, start: int, ids: np.ndarray, embeddings: np.ndarray):
+        """Append one batch of vectors to the delta log"""
+        delta_path = self.data_path / "delta.log"
+        record = {'start': start, 'ids': ids, 'embeddings': embeddings}
+
+        with open(delta_path, 'ab') as f:
+            pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.delta_records += 1
+
+    def _replay_delta(self, legacy_documents: List[Dict] = None):
+        """Re-apply batches from the delta log that are newer than the base snapshot
+
+        Logs written before the columnar document store also carry the
+        documents of each batch; those are collected into `legacy_documents`.
+        """
+        delta_path = self.data_path / "delta.log"
+        if not delta_path.exists():
+            return
+
+        good_offset = 0
+        with open(delta_path, 'rb') as f:
+            while True:
+                try:
+                    record = pickle.load(f)
+                except EOFError:
+                    break
+                except Exception as e:
+                    # A crash mid-append leaves a torn record at the end
+                    print(f"Ignoring truncated delta record: {e}")
+                    break
+                good_offset = f.tell()
+                self.delta_records += 1
+
+                # Records already folded into the base snapshot are skipped
+                skip = self.index.ntotal - record['start']
+                if skip < 0:
+                    print("Delta log has a gap, ignoring remaining records")
+                    break
+                if skip >= len(record['embeddings']):
+                    continue
+
+                embeddings = record['embeddings'][skip:]
+                if isinstance(self.index, faiss.IndexIDMap2):
+                    # Records from before chunk ids were positional
+                    ids = record.get('ids', np.arange(record['start'], record['start'] + len(record['embeddings'])))
+                    self._writable_index().add_with_ids(embeddings, np.asarray(ids[skip:], dtype='int64'))
+                else:
+                    self._writable_index().add(embeddings)
+                if legacy_documents is not None:
+                    legacy_documents.extend(record['documents'][skip:])
+
+        if good_offset < delta_path.stat().st_size:
+            with open(delta_path, 'r+b') as f:
+                f.truncate(good_offset)
+
+    def _save_data(self, index):
+        """Save the index snapshot to disk"""
+        index_path = self.data_path / "main.index"
+
+        tmp_index_path = index_path.with_suffix('.index.tmp')
+        self._write_index_durably(index, tmp_index_path)
+        os.replace(tmp_index_path, index_path)
+
+    def _write_atomic(self, path: Path, data: bytes):
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
 
     def _load_data(self):
         """Load index and documents from disk"""
-        index_path = self.storage_path / "main.index"
-        docs_path = self.storage_path / "documents.pkl"
+        self.data_path = self._open_snapshot()
+        index_path = self.data_path / "main.index"
+        delta_path = self.data_path / "delta.log"
+        legacy_docs_path = self.data_path / "documents.pkl"
+
+        try:
+            started = time.time()
+            self.documents = DocumentStore(self.data_path / "documents")
+            if index_path.exists():
+                # Replaying deltas writes to the index, so only map a clean snapshot
+                clean = not legacy_docs_path.exists() and (not delta_path.exists() or delta_path.stat().st_size == 0)
+                self._read_index(index_path, mmap=self.mmap_index and clean)
+
+            if legacy_docs_path.exists():
+                self._migrate_legacy_documents(legacy_docs_path)
+            else:
+                self._replay_delta()
+
+            # Rows appended right before a crash may have no vectors on disk
+            self.documents.truncate(self.index.ntotal)
+            if len(self.documents) < self.index.ntotal:
+                raise ValueError(f"{self.index.ntotal} vectors but only {len(self.documents)} documents")
+            self._load_vector_file()
+            self._ensure_id_map()
+
+            ids = self.documents.column('id')
+            self.next_id = int(ids[-1]) + 1 if len(ids) else 0
+            self.tombstones = set(ids[self.documents.column('deleted') != 0].tolist())
+            self._tombstone_selector = None
+            self._reset_row_maps()
+            self.near_duplicates = None
+            self._load_lexical()
+
+            if self.index.ntotal:
+                print(f"Loaded {self.index.ntotal} documents from disk in {time.time() - started:.2f}s")
+        except Exception as e:
+            print(f"Error loading data: {e}")
+            self._quarantine_data()
+            self.index = empty_index(self.dimension)
+            self._index_mapped = False
+            self.documents = DocumentStore(self.data_path / "documents")
+            self.vectors = VectorFile(self.data_path / "vectors.f32", self.dimension)
+            self.delta_records = 0
+            self.next_id = 0
+            self.tombstones = set()
+            self._tombstone_selector = None
+            self._reset_row_maps()
+            self.near_duplicates = None
+            self.lexical = LexicalIndex()
+
+        if not self._maybe_promote() and not self._maybe_vacuum():
+            self._maybe_compact()
 
-        if index_path.exists() and docs_path.exists():
+    def _quarantine_data(self):
+        """Move an unreadable snapshot aside so a fresh one can start in its place without losing it"""
+        quarantine_path = self.storage_path / f"corrupt-{int(time.time())}"
+        if self.data_path.exists():
+            os.replace(self.data_path, quarantine_path)
+            print(f"Moved unreadable snapshot {self.data_path.name} to {quarantine_path}; "
+                  f"older snapshots can be restored with rollback()")
+        self.page_fingerprints.replace_all({})
+        self._replacements += 1
+        self.data_path.mkdir(parents=True)
+
+    def _load_vector_file(self):
+        """Open the exact vector file, backfilling it for stores created before it existed"""
+        self.vectors = VectorFile(self.data_path / "vectors.f32", self.dimension)
+        self.vectors.truncate(self.index.ntotal)
+
+        missing = self.index.ntotal - len(self.vectors)
+        if missing:
+            self.vectors.append(reconstruct_all(self._writable_index(), start=len(self.vectors)))
+            exact = describe_index(self.index)[1] == 'none'
+            print(f"Backfilled {missing} {'exact' if exact else 'approximate'} vectors into {self.vectors.path.name}")
+
+    def _load_lexical(self, batch_size: int = 10000):
+        """Open the BM25 snapshot and bring it up to date with the document store"""
+        lexical_path = self.data_path / "lexical.index"
+        self.lexical = None
+        if lexical_path.exists():
             try:
-                self.index = faiss.read_index(str(index_path))
-                with open(docs_path, 'rb') as f:
-                    self.documents = pickle.load(f)
-                print(f"Loaded {len(self.documents)} documents from disk")
+                self.lexical = LexicalIndex.load(lexical_path)
             except Exception as e:
-                print(f"Error loading data: {e}")
-                self.index = faiss.IndexFlatIP(self.dimension)
-                self.documents = []
+                print(f"Rebuilding unreadable {lexical_path.name}: {e}")
+        rebuild = self.lexical is None
+        if rebuild:
+            self.lexical = LexicalIndex()
+
+        ids = self.documents.column('id')
+        live = self.documents.column('deleted') == 0
+
+        # Chunks deleted or vacuumed away since the snapshot
+        indexed = self.lexical.doc_ids()
+        stale = indexed[~np.isin(indexed, ids[live])]
+        if len(stale):
+            self.lexical.remove(stale.tolist())
+            self.lexical.prune()
+
+        # Chunks added since
+        rows = np.flatnonzero(live & (ids > self.lexical.last_id))
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            self.lexical.add(ids[batch], [self.documents[int(row)]['text'] for row in batch])
+
+        if rebuild and len(rows):
+            self.lexical.save(lexical_path)
+            print(f"Built {lexical_path.name} for {len(rows)} chunks")
+
+    def _ensure_id_map(self):
+        """Rebuild an index from before chunk ids as an IndexIDMap2, keeping its type"""
+        if isinstance(self.index, faiss.IndexIDMap2):
+            return
+        index_type, quantization = describe_index(self.index)
+        self.index = build_index(index_type, self.dimension, self.vectors.read_all(), nlist=self.nlist,
+                                 hnsw_m=self.hnsw_m, quantization=quantization, pq_m=self.pq_m,
+                                 ids=np.array(self.documents.column('id')))
+        self._index_mapped = False
+        with self._compaction_lock:
+            self._compact(force=True)
+        print(f"Rebuilt main.index with chunk ids for {self.index.ntotal} vectors")
+
+    def _read_index(self, index_path: Path, mmap: bool):
+        if mmap and MMAP_IO_FLAGS is not None:
+            try:
+                self.index = faiss.read_index(str(index_path), MMAP_IO_FLAGS)
+                self._index_mapped = True
+                return
+            except RuntimeError as e:
+                # Not every index type supports mapping
+                print(f"Could not memory-map {index_path.name}, reading it instead: {e}")
+        self.index = faiss.read_index(str(index_path))
+        self._index_mapped = False
+
+    def _migrate_legacy_documents(self, legacy_docs_path: Path):
+        """Move documents.pkl (and documents in the delta log) into the columnar store"""
+        with open(legacy_docs_path, 'rb') as f:
+            documents = pickle.load(f)[:self.index.ntotal]
+        self._replay_delta(legacy_documents=documents)
+
+        self.documents.truncate(0)
+        self.documents.append(documents, [self._document_key(doc) for doc in documents], range(len(documents)))
+        with self._compaction_lock:
+            self._compact(force=True)
+        legacy_docs_path.unlink()
+        print(f"Migrated {len(documents)} documents from {legacy_docs_path.name}")
+
 
+# Settings shared by the global instance and per-namespace stores
+STORE_SETTINGS = dict(
+    index_type=os.getenv("VECTOR_INDEX_TYPE", "flat"),
+    promote_at=int(os.getenv("VECTOR_INDEX_PROMOTE_AT", "50000")),
+    quantization=os.getenv("VECTOR_INDEX_QUANTIZATION", "none"),
+    mmap_index=os.getenv("VECTOR_INDEX_MMAP", "1") != "0",
+    search_mode=os.getenv("VECTOR_SEARCH_MODE", "dense"),
+    keep_snapshots=int(os.getenv("VECTOR_SNAPSHOT_KEEP", "3")),
+    near_duplicate_distance=int(os.getenv("VECTOR_NEAR_DUPLICATE_DISTANCE", "4"))
+)
 
 # Global instance
-vector_store = VectorStore()
+vector_store = VectorStore(**STORE_SETTINGS)